@@ -0,0 +1,43 @@
+"""Зависимости FastAPI: общие сервисы из контейнера и репозиторий на сессии запроса"""
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.container import ServiceContainer, get_container
+from app.domain.services.ad_mirror_service import ADMirrorService
+from app.domain.services.archive_service import UserArchiveService
+from app.domain.services.export_service import ExportService
+from app.domain.services.user_service import UserService
+from app.infrastructure.database.ad_mirror_repository import SQLAlchemyADMirrorRepository
+from app.infrastructure.database.database import get_db
+from app.infrastructure.database.user_repository_impl import SQLAlchemyUserRepository
+from app.infrastructure.external.ldap_service import LDAPService
+
+
+def get_user_repository(db: AsyncSession = Depends(get_db)) -> SQLAlchemyUserRepository:
+    return SQLAlchemyUserRepository(db)
+
+
+def get_user_service(
+    repository: SQLAlchemyUserRepository = Depends(get_user_repository),
+    container: ServiceContainer = Depends(get_container),
+) -> UserService:
+    return UserService(repository, container.ldap_service, container.exchange_service)
+
+
+def get_ldap_service(container: ServiceContainer = Depends(get_container)) -> LDAPService:
+    return container.ldap_service
+
+
+def get_export_service(container: ServiceContainer = Depends(get_container)) -> ExportService:
+    return container.export_service
+
+
+def get_archive_service(repository: SQLAlchemyUserRepository = Depends(get_user_repository)) -> UserArchiveService:
+    return UserArchiveService(repository)
+
+
+def get_ad_mirror_service(
+    db: AsyncSession = Depends(get_db),
+    container: ServiceContainer = Depends(get_container),
+) -> ADMirrorService:
+    return ADMirrorService(SQLAlchemyADMirrorRepository(db), container.ldap_service)
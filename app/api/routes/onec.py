@@ -1,17 +1,15 @@
 from typing import List, Union
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from app.infrastructure.database.database import get_db
-from app.infrastructure.database.user_repository_impl import SQLAlchemyUserRepository
+from app.api.dependencies import get_user_service
 from app.domain.services.user_service import UserService
+from app.domain.services.onec_import_service import OneCImportService
 from app.api.schemas.user_schemas import UserCreateRequest, UserResponse
 from app.domain.entities.user import UserStatus
 from datetime import datetime
 from app.core.config.settings import settings
 from app.core.logging.logger import api_logger
 from pydantic import BaseModel
-import time
 
 router = APIRouter(prefix="/oneC", tags=["1C Integration"])
 
@@ -48,15 +46,10 @@ class ErrorResponse(BaseModel):
     details: str = None
 
 
-def get_user_service(db: Session = Depends(get_db)) -> UserService:
-    repository = SQLAlchemyUserRepository(db)
-    return UserService(repository)
-
-
 @router.post("/receive")
 async def receive_user_data(
     data: Union[OneCUserData, List[OneCUserData]],
-    db: Session = Depends(get_db)
+    user_service: UserService = Depends(get_user_service)
 ):
     """
     Получение данных пользователя или массива пользователей от 1C
@@ -64,8 +57,7 @@ async def receive_user_data(
     try:
         api_logger.info("Получен запрос от 1C")
         
-        repository = SQLAlchemyUserRepository(db)
-        user_service = UserService(repository)
+        repository = user_service.user_repository
         
         def transform_1c_data(user_data):
             """Преобразует данные от 1C в формат нашей БД"""
@@ -99,127 +91,44 @@ async def receive_user_data(
         if isinstance(data, list):
             api_logger.info(f"Получен массив из {len(data)} пользователей от 1C")
             
-            created_users = []
-            failed_users = []
+            results = {}
+            valid_rows = []
             
             for i, user_data in enumerate(data):
+                # Проверяем обязательные поля перед трансформацией
+                if not user_data.unique or not str(user_data.unique).strip():
+                    results[i] = {
+                        "unique_id": user_data.unique or "N/A",
+                        "error": "Табельный номер (unique) обязателен и не может быть пустым",
+                        "status": "failed"
+                    }
+                    api_logger.warning(f"Пользователь {i+1}/{len(data)} без табельного номера пропущен")
+                    continue
+                
                 try:
-                    # Проверяем обязательные поля перед трансформацией
-                    if not user_data.unique or not str(user_data.unique).strip():
-                        failed_users.append({
-                            "unique_id": user_data.unique or "N/A",
-                            "error": "Табельный номер (unique) обязателен и не может быть пустым",
-                            "status": "failed"
-                        })
-                        api_logger.warning(f"Пользователь {i+1}/{len(data)} без табельного номера пропущен")
-                        continue
-                    
-                    transformed_data = transform_1c_data(user_data)
-                    user = await user_service.create_user(transformed_data)
-                    created_users.append({
-                        "unique_id": user.unique_id,
-                        "user_id": user.id,
-                        "status": "created"
-                    })
-                    api_logger.info(f"Пользователь {i+1}/{len(data)} создан: {user.unique_id}")
-                    
-                except IntegrityError as e:
-                    if "UNIQUE constraint failed: users.unique_id" in str(e):
-                        # Ищем существующего пользователя
-                        existing_user = await repository.get_user_by_unique_id(user_data.unique)
-                        
-                        if existing_user:
-                            # Если пользователь еще не одобрен (PENDING), просто обновляем его данные
-                            if existing_user.status == UserStatus.PENDING and not existing_user.is_update:
-                                api_logger.info(f"Пользователь ID={existing_user.id} в статусе PENDING, обновляем данные напрямую")
-                                transformed_data = transform_1c_data(user_data)
-                                # Убираем поля которые не нужно обновлять
-                                transformed_data.pop("unique_id", None)  # Не меняем unique_id
-                                transformed_data.pop("status", None)  # Не меняем статус
-                                transformed_data.pop("is_update", None)  # Не меняем флаг
-                                
-                                updated_user = await repository.update_user_data(existing_user.id, transformed_data)
-                                
-                                created_users.append({
-                                    "unique_id": user_data.unique,
-                                    "user_id": updated_user.id,
-                                    "status": "updated"
-                                })
-                                api_logger.info(f"Пользователь {i+1}/{len(data)} обновлен: {user_data.unique}")
-                            else:
-                                # Пользователь одобрен (APPROVED) - создаем запись об обновлении для подтверждения
-                                # Проверяем, есть ли уже незавершенная запись об обновлении
-                                pending_update = await repository.get_pending_update_by_original_unique_id(user_data.unique)
-                                
-                                if pending_update:
-                                    # Обновляем существующую запись об обновлении новыми данными
-                                    api_logger.info(f"Найдена существующая запись об обновлении ID={pending_update.id}, обновляем данными")
-                                    transformed_data = transform_1c_data(user_data)
-                                    # Убираем поля которые не нужно обновлять
-                                    transformed_data.pop("unique_id", None)  # Не меняем временный unique_id
-                                    transformed_data.pop("is_update", None)  # Не меняем флаг
-                                    transformed_data.pop("status", None)  # Не меняем статус
-                                    
-                                    updated_user = await repository.update_user_data(pending_update.id, transformed_data)
-                                    
-                                    created_users.append({
-                                        "unique_id": user_data.unique,
-                                        "user_id": updated_user.id,
-                                        "status": "update_updated"
-                                    })
-                                    api_logger.info(f"Запись об обновлении ID={pending_update.id} обновлена для пользователя {i+1}/{len(data)}")
-                                else:
-                                    # Создаем новую запись со статусом PENDING и пометкой об обновлении
-                                    transformed_data = transform_1c_data(user_data)
-                                    transformed_data["is_update"] = True
-                                    transformed_data["status"] = UserStatus.PENDING
-                                    
-                                    # Используем временный unique_id с суффиксом для обхода UNIQUE constraint
-                                    original_unique = transformed_data["unique_id"]
-                                    temp_unique = f"{original_unique}_update_{int(time.time())}"
-                                    transformed_data["unique_id"] = temp_unique
-                                    
-                                    try:
-                                        new_user = await user_service.create_user(transformed_data)
-                                        
-                                        created_users.append({
-                                            "unique_id": original_unique,
-                                            "user_id": new_user.id,
-                                            "status": "update_pending"
-                                        })
-                                        api_logger.info(f"Пользователь {i+1}/{len(data)} создан как обновление: {original_unique}")
-                                    except Exception as create_error:
-                                        failed_users.append({
-                                            "unique_id": user_data.unique,
-                                            "error": f"Ошибка создания записи об обновлении: {str(create_error)}",
-                                            "status": "failed"
-                                        })
-                                        api_logger.error(f"Ошибка создания записи об обновлении для {user_data.unique}: {create_error}")
-                        else:
-                            error_msg = f"Сотрудник с табельным номером {user_data.unique} уже существует, но не найден в системе"
-                            failed_users.append({
-                                "unique_id": user_data.unique,
-                                "error": error_msg,
-                                "status": "failed"
-                            })
-                            api_logger.warning(f"Пользователь {i+1}/{len(data)} уже существует, но не найден: {user_data.unique}")
-                    else:
-                        error_msg = f"Ошибка данных для сотрудника {user_data.unique}: некорректная информация"
-                        failed_users.append({
-                            "unique_id": user_data.unique,
-                            "error": error_msg,
-                            "status": "failed"
-                        })
-                        api_logger.warning(f"Ошибка данных для пользователя {i+1}/{len(data)}: {user_data.unique}")
-                    
+                    valid_rows.append((i, transform_1c_data(user_data)))
                 except Exception as e:
-                    failed_users.append({
+                    results[i] = {
                         "unique_id": user_data.unique,
                         "error": f"Ошибка создания сотрудника {user_data.unique}: {str(e)}",
                         "status": "failed"
-                    })
+                    }
                     api_logger.error(f"Ошибка создания пользователя {i+1}/{len(data)}: {e}")
             
+            # Существующие записи читаются одним запросом на пакет, вставки и
+            # обновления пишутся пакетами в одной транзакции
+            import_service = OneCImportService(repository)
+            results.update(await import_service.import_users(valid_rows))
+            
+            created_users = []
+            failed_users = []
+            for i in range(len(data)):
+                result = results[i]
+                if result["status"] == "failed":
+                    failed_users.append(result)
+                else:
+                    created_users.append(result)
+            
             api_logger.info(f"Batch обработка завершена: {len(created_users)} создано, {len(failed_users)} ошибок")
             
             return {
@@ -248,104 +157,55 @@ async def receive_user_data(
                 }
                 
             except IntegrityError as e:
-                if "UNIQUE constraint failed: users.unique_id" in str(e):
-                    # Ищем существующего пользователя
-                    existing_user = await repository.get_user_by_unique_id(data.unique)
-                    
-                    if existing_user:
-                        # Если пользователь еще не одобрен (PENDING), просто обновляем его данные
-                        if existing_user.status == UserStatus.PENDING and not existing_user.is_update:
-                            api_logger.info(f"Пользователь ID={existing_user.id} в статусе PENDING, обновляем данные напрямую")
-                            transformed_data = transform_1c_data(data)
-                            # Убираем поля которые не нужно обновлять
-                            transformed_data.pop("unique_id", None)  # Не меняем unique_id
-                            transformed_data.pop("status", None)  # Не меняем статус
-                            transformed_data.pop("is_update", None)  # Не меняем флаг
-                            
-                            updated_user = await repository.update_user_data(existing_user.id, transformed_data)
-                            
-                            api_logger.info(f"Пользователь обновлен: {data.unique}")
-                            
-                            return {
-                                "success": True,
-                                "message": "Сотрудник успешно обновлен в системе",
-                                "user_id": updated_user.id,
-                                "updated": True,
-                                "unique_id": data.unique
-                            }
-                        else:
-                            # Пользователь одобрен (APPROVED) - создаем запись об обновлении для подтверждения
-                            # Проверяем, есть ли уже незавершенная запись об обновлении
-                            pending_update = await repository.get_pending_update_by_original_unique_id(data.unique)
-                            
-                            if pending_update:
-                                # Обновляем существующую запись об обновлении новыми данными
-                                api_logger.info(f"Найдена существующая запись об обновлении ID={pending_update.id}, обновляем данными")
-                                transformed_data = transform_1c_data(data)
-                                # Убираем поля которые не нужно обновлять
-                                transformed_data.pop("unique_id", None)  # Не меняем временный unique_id
-                                transformed_data.pop("is_update", None)  # Не меняем флаг
-                                transformed_data.pop("status", None)  # Не меняем статус
-                                
-                                updated_user = await repository.update_user_data(pending_update.id, transformed_data)
-                                
-                                api_logger.info(f"Запись об обновлении ID={pending_update.id} обновлена")
-                                
-                                return {
-                                    "success": True,
-                                    "message": "Существующая запись об обновлении обновлена новыми данными",
-                                    "user_id": updated_user.id,
-                                    "is_update": True,
-                                    "unique_id": data.unique
-                                }
-                            else:
-                                # Создаем новую запись со статусом PENDING и пометкой об обновлении
-                                transformed_data = transform_1c_data(data)
-                                transformed_data["is_update"] = True
-                                transformed_data["status"] = UserStatus.PENDING
-                                
-                                # Используем временный unique_id с суффиксом для обхода UNIQUE constraint
-                                original_unique = transformed_data["unique_id"]
-                                temp_unique = f"{original_unique}_update_{int(time.time())}"
-                                transformed_data["unique_id"] = temp_unique
-                                
-                                try:
-                                    new_user = await user_service.create_user(transformed_data)
-                                    
-                                    api_logger.info(f"Пользователь создан как обновление: {original_unique}")
-                                    
-                                    return {
-                                        "success": True,
-                                        "message": "Сотрудник добавлен в список ожидающих обновления",
-                                        "user_id": new_user.id,
-                                        "is_update": True,
-                                        "unique_id": original_unique
-                                    }
-                                except Exception as create_error:
-                                    api_logger.error(f"Ошибка создания записи об обновлении: {create_error}")
-                                    raise HTTPException(
-                                        status_code=400,
-                                        detail={
-                                            "success": False,
-                                            "error_type": "update_creation_error",
-                                            "message": f"Ошибка создания записи об обновлении: {str(create_error)}"
-                                        }
-                                    )
-                    else:
-                        error_msg = f"Сотрудник с табельным номером {data.unique} уже существует, но не найден в системе"
-                else:
-                    error_msg = f"Ошибка данных: некорректная информация о сотруднике"
+                if "UNIQUE constraint failed: users.unique_id" not in str(e):
+                    raise
                 
-                api_logger.warning(f"Пользователь уже существует: {data.unique}")
-                raise HTTPException(
-                    status_code=400,
-                    detail={
-                        "success": False,
-                        "error_type": "duplicate_user",
-                        "message": error_msg,
-                        "details": f"Попробуйте использовать другой табельный номер или обновите существующую запись"
+                # Сотрудник уже есть: та же обработка, что и для пакета - прямое обновление
+                # неодобренного или изменения в pending_updates для одобренного
+                result = (await OneCImportService(repository).import_users([(0, transform_1c_data(data))]))[0]
+                
+                if result["status"] == "failed":
+                    api_logger.error(f"Ошибка обновления существующего пользователя {data.unique}: {result['error']}")
+                    raise HTTPException(
+                        status_code=400,
+                        detail={
+                            "success": False,
+                            "error_type": "update_creation_error",
+                            "message": result["error"]
+                        }
+                    )
+                
+                if result["status"] == "unchanged":
+                    api_logger.info(f"Данные пользователя {data.unique} не изменились")
+                    return {
+                        "success": True,
+                        "message": "Данные сотрудника не изменились",
+                        "user_id": result["user_id"],
+                        "unique_id": data.unique
                     }
-                )
+                
+                if result["status"] == "updated":
+                    api_logger.info(f"Пользователь обновлен: {data.unique}")
+                    return {
+                        "success": True,
+                        "message": "Сотрудник успешно обновлен в системе",
+                        "user_id": result["user_id"],
+                        "updated": True,
+                        "unique_id": data.unique
+                    }
+                
+                api_logger.info(f"Изменения пользователя {data.unique} ожидают подтверждения: {result['status']}")
+                return {
+                    "success": True,
+                    "message": (
+                        "Ожидающие изменения сотрудника обновлены новыми данными"
+                        if result["status"] == "update_updated"
+                        else "Сотрудник добавлен в список ожидающих обновления"
+                    ),
+                    "user_id": result["user_id"],
+                    "is_update": True,
+                    "unique_id": data.unique
+                }
         
     except HTTPException:
         raise
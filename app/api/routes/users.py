@@ -1,48 +1,116 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.exc import IntegrityError
-from app.infrastructure.database.database import get_db
-from app.infrastructure.database.user_repository_impl import SQLAlchemyUserRepository
-from app.domain.services.user_service import UserService
+from app.api.dependencies import (
+    get_ad_mirror_service, get_archive_service, get_export_service, get_ldap_service, get_user_service,
+)
+from app.domain.services.user_service import APPROVABLE_STATUSES, UserService
+from app.infrastructure.external.ldap_service import AD_EXPORT_COLUMNS, LDAPService
 from app.domain.services.export_service import ExportService
+from app.domain.services.archive_service import UserArchiveService
+from app.domain.services.ad_mirror_service import ADMirrorService
 from app.api.schemas.user_schemas import (
-    UserResponse, UserCreateRequest, CursorPaginatedUsersResponse, CursorPaginationInfo,
-    ChangePasswordRequest, ChangePhoneRequest, BlockUserCompleteRequest, 
+    UserResponse, UserCreateRequest, CursorPaginatedUsersResponse, UserStatsResponse,
+    BulkStatusRequest, BulkStatusResponse, BulkApproveRequest, BulkApproveResponse, BulkUpdateRequest, BulkUpdateResponse,
+    ChangePasswordRequest, ChangePhoneRequest, BlockUserCompleteRequest, BulkBlockRequest, BulkBlockResponse,
     AssignManagerRequest, TechnicalUserRequest, AdminResponse, CreateObjectRequest, UpdateTestAttributesRequest
 )
 from app.domain.entities.user import UserStatus
+from app.infrastructure.database.query_spec import parse_sort
+from app.infrastructure.database.pagination import InvalidCursorError, decode_change_token, encode_change_token
 from app.core.logging.logger import api_logger
-from datetime import datetime
+from datetime import date, datetime
 import io
+import os
+import orjson
 from app.core.config.settings import settings
 
 router = APIRouter(tags=["users"])
 
 
-def get_user_service(db: Session = Depends(get_db)) -> UserService:
-    repository = SQLAlchemyUserRepository(db)
-    return UserService(repository)
+def validate_sort(sort: Optional[str]) -> None:
+    """Проверка параметра сортировки списков"""
+    try:
+        parse_sort(sort)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "success": False,
+                "error_type": "validation_error",
+                "message": "Некорректный параметр сортировки",
+                "details": str(e)
+            }
+        )
+
+
+def invalid_cursor_error(error: InvalidCursorError) -> HTTPException:
+    """Ответ на курсор, который не прошел проверку подписи или не подходит к выборке"""
+    api_logger.warning(f"Отклонен курсор пагинации: {error}")
+    return HTTPException(
+        status_code=400,
+        detail={
+            "success": False,
+            "error_type": "validation_error",
+            "message": "Некорректный курсор пагинации",
+            "details": "Курсор поврежден или устарел. Загрузите список заново без cursor"
+        }
+    )
+
+
+def date_range_filters(
+    birth_date_from: Optional[date] = Query(None, description="Дата рождения с (включительно)"),
+    birth_date_to: Optional[date] = Query(None, description="Дата рождения по (включительно)"),
+    object_date_vihod_from: Optional[date] = Query(None, description="Дата выхода на объект с"),
+    object_date_vihod_to: Optional[date] = Query(None, description="Дата выхода на объект по"),
+    dismissal_date_from: Optional[date] = Query(None, description="Дата увольнения с"),
+    dismissal_date_to: Optional[date] = Query(None, description="Дата увольнения по"),
+) -> dict:
+    """Фильтры списков по диапазонам дат из 1C: поле -> (начало, конец)"""
+    ranges = {
+        "birth_date": (birth_date_from, birth_date_to),
+        "object_date_vihod": (object_date_vihod_from, object_date_vihod_to),
+        "dismissal_date": (dismissal_date_from, dismissal_date_to),
+    }
+    for field, (start, end) in ranges.items():
+        if start and end and start > end:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "success": False,
+                    "error_type": "validation_error",
+                    "message": "Некорректный диапазон дат",
+                    "details": f"{field}_from ({start}) позже {field}_to ({end})"
+                }
+            )
+    return {field: bounds for field, bounds in ranges.items() if any(bounds)}
 
 
-def get_export_service() -> ExportService:
-    return ExportService()
+def users_page_response(result: dict, total_loaded: int) -> Response:
+    """
+    Страница списка в JSON напрямую из строк БД, без промежуточных моделей.
+    Формат совпадает с CursorPaginatedUsersResponse
+    """
+    users = result['users']
+    content = orjson.dumps({
+        "users": users,
+        "pagination": {
+            "next_cursor": result['next_cursor'],
+            "has_more": result['has_more'],
+            "total_loaded": total_loaded + len(users),
+            "total_count": result.get('total_count')
+        }
+    })
+    return Response(content=content, media_type="application/json")
 
 
 def user_to_response(user) -> UserResponse:
     """Конвертирует User в UserResponse"""
-    import re
-    # Если это запись об обновлении, извлекаем оригинальный unique_id
-    unique_id = user.unique_id
-    if getattr(user, 'is_update', False) and user.unique_id:
-        match = re.match(r'^(.+?)_update_\d+$', user.unique_id)
-        if match:
-            unique_id = match.group(1)
-    
     return UserResponse(
         id=user.id,
-        unique_id=unique_id,
+        unique_id=user.unique_id,
         firstname=user.firstname,
         secondname=user.secondname,
         thirdname=user.thirdname,
@@ -64,7 +132,8 @@ def user_to_response(user) -> UserResponse:
         upload_date=user.upload_date or datetime.now(),
         created_at=user.created_at or datetime.now(),
         updated_at=user.updated_at or datetime.now(),
-        is_update=getattr(user, 'is_update', False)
+        is_update=getattr(user, 'is_update', False),
+        pending_changes=getattr(user, 'pending_changes', None)
     )
 
 
@@ -173,27 +242,282 @@ async def get_available_ous(
         )
 
 
+@router.get("/admin/ou-routing/preview", response_model=AdminResponse)
+async def preview_pending_ous(
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    OU, в которой будет создан каждый ожидающий одобрения пользователь, по текущим
+    правилам: распределение по OU и пользователи, для которых OU не найдена
+    """
+    try:
+        api_logger.info("Запрос предпросмотра OU для pending пользователей")
+        preview = await user_service.preview_pending_ous()
+        return AdminResponse(
+            success=True,
+            message=f"Pending пользователей: {preview['total']}, без подходящей OU: {preview['unresolved']}",
+            data=preview
+        )
+    except Exception as e:
+        api_logger.error(f"Ошибка предпросмотра OU: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "ou_routing_error",
+                "message": "Ошибка предпросмотра организационных единиц",
+                "details": str(e)
+            }
+        )
+
+
+@router.post("/admin/ou-routing/reload", response_model=AdminResponse)
+async def reload_ou_routing(
+    ldap_service: LDAPService = Depends(get_ldap_service)
+):
+    """
+    Перечитать правила выбора OU и реестр строительных объектов из файла.
+    Измененный файл подхватывается и без вызова, при следующем выборе OU
+    """
+    try:
+        api_logger.info("Запрос перезагрузки правил OU")
+        ldap_service.ou_router.reload()
+        metrics = ldap_service.ou_router.metrics()
+        return AdminResponse(
+            success=True,
+            message=f"Правила OU загружены: {metrics['rules']} правил, {metrics['construction_objects']} строительных объектов",
+            data=metrics
+        )
+    except Exception as e:
+        api_logger.error(f"Ошибка перезагрузки правил OU: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "success": False,
+                "error_type": "ou_routing_error",
+                "message": "Правила OU не загружены, действуют прежние",
+                "details": str(e)
+            }
+        )
+
+
+@router.get("/stats", response_model=UserStatsResponse)
+async def get_user_stats(
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Количество пользователей по статусам для дашбордов
+    """
+    try:
+        stats = await user_service.get_user_stats()
+        return UserStatsResponse(**stats)
+    except Exception as e:
+        api_logger.error(f"Ошибка получения статистики пользователей: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "database_error",
+                "message": "Ошибка получения статистики",
+                "details": str(e)
+            }
+        )
+
+
+@router.get("/changes")
+async def get_user_changes(
+    since: Optional[str] = Query(None, description="Токен из предыдущего ответа; без токена - все пользователи"),
+    limit: int = Query(10000, ge=1, le=50000, description="Максимум пользователей в ответе"),
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Лента изменений: пользователи, созданные или измененные после токена since,
+    в порядке изменений. Ответ - NDJSON: строка {"type": "user", ...} на каждого
+    пользователя и последняя строка {"type": "end", "next_since": ...} с токеном
+    для следующего запроса
+    """
+    since_seq = 0
+    if since:
+        since_seq = decode_change_token(since)
+        if since_seq is None:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "success": False,
+                    "error_type": "validation_error",
+                    "message": "Некорректный токен ленты изменений",
+                    "details": "Передайте next_since из предыдущего ответа или начните без since"
+                }
+            )
+
+    try:
+        until_seq = await user_service.get_change_sequence()
+    except Exception as e:
+        api_logger.error(f"Ошибка получения ленты изменений: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "database_error",
+                "message": "Ошибка получения ленты изменений",
+                "details": "Попробуйте повторить запрос позже"
+            }
+        )
+    if until_seq is None:
+        raise HTTPException(
+            status_code=501,
+            detail={
+                "success": False,
+                "error_type": "not_supported",
+                "message": "Лента изменений не поддерживается для этой базы данных",
+                "details": "Номера изменений ведутся триггерами SQLite"
+            }
+        )
+
+    api_logger.info(f"Запрос ленты изменений: since={since_seq}, until={until_seq}, limit={limit}")
+
+    async def lines():
+        count = 0
+        last_seq = since_seq
+        try:
+            async for batch in user_service.stream_changes(since_seq, until_seq, limit):
+                chunk = bytearray()
+                for user in batch:
+                    last_seq = user.pop("change_seq")
+                    chunk += orjson.dumps({"type": "user", "change_seq": last_seq, "user": user})
+                    chunk += b"\n"
+                count += len(batch)
+                yield bytes(chunk)
+        except Exception as e:
+            # Заголовки уже отправлены: сообщаем об ошибке строкой без нового токена
+            api_logger.error(f"Ошибка выгрузки ленты изменений после {last_seq}: {e}")
+            yield orjson.dumps({"type": "error", "message": "Ошибка выгрузки ленты изменений", "count": count}) + b"\n"
+            return
+
+        has_more = count == limit and last_seq < until_seq
+        next_seq = last_seq if has_more else max(until_seq, since_seq)
+        api_logger.info(f"Лента изменений выгружена: {count} пользователей, следующий номер {next_seq}")
+        yield orjson.dumps({
+            "type": "end",
+            "next_since": encode_change_token(next_seq),
+            "count": count,
+            "has_more": has_more,
+        }) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/bulk/status", response_model=BulkStatusResponse)
+async def bulk_change_status(
+    request: BulkStatusRequest,
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Массовая смена статуса: reject (ожидающие -> отклонены) или pending
+    (отклоненные -> ожидают). Набор задается списком ids или фильтром,
+    изменение выполняется одним запросом; в ответе результат по каждому id
+    """
+    filters = request.filter.model_dump(exclude_none=True) if request.filter else {}
+    if (request.ids is None) == (not filters):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "success": False,
+                "error_type": "validation_error",
+                "message": "Укажите либо список ids, либо непустой фильтр",
+                "details": "Поддерживаются фильтры status, search, upload_date_from, upload_date_to"
+            }
+        )
+    if "status" in filters:
+        filters["status_filter"] = filters.pop("status")
+    
+    try:
+        api_logger.info(f"Запрос массовой смены статуса: action={request.action}")
+        result = await user_service.bulk_change_status(request.action, request.ids, **filters)
+        return BulkStatusResponse(**result)
+    except Exception as e:
+        api_logger.error(f"Ошибка массовой смены статуса: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "database_error",
+                "message": "Ошибка массовой смены статуса",
+                "details": "Не удалось изменить статусы. Попробуйте повторить операцию позже"
+            }
+        )
+
+
+@router.post("/bulk/approve", response_model=BulkApproveResponse)
+async def bulk_approve_users(
+    request: BulkApproveRequest,
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Массовое одобрение: учетные записи создаются для всех переданных ids, имена
+    sAMAccountName подбираются для пачки сразу (занятые получают номер: ivan.petrov2).
+    В ответе результат по каждому id; неудачные возвращаются в статус pending
+    """
+    try:
+        api_logger.info(f"Запрос массового одобрения: {len(request.ids)} пользователей")
+        result = await user_service.bulk_approve(request.ids)
+        return BulkApproveResponse(**result)
+    except Exception as e:
+        api_logger.error(f"Ошибка массового одобрения: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "bulk_approve_error",
+                "message": "Ошибка массового одобрения",
+                "details": "Не удалось одобрить сотрудников. Попробуйте повторить операцию позже"
+            }
+        )
+
+
+@router.post("/bulk/update", response_model=BulkUpdateResponse)
+async def bulk_apply_updates(
+    request: BulkUpdateRequest,
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Применение ожидающих изменений из 1C (is_update) к списку сотрудников.
+    Руководители всей пачки находятся в AD заранее; в ответе результат по каждому id
+    """
+    try:
+        api_logger.info(f"Запрос массового применения изменений из 1C: {len(request.ids)} пользователей")
+        result = await user_service.bulk_apply_updates(request.ids)
+        return BulkUpdateResponse(**result)
+    except Exception as e:
+        api_logger.error(f"Ошибка массового применения изменений из 1C: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "update_error",
+                "message": "Ошибка массового применения изменений",
+                "details": "Не удалось применить изменения из 1C. Попробуйте повторить операцию позже"
+            }
+        )
+
+
 @router.get("/pending", response_model=CursorPaginatedUsersResponse)
 async def get_pending_users(
     cursor: Optional[str] = Query(None, description="Курсор для пагинации"),
     limit: int = Query(20, ge=1, le=100, description="Количество записей"),
     search: Optional[str] = Query(None, description="Поисковый запрос"),
     total_loaded: int = Query(0, ge=0, description="Общее количество загруженных записей"),
+    sort: Optional[str] = Query(None, description="Сортировка: поля через запятую, '-' для убывания (id, secondname, firstname, company, upload_date)"),
+    date_ranges: dict = Depends(date_range_filters),
     user_service: UserService = Depends(get_user_service)
 ):
+    validate_sort(sort)
     try:
         api_logger.info(f"Запрос pending пользователей: cursor={cursor}, limit={limit}, search={search}")
-        result = await user_service.get_pending_users_cursor(cursor, limit, search, total_loaded)
-        
-        users_response = [user_to_response(user) for user in result['users']]
-        pagination = CursorPaginationInfo(
-            next_cursor=result['next_cursor'],
-            has_more=result['has_more'],
-            total_loaded=total_loaded + len(users_response),
-            total_count=result.get('total_count')
-        )
-        
-        return CursorPaginatedUsersResponse(users=users_response, pagination=pagination)
+        result = await user_service.get_pending_users_cursor(cursor, limit, search, total_loaded, sort, as_rows=True, date_ranges=date_ranges)
+        return users_page_response(result, total_loaded)
+    except InvalidCursorError as e:
+        raise invalid_cursor_error(e)
     except Exception as e:
         api_logger.error(f"Ошибка получения pending пользователей: {e}")
         raise HTTPException(
@@ -213,21 +537,17 @@ async def get_dismissed_users(
     limit: int = Query(20, ge=1, le=100, description="Количество записей"),
     search: Optional[str] = Query(None, description="Поисковый запрос"),
     total_loaded: int = Query(0, ge=0, description="Общее количество загруженных записей"),
+    sort: Optional[str] = Query(None, description="Сортировка: поля через запятую, '-' для убывания (id, secondname, firstname, company, upload_date)"),
+    date_ranges: dict = Depends(date_range_filters),
     user_service: UserService = Depends(get_user_service)
 ):
+    validate_sort(sort)
     try:
         api_logger.info(f"Запрос dismissed пользователей: cursor={cursor}, limit={limit}, search={search}")
-        result = await user_service.get_dismissed_users_cursor(cursor, limit, search, total_loaded)
-        
-        users_response = [user_to_response(user) for user in result['users']]
-        pagination = CursorPaginationInfo(
-            next_cursor=result['next_cursor'],
-            has_more=result['has_more'],
-            total_loaded=total_loaded + len(users_response),
-            total_count=result.get('total_count')
-        )
-        
-        return CursorPaginatedUsersResponse(users=users_response, pagination=pagination)
+        result = await user_service.get_dismissed_users_cursor(cursor, limit, search, total_loaded, sort, as_rows=True, date_ranges=date_ranges)
+        return users_page_response(result, total_loaded)
+    except InvalidCursorError as e:
+        raise invalid_cursor_error(e)
     except Exception as e:
         api_logger.error(f"Ошибка получения dismissed пользователей: {e}")
         raise HTTPException(
@@ -248,21 +568,18 @@ async def search_users(
     limit: int = Query(20, ge=1, le=100, description="Количество записей"),
     status: Optional[UserStatus] = Query(None, description="Фильтр по статусу"),
     total_loaded: int = Query(0, ge=0, description="Общее количество загруженных записей"),
+    sort: Optional[str] = Query(None, description="Сортировка: поля через запятую, '-' для убывания (id, secondname, firstname, company, upload_date)"),
+    date_ranges: dict = Depends(date_range_filters),
+    include_archive: bool = Query(False, description="Искать также в архиве уволенных и отклоненных"),
     user_service: UserService = Depends(get_user_service)
 ):
+    validate_sort(sort)
     try:
-        api_logger.info(f"Поиск пользователей: query='{query}', cursor={cursor}, limit={limit}, status={status}")
-        result = await user_service.search_users_cursor(query, cursor, limit, status, total_loaded)
-        
-        users_response = [user_to_response(user) for user in result['users']]
-        pagination = CursorPaginationInfo(
-            next_cursor=result['next_cursor'],
-            has_more=result['has_more'],
-            total_loaded=total_loaded + len(users_response),
-            total_count=result.get('total_count')
-        )
-        
-        return CursorPaginatedUsersResponse(users=users_response, pagination=pagination)
+        api_logger.info(f"Поиск пользователей: query='{query}', cursor={cursor}, limit={limit}, status={status}, архив={include_archive}")
+        result = await user_service.search_users_cursor(query, cursor, limit, status, total_loaded, sort, as_rows=True, date_ranges=date_ranges, include_archive=include_archive)
+        return users_page_response(result, total_loaded)
+    except InvalidCursorError as e:
+        raise invalid_cursor_error(e)
     except Exception as e:
         api_logger.error(f"Ошибка поиска пользователей: {e}")
         raise HTTPException(
@@ -283,21 +600,17 @@ async def get_all_users(
     search: Optional[str] = Query(None, description="Поисковый запрос"),
     status: Optional[UserStatus] = Query(None, description="Фильтр по статусу"),
     total_loaded: int = Query(0, ge=0, description="Общее количество загруженных записей"),
+    sort: Optional[str] = Query(None, description="Сортировка: поля через запятую, '-' для убывания (id, secondname, firstname, company, upload_date)"),
+    date_ranges: dict = Depends(date_range_filters),
     user_service: UserService = Depends(get_user_service)
 ):
+    validate_sort(sort)
     try:
         api_logger.info(f"Запрос всех пользователей: cursor={cursor}, limit={limit}, search={search}, status={status}")
-        result = await user_service.get_all_users_cursor(cursor, limit, search, status, total_loaded)
-        
-        users_response = [user_to_response(user) for user in result['users']]
-        pagination = CursorPaginationInfo(
-            next_cursor=result['next_cursor'],
-            has_more=result['has_more'],
-            total_loaded=total_loaded + len(users_response),
-            total_count=result.get('total_count')
-        )
-        
-        return CursorPaginatedUsersResponse(users=users_response, pagination=pagination)
+        result = await user_service.get_all_users_cursor(cursor, limit, search, status, total_loaded, sort, as_rows=True, date_ranges=date_ranges)
+        return users_page_response(result, total_loaded)
+    except InvalidCursorError as e:
+        raise invalid_cursor_error(e)
     except Exception as e:
         api_logger.error(f"Ошибка получения всех пользователей: {e}")
         raise HTTPException(
@@ -315,6 +628,7 @@ async def get_all_users(
 async def export_users_to_xlsx(
     status: Optional[UserStatus] = Query(None, description="Фильтр по статусу"),
     search: Optional[str] = Query(None, description="Поисковый запрос"),
+    date_ranges: dict = Depends(date_range_filters),
     user_service: UserService = Depends(get_user_service),
     export_service: ExportService = Depends(get_export_service)
 ):
@@ -322,18 +636,10 @@ async def export_users_to_xlsx(
     Экспорт пользователей в XLSX файл
     """
     try:
-        api_logger.info(f"Запрос экспорта в XLSX: status={status}, search={search}")
-        
-        users = await user_service.get_all_users()
+        api_logger.info(f"Запрос экспорта в XLSX: status={status}, search={search}, даты={date_ranges}")
         
-        if status:
-            users = [u for u in users if u.status == status]
-            api_logger.info(f"Применен фильтр по статусу: {status}, осталось {len(users)} пользователей")
-        
-        if search:
-            users = [u for u in users if search.lower() in 
-                    f"{u.firstname} {u.secondname} {u.thirdname or ''} {u.unique_id}".lower()]
-            api_logger.info(f"Применен поисковый фильтр: '{search}', осталось {len(users)} пользователей")
+        # Статус, поиск и диапазоны дат фильтруются в запросе к БД
+        users = await user_service.get_users_for_export(status, search, date_ranges)
         
         excel_data = export_service.export_users_to_xlsx(users, status.value if status else None)
         
@@ -370,21 +676,59 @@ async def approve_user(
     try:
         api_logger.info(f"Запрос одобрения пользователя ID: {user_id}")
         
-        user = await user_service.user_repository.get_user_by_id(user_id)
+        # Переводим в "В процессе создания" одной командой; меняется только ожидающая
+        # одобрения строка (строка в CREATING уже одобряется параллельно)
+        user = await user_service.user_repository.update_status(
+            user_id, UserStatus.CREATING, expected_status=APPROVABLE_STATUSES
+        )
         if not user:
-            api_logger.warning(f"Пользователь с ID {user_id} не найден")
+            current = await user_service.user_repository.get_user_by_id(user_id)
+            if not current:
+                api_logger.warning(f"Пользователь с ID {user_id} не найден")
+                raise HTTPException(
+                    status_code=404,
+                    detail={
+                        "success": False,
+                        "error_type": "user_not_found",
+                        "message": "Сотрудник не найден",
+                        "details": f"Сотрудник с ID {user_id} не существует в системе"
+                    }
+                )
+            if current.status == UserStatus.CREATING:
+                api_logger.warning(f"Пользователь {user_id} уже в процессе создания учетных записей")
+                raise HTTPException(
+                    status_code=409,
+                    detail={
+                        "success": False,
+                        "error_type": "status_conflict",
+                        "message": "Учетные записи сотрудника уже создаются",
+                        "details": f"Сотрудник с ID {user_id} уже одобряется. Дождитесь завершения операции"
+                    }
+                )
+            api_logger.warning(f"Пользователь {user_id} не ожидает одобрения: статус {current.status}")
             raise HTTPException(
-                status_code=404,
+                status_code=409,
                 detail={
                     "success": False,
-                    "error_type": "user_not_found",
-                    "message": "Сотрудник не найден",
-                    "details": f"Сотрудник с ID {user_id} не существует в системе"
+                    "error_type": "status_conflict",
+                    "message": "Сотрудник не ожидает одобрения",
+                    "details": f"Одобрить можно только сотрудника в статусе pending, текущий статус: {current.status.value}"
+                }
+            )
+        if user.is_update:
+            # Ожидающие изменения из 1C у существующего сотрудника применяются через
+            # PUT /{user_id}/update: скрипты создания изменили бы его учетные записи
+            await user_service.user_repository.update_status(user_id, UserStatus.PENDING, expected_status=UserStatus.CREATING)
+            api_logger.warning(f"Пользователь {user_id} ожидает применения изменений из 1C, а не одобрения")
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "success": False,
+                    "error_type": "status_conflict",
+                    "message": "Сотрудник ожидает применения изменений из 1C",
+                    "details": f"Учетные записи сотрудника с ID {user_id} уже созданы. Примените изменения через PUT /api/users/{user_id}/update"
                 }
             )
-        
-        # Устанавливаем статус "В процессе создания"
-        await user_service.user_repository.update_status(user_id, UserStatus.CREATING)
         api_logger.info(f"Статус пользователя {user_id} обновлен на CREATING")
         
         # Ждем результат создания учетных записей с таймаутом
@@ -398,7 +742,7 @@ async def approve_user(
             
             if not result["success"]:
                 # Откатываем статус при ошибке
-                await user_service.user_repository.update_status(user_id, UserStatus.PENDING)
+                await user_service.user_repository.update_status(user_id, UserStatus.PENDING, expected_status=UserStatus.CREATING)
                 api_logger.error(f"Ошибка создания учетных записей для пользователя {user_id}: {result.get('stderr', 'Неизвестная ошибка')}")
                 
                 # Возвращаем ошибку клиенту
@@ -413,12 +757,12 @@ async def approve_user(
                 )
             else:
                 # Успешно создано - переводим в APPROVED
-                await user_service.user_repository.update_status(user_id, UserStatus.APPROVED)
+                updated_user = await user_service.user_repository.update_status(user_id, UserStatus.APPROVED, expected_status=UserStatus.CREATING)
                 api_logger.info(f"Учетные записи для пользователя {user_id} созданы успешно")
                 
         except asyncio.TimeoutError:
             # Таймаут - откатываем статус
-            await user_service.user_repository.update_status(user_id, UserStatus.PENDING)
+            await user_service.user_repository.update_status(user_id, UserStatus.PENDING, expected_status=UserStatus.CREATING)
             api_logger.error(f"Таймаут создания учетных записей для пользователя {user_id} (превышено 45 секунд)")
             
             raise HTTPException(
@@ -432,8 +776,7 @@ async def approve_user(
             )
         
         api_logger.info(f"Пользователь {user_id} успешно одобрен и создан в AD")
-        updated_user = await user_service.user_repository.get_user_by_id(user_id)
-        return user_to_response(updated_user)
+        return user_to_response(updated_user or await user_service.user_repository.get_user_by_id(user_id))
             
     except HTTPException:
         raise
@@ -543,17 +886,17 @@ async def dismiss_user(
                 }
             )
         
-        await user_service.user_repository.update_status(user_id, UserStatus.DISMISSED)
+        updated_user = await user_service.user_repository.update_status(user_id, UserStatus.DISMISSED)
         api_logger.info(f"Статус пользователя {user_id} обновлен на DISMISSED")
         
         result = await user_service.ldap_service.block_user(user.unique_id)
         
         if result["success"]:
             api_logger.info(f"Пользователь {user_id} успешно уволен и заблокирован в AD")
-            updated_user = await user_service.user_repository.get_user_by_id(user_id)
             return user_to_response(updated_user)
         else:
-            await user_service.user_repository.update_status(user_id, user.status)
+            # Возвращаем прежний статус, только если его не сменили параллельно
+            await user_service.user_repository.update_status(user_id, user.status, expected_status=UserStatus.DISMISSED)
             api_logger.error(f"Ошибка блокировки пользователя {user_id} в AD: {result['stderr']}")
             
             raise HTTPException(
@@ -587,7 +930,7 @@ async def update_user(
     user_service: UserService = Depends(get_user_service)
 ):
     """
-    Обновление существующего пользователя данными из записи об обновлении
+    Применение ожидающих изменений из 1C к сотруднику (is_update)
     """
     try:
         api_logger.info(f"Запрос обновления пользователя ID: {user_id}")
@@ -595,14 +938,14 @@ async def update_user(
         updated_user = await user_service.update_existing_user(user_id)
         
         if not updated_user:
-            api_logger.warning(f"Пользователь с ID {user_id} не найден или не является записью об обновлении")
+            api_logger.warning(f"Пользователь с ID {user_id} не найден или не ожидает изменений из 1C")
             raise HTTPException(
                 status_code=404,
                 detail={
                     "success": False,
                     "error_type": "user_not_found",
-                    "message": "Запись об обновлении не найдена",
-                    "details": f"Запись с ID {user_id} не существует или не является записью об обновлении"
+                    "message": "Изменения для сотрудника не найдены",
+                    "details": f"Сотрудник с ID {user_id} не существует или не ожидает изменений из 1C"
                 }
             )
         
@@ -624,6 +967,127 @@ async def update_user(
         )
 
 
+@router.get("/admin/storage", response_model=AdminResponse)
+async def get_storage_stats(
+    archive_service: UserArchiveService = Depends(get_archive_service)
+):
+    """
+    Размеры основной (hot) и архивной (cold) таблиц пользователей и свободные страницы файла БД
+    """
+    try:
+        api_logger.info("Запрос размеров таблиц пользователей")
+        stats = await archive_service.get_storage_stats()
+        return AdminResponse(
+            success=True,
+            message=f"Основная таблица: {stats['hot']['rows']} записей, архив: {stats['cold']['rows']} записей",
+            data=stats
+        )
+    except Exception as e:
+        api_logger.error(f"Ошибка получения размеров таблиц: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "database_error",
+                "message": "Ошибка получения размеров таблиц",
+                "details": str(e)
+            }
+        )
+
+
+@router.post("/admin/storage/vacuum", response_model=AdminResponse)
+async def vacuum_storage(
+    pages: Optional[int] = Query(None, ge=1, description="Максимум страниц за вызов; по умолчанию все свободные"),
+    archive_service: UserArchiveService = Depends(get_archive_service)
+):
+    """
+    Incremental VACUUM: возврат свободных страниц (например, после архивирования)
+    операционной системе. Первый вызов на базе без auto_vacuum = INCREMENTAL
+    включает этот режим полным VACUUM
+    """
+    try:
+        api_logger.info(f"Запрос incremental vacuum: pages={pages}")
+        result = await archive_service.incremental_vacuum(pages)
+    except Exception as e:
+        api_logger.error(f"Ошибка incremental vacuum: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "database_error",
+                "message": "Ошибка очистки файла базы данных",
+                "details": str(e)
+            }
+        )
+    if result is None:
+        raise HTTPException(
+            status_code=501,
+            detail={
+                "success": False,
+                "error_type": "not_supported",
+                "message": "Incremental vacuum поддерживается только для SQLite",
+                "details": "Для других СУБД используйте штатное обслуживание"
+            }
+        )
+    return AdminResponse(
+        success=True,
+        message=f"Освобождено страниц: {result['freed_pages']}",
+        data=result
+    )
+
+
+@router.get("/admin/ldap/metrics", response_model=AdminResponse)
+async def get_ldap_metrics(
+    ldap_service: LDAPService = Depends(get_ldap_service)
+):
+    """
+    Метрики работы с AD: пулы подключений (LDAP и LDAPS для паролей) с временем
+    ожидания и длительностью операций, снимок схемы, попадания в кэш DN и зеркало AD
+    """
+    metrics = ldap_service.get_metrics()
+    pools = ", ".join(
+        f"{name}: {metrics[name]['open']} из {metrics[name]['size']}, занято {metrics[name]['in_use']}"
+        for name in ("ldap", "ldaps")
+    )
+    mirror = metrics['ad_mirror']
+    mirror_state = f"актуально, отставание {mirror['lag_seconds']} с" if mirror['fresh'] else "не используется"
+    return AdminResponse(
+        success=True,
+        message=f"{pools}; кэш DN: {metrics['dn_cache']['size']} записей; зеркало AD: {mirror_state}",
+        data=metrics
+    )
+
+
+@router.post("/admin/ad-mirror/sync", response_model=AdminResponse)
+async def sync_ad_mirror(
+    full: bool = Query(False, description="Полная выгрузка вместо изменений с последней синхронизации"),
+    mirror_service: ADMirrorService = Depends(get_ad_mirror_service)
+):
+    """
+    Внеочередная синхронизация зеркала пользователей, групп и OU из AD.
+    Без full загружаются только объекты, измененные после последней синхронизации (uSNChanged)
+    """
+    try:
+        api_logger.info(f"Запрос синхронизации зеркала AD: full={full}")
+        result = await mirror_service.sync(full=full)
+        return AdminResponse(
+            success=True,
+            message=f"Зеркало AD синхронизировано: изменено {result['changed']}, удалено {result['deleted']}",
+            data=result
+        )
+    except Exception as e:
+        api_logger.error(f"Ошибка синхронизации зеркала AD: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "ldap_error",
+                "message": "Ошибка синхронизации зеркала AD",
+                "details": str(e)
+            }
+        )
+
+
 @router.put("/admin/change-password", response_model=AdminResponse)
 async def change_password(
     request: ChangePasswordRequest,
@@ -706,7 +1170,7 @@ async def export_users_from_ad(
         return AdminResponse(
             success=True,
             message="Пользователи успешно экспортированы из Active Directory",
-            details=result
+            data=result
         )
         
     except Exception as e:
@@ -722,6 +1186,85 @@ async def export_users_from_ad(
         )
 
 
+AD_EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+@router.get("/admin/export-ad")
+async def stream_users_from_ad(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|xlsx)$", description="Формат файла: ndjson, csv или xlsx"),
+    user_service: UserService = Depends(get_user_service),
+    export_service: ExportService = Depends(get_export_service)
+):
+    """
+    Потоковый экспорт пользователей из AD. Каталог читается постранично
+    (Simple Paged Results), страницы сразу отправляются клиенту, поэтому память
+    не зависит от числа пользователей. XLSX собирается во временном файле
+    """
+    api_logger.info(f"Запрос потокового экспорта пользователей из AD: format={format}")
+    filename = f"ad_users_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    pages = user_service.iter_users_from_ad()
+    try:
+        if format == "xlsx":
+            try:
+                path = await export_service.write_rows_xlsx(pages, AD_EXPORT_COLUMNS, "Пользователи AD")
+            finally:
+                await pages.aclose()
+            return FileResponse(
+                path,
+                media_type=AD_EXPORT_MEDIA_TYPES[format],
+                headers=headers,
+                background=BackgroundTask(os.remove, path)
+            )
+        # Первая страница читается до ответа: ошибка подключения к AD вернется кодом 500, а не оборванным потоком
+        try:
+            first_page = await pages.__anext__()
+        except StopAsyncIteration:
+            first_page = None
+    except Exception as e:
+        await pages.aclose()
+        api_logger.error(f"Ошибка экспорта пользователей из AD: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "export_error",
+                "message": "Ошибка экспорта пользователей",
+                "details": f"Не удалось экспортировать пользователей из AD: {str(e)}"
+            }
+        )
+
+    async def remaining_pages():
+        if first_page:
+            yield first_page
+        async for page in pages:
+            yield page
+
+    if format == "csv":
+        body = export_service.stream_rows_csv(remaining_pages(), AD_EXPORT_COLUMNS)
+    else:
+        body = export_service.stream_rows_ndjson(remaining_pages())
+
+    async def content():
+        try:
+            async for chunk in body:
+                yield chunk
+        except Exception as e:
+            api_logger.error(f"Ошибка потокового экспорта из AD: {e}")
+            if format != "ndjson":
+                raise
+            # Заголовки уже отправлены: сообщаем об ошибке последней строкой
+            yield orjson.dumps({"type": "error", "message": "Ошибка экспорта пользователей из AD"}) + b"\n"
+        finally:
+            await pages.aclose()
+
+    return StreamingResponse(content(), media_type=AD_EXPORT_MEDIA_TYPES[format], headers=headers)
+
+
 @router.put("/admin/block-complete", response_model=AdminResponse)
 async def block_user_complete(
     request: BlockUserCompleteRequest,
@@ -755,6 +1298,32 @@ async def block_user_complete(
         )
 
 
+@router.post("/admin/block-complete/bulk", response_model=BulkBlockResponse)
+async def bulk_block_users(
+    request: BulkBlockRequest,
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Полная блокировка пачки уволенных: удаление из групп, отключение и перемещение
+    в OU "Уволенные сотрудники" с результатом по каждому сотруднику и шагу
+    """
+    try:
+        api_logger.info(f"Запрос массовой полной блокировки: {len(request.unique_ids)} сотрудников")
+        result = await user_service.bulk_block_users(request.unique_ids)
+        return BulkBlockResponse(**result)
+    except Exception as e:
+        api_logger.error(f"Ошибка массовой полной блокировки: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "success": False,
+                "error_type": "block_complete_error",
+                "message": "Ошибка массовой полной блокировки",
+                "details": f"Не удалось заблокировать сотрудников: {str(e)}"
+            }
+        )
+
+
 @router.put("/admin/assign-manager", response_model=AdminResponse)
 async def assign_manager(
     request: AssignManagerRequest,
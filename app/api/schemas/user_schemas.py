@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+from typing import List, Literal, Optional, Dict, Any
+from pydantic import BaseModel, Field
 from app.domain.entities.user import UserStatus
 
 
@@ -76,6 +76,8 @@ class UserResponse(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     is_update: bool = False
+    # Изменения из 1C, ожидающие подтверждения (для is_update)
+    pending_changes: Optional[Dict[str, Any]] = None
 
     class Config:
         from_attributes = True
@@ -97,6 +99,80 @@ class CursorPaginatedUsersResponse(BaseModel):
     pagination: CursorPaginationInfo
 
 
+class UserStatsResponse(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+
+
+class BulkStatusFilter(BaseModel):
+    status: Optional[UserStatus] = None
+    search: Optional[str] = None
+    upload_date_from: Optional[datetime] = None
+    upload_date_to: Optional[datetime] = None
+
+
+class BulkStatusRequest(BaseModel):
+    action: Literal["reject", "pending"]
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+    filter: Optional[BulkStatusFilter] = None
+
+
+class BulkStatusItem(BaseModel):
+    id: int
+    outcome: Literal["updated", "not_found", "status_conflict"]
+    status: Optional[UserStatus] = None
+
+
+class BulkStatusResponse(BaseModel):
+    success: bool
+    action: str
+    target_status: UserStatus
+    updated: int
+    skipped: int
+    results: List[BulkStatusItem]
+
+
+class BulkApproveRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=500)
+
+
+class BulkApproveItem(BaseModel):
+    id: int
+    outcome: Literal["approved", "failed", "not_found", "status_conflict"]
+    status: Optional[UserStatus] = None
+    sam_account_name: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkApproveResponse(BaseModel):
+    success: bool
+    approved: int
+    failed: int
+    skipped: int
+    results: List[BulkApproveItem]
+
+
+class BulkUpdateRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class BulkUpdateItem(BaseModel):
+    id: int
+    outcome: Literal["updated", "no_pending_update", "failed"]
+    status: Optional[UserStatus] = None
+    ad_error: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkUpdateResponse(BaseModel):
+    success: bool
+    updated: int
+    ad_errors: int
+    failed: int
+    skipped: int
+    results: List[BulkUpdateItem]
+
+
 # Схемы для администрирования
 class ChangePasswordRequest(BaseModel):
     username: str
@@ -112,6 +188,36 @@ class BlockUserCompleteRequest(BaseModel):
     unique_id: str
 
 
+class BulkBlockRequest(BaseModel):
+    unique_ids: List[str] = Field(..., min_length=1, max_length=1000)
+
+
+class BulkBlockGroupError(BaseModel):
+    group: str
+    error: str
+
+
+class BulkBlockItem(BaseModel):
+    unique_id: str
+    outcome: Literal["blocked", "partial", "failed", "not_found"]
+    sam_account_name: Optional[str] = None
+    groups_removed: int = 0
+    groups_failed: List[BulkBlockGroupError] = []
+    disabled: bool = False
+    moved: bool = False
+    error: Optional[str] = None
+
+
+class BulkBlockResponse(BaseModel):
+    success: bool
+    blocked: int
+    partial: int
+    failed: int
+    not_found: int
+    elapsed_seconds: float
+    results: List[BulkBlockItem]
+
+
 class AssignManagerRequest(BaseModel):
     employee_id: str
     manager_id: str
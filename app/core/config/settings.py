@@ -14,6 +14,8 @@ class Settings(BaseSettings):
     
     # Настройки базы данных
     database_url: str = "sqlite:///./data/users.db"
+    # URL для асинхронного движка; если не задан, выводится из database_url
+    database_async_url: Optional[str] = None
     
     # Active Directory настройки
     ad_domain: str = "central.st-ing.com"
@@ -37,6 +39,15 @@ class Settings(BaseSettings):
     # 1C интеграция
     onec_endpoint: str = "/api/oneC/receive"
     onec_allowed_origins: Union[str, List[str]] = "172.17.177.57:3048,localhost:3048,user-management.yourdomain.com,https://user-management.yourdomain.com"
+    # Строк 1C на одну транзакцию при пакетной загрузке
+    onec_import_chunk_size: int = 500
+    
+    # Архивирование: уволенные и отклоненные пользователи без изменений дольше
+    # users_archive_after_days переносятся фоновой задачей в users_archive
+    users_archive_enabled: bool = True
+    users_archive_after_days: int = 180
+    users_archive_interval_minutes: int = 60
+    users_archive_batch_size: int = 1000
     
     # CORS настройки
     cors_origins: Union[str, List[str]] = "http://localhost,http://localhost:3000,https://user-management.yourdomain.com,https://www.user-management.yourdomain.com"
@@ -61,11 +72,23 @@ class Settings(BaseSettings):
     # Настройки пагинации
     default_page_size: int = 20
     max_page_size: int = 100
+    # Ключ подписи курсоров пагинации; если не задан, берется из файла ключа,
+    # который создается при первой выдаче курсора (курсоры действуют после перезапуска)
+    cursor_secret_key: Optional[str] = None
+    cursor_secret_key_path: str = "./data/cursor_secret.key"
     
     # Настройки экспорта
     export_max_records: int = 10000
     
     ldap_timeout: int = 30
+    # Пул подключений к AD: количество привязанных подключений (и потоков для
+    # операций ldap3) и простой, после которого подключение проверяется перед использованием
+    ldap_pool_size: int = 4
+    ldap_pool_max_idle_seconds: int = 300
+    # Отдельный пул LDAPS (636) для установки и смены паролей
+    ldaps_pool_size: int = 2
+    # TCP keepalive подключений пулов: проба после стольких секунд простоя
+    ldap_keepalive_seconds: int = 60
     winrm_timeout: int = 30
     smtp_timeout: int = 30
     max_retry_attempts: int = 3
@@ -79,6 +102,28 @@ class Settings(BaseSettings):
     ldap_base_dn: str = "DC=central,DC=st-ing,DC=com"
     ldap_user_ou: str = "OU=Users,DC=central,DC=st-ing,DC=com"
     ldap_dismissed_ou: str = "OU=Уволенные сотрудники,DC=central,DC=st-ing,DC=com"
+    # Снимок схемы AD и DSA info: загружается при запуске, чтобы привязки не читали
+    # схему с сервера; обновляется в фоне, когда снимок старше TTL
+    ldap_schema_cache_path: str = "./data/ldap_schema.json"
+    ldap_schema_cache_ttl_hours: int = 24
+    # Размер страницы постраничного поиска (MaxPageSize AD по умолчанию - 1000)
+    ldap_page_size: int = 1000
+    # Кэш DN групп и пользователей (по pager и sAMAccountName)
+    ldap_dn_cache_ttl_seconds: int = 900
+    ldap_dn_cache_max_entries: int = 5000
+    # Имен в одном OR-фильтре при проверке занятости sAMAccountName перед созданием
+    ldap_filter_chunk_size: int = 50
+    # Правила выбора OU для новых пользователей и реестр строительных объектов;
+    # файл перечитывается при изменении, перезапуск не нужен
+    ou_routing_path: str = "./app/core/config/ou_routing.json"
+    # Зеркало пользователей, групп и OU из AD в таблице ad_objects: фоновая
+    # синхронизация по uSNChanged раз в ad_mirror_interval_seconds, полная выгрузка
+    # раз в ad_mirror_full_sync_hours. Чтения обслуживаются из зеркала, пока оно не
+    # старше ad_mirror_max_staleness_seconds, иначе - запросом к AD
+    ad_mirror_enabled: bool = True
+    ad_mirror_interval_seconds: int = 300
+    ad_mirror_max_staleness_seconds: int = 900
+    ad_mirror_full_sync_hours: int = 24
     
     # Настройки WinRM для выполнения PowerShell на Windows сервере
     winrm_server: Optional[str] = None  # Если не указан, используется ad_server
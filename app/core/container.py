@@ -0,0 +1,54 @@
+"""Сервисы на время жизни приложения: создаются при запуске и закрываются при остановке"""
+from typing import Optional
+
+from app.domain.services.export_service import ExportService
+from app.infrastructure.external.exchange_service import ExchangeService
+from app.infrastructure.external.ldap_service import LDAPService
+from app.infrastructure.external.winrm_service import WinRMService
+from app.core.logging.logger import app_logger
+
+
+class ServiceContainer:
+    """
+    Общие экземпляры сервисов без состояния запроса и клиентов внешних систем
+    (AD, Exchange, WinRM). На запрос создаются только сессия БД и репозиторий
+    """
+
+    def __init__(self):
+        self.ldap_service = LDAPService()
+        self.winrm_service = WinRMService()
+        self.exchange_service = ExchangeService(self.ldap_service, self.winrm_service)
+        self.export_service = ExportService()
+        app_logger.info("Контейнер сервисов создан")
+
+    async def close(self) -> None:
+        """Освобождение подключений к внешним системам"""
+        self.ldap_service.close()
+        app_logger.info("Контейнер сервисов закрыт")
+
+
+_container: Optional[ServiceContainer] = None
+
+
+def init_container() -> ServiceContainer:
+    """Создание контейнера при запуске приложения"""
+    global _container
+    if _container is None:
+        _container = ServiceContainer()
+    return _container
+
+
+def get_container() -> ServiceContainer:
+    """
+    Контейнер приложения. Если приложение запущено без событий startup
+    (ASGI-клиент в бенчмарках и скриптах), контейнер создается при первом обращении
+    """
+    return _container or init_container()
+
+
+async def close_container() -> None:
+    """Закрытие контейнера при остановке приложения"""
+    global _container
+    if _container is not None:
+        await _container.close()
+        _container = None
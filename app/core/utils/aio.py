@@ -0,0 +1,17 @@
+"""Вспомогательные функции asyncio, совместимые с Python 3.9"""
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, TypeVar
+
+T = TypeVar("T")
+
+
+@asynccontextmanager
+async def aclosing(generator: T) -> AsyncIterator[T]:
+    """
+    Закрывает асинхронный генератор при выходе из блока, в том числе при раннем
+    выходе из цикла (замена contextlib.aclosing, появившегося в Python 3.10)
+    """
+    try:
+        yield generator
+    finally:
+        await generator.aclose()
@@ -0,0 +1,32 @@
+"""Разбор дат, которые 1C присылает строками"""
+from datetime import date, datetime
+from typing import Optional
+
+# Форматы дат из 1C: ISO (с временем или без) и русский ДД.ММ.ГГГГ
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%Y%m%d")
+
+
+def parse_date(value) -> Optional[date]:
+    """
+    Дата из строки 1C; None для пустых, нераспознанных значений
+    и "пустой даты" 1C (0001-01-01)
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value if value.year > 1 else None
+
+    text = str(value).strip()
+    if not text:
+        return None
+    # Время, если оно есть, отбрасываем: "2025-01-20T00:00:00", "20.01.2025 0:00:00"
+    text = text.replace("T", " ").split(" ", 1)[0]
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+        return parsed if parsed.year > 1 else None
+    return None
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, Optional
 from pydantic import BaseModel
 
 
@@ -12,6 +12,14 @@ class UserStatus(str, Enum):
     DISMISSED = "dismissed" 
 
 
+# Поля, которые изменения из 1C меняют у уже одобренного сотрудника
+# (хранятся в pending_updates до подтверждения администратором)
+PENDING_UPDATE_FIELDS = (
+    "firstname", "secondname", "thirdname", "company", "department", "otdel",
+    "appointment", "work_phone", "mobile_phone", "current_location_id", "boss_id", "is_engineer",
+)
+
+
 class User(BaseModel):
     id: Optional[int] = None
     unique_id: str  # pager ID из 1С
@@ -37,6 +45,8 @@ class User(BaseModel):
     created_at: datetime = datetime.now()
     updated_at: datetime = datetime.now()
     is_update: bool = False
+    # Ожидающие подтверждения изменения из 1C (только для is_update)
+    pending_changes: Optional[Dict[str, Any]] = None
 
     class Config:
         from_attributes = True
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
 from app.domain.entities.user import User, UserStatus
 
 
@@ -15,8 +16,16 @@ class UserRepository(ABC):
         pass
 
     @abstractmethod
-    async def update_status(self, user_id: int, status: UserStatus) -> Optional[User]:
-        """Обновление статуса пользователя"""
+    async def get_users_by_ids(self, ids: List[int]) -> List[User]:
+        """Пользователи по списку ID одним запросом"""
+        pass
+
+    @abstractmethod
+    async def update_status(self, user_id: int, status: UserStatus, expected_status: Optional[Union[UserStatus, Iterable[UserStatus]]] = None) -> Optional[User]:
+        """
+        Обновление статуса пользователя. С expected_status статус меняется, только
+        если текущий совпадает с ожидаемым; иначе возвращается None
+        """
         pass
 
     @abstractmethod
@@ -25,22 +34,27 @@ class UserRepository(ABC):
         pass
 
     @abstractmethod
-    async def get_pending_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0) -> dict:
+    async def get_users_filtered(self, status: Optional[UserStatus] = None, search: Optional[str] = None, date_ranges: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None) -> List[User]:
+        """Пользователи по статусу, поиску и диапазонам дат"""
+        pass
+
+    @abstractmethod
+    async def get_pending_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None) -> dict:
         """Получение пользователей ожидающих одобрения с курсорной пагинацией"""
         pass
 
     @abstractmethod
-    async def get_dismissed_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0) -> dict:
+    async def get_dismissed_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None) -> dict:
         """Получение уволенных пользователей с курсорной пагинацией"""
         pass
 
     @abstractmethod
-    async def search_users_cursor(self, query: str, cursor: Optional[str] = None, limit: int = 20, total_loaded: int = 0) -> dict:
-        """Поиск пользователей с курсорной пагинацией"""
+    async def search_users_cursor(self, query: str, cursor: Optional[str] = None, limit: int = 20, status: Optional[UserStatus] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None, include_archive: bool = False) -> dict:
+        """Поиск пользователей с курсорной пагинацией (с архивом только при include_archive)"""
         pass
 
     @abstractmethod
-    async def get_all_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, status: Optional[UserStatus] = None, total_loaded: int = 0) -> dict:
+    async def get_all_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, status: Optional[UserStatus] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[Dict[str, Tuple[Optional[date], Optional[date]]]] = None) -> dict:
         """Получение всех пользователей с курсорной пагинацией"""
         pass
 
@@ -49,6 +63,11 @@ class UserRepository(ABC):
         """Получение всех пользователей ожидающих одобрения"""
         pass
 
+    @abstractmethod
+    async def get_pending_routing_rows(self) -> List[dict]:
+        """Поля pending пользователей, от которых зависит OU в AD (id, unique_id, ФИО, otdel, объект, is_engineer)"""
+        pass
+
     @abstractmethod
     async def get_all_dismissed(self) -> List[User]:
         """Получение всех уволенных пользователей"""
@@ -59,6 +78,75 @@ class UserRepository(ABC):
         """Поиск пользователей"""
         pass
 
+    @abstractmethod
+    async def get_status_counts(self) -> Dict[UserStatus, int]:
+        """Количество пользователей по каждому статусу"""
+        pass
+
+    @abstractmethod
+    async def bulk_update_status(
+        self,
+        status: UserStatus,
+        from_statuses: Iterable[UserStatus],
+        ids: Optional[List[int]] = None,
+        search: Optional[str] = None,
+        status_filter: Optional[UserStatus] = None,
+        upload_date_from: Optional[datetime] = None,
+        upload_date_to: Optional[datetime] = None,
+    ) -> Tuple[Dict[int, UserStatus], Dict[int, UserStatus]]:
+        """Массовая смена статуса по списку id или фильтру: (прежние статусы измененных, статусы пропущенных)"""
+        pass
+
+    @abstractmethod
+    async def get_change_sequence(self) -> Optional[int]:
+        """Номер последнего изменения пользователей (None - лента изменений не ведется)"""
+        pass
+
+    @abstractmethod
+    def stream_changes(self, since: int, until: int, limit: int, batch_size: int = 500) -> AsyncIterator[List[dict]]:
+        """Пакеты пользователей, измененных в диапазоне (since, until], в порядке изменений"""
+        pass
+
+    @abstractmethod
+    async def archive_users(self, statuses: Iterable[UserStatus], updated_before: datetime, limit: int) -> int:
+        """Перенос до limit пользователей в статусах statuses, не менявшихся с updated_before, в архив"""
+        pass
+
+    @abstractmethod
+    async def get_storage_stats(self) -> dict:
+        """Количество строк и размер основной и архивной таблиц"""
+        pass
+
+    @abstractmethod
+    async def incremental_vacuum(self, pages: Optional[int] = None) -> Optional[dict]:
+        """Возврат свободных страниц файла БД; None если не поддерживается"""
+        pass
+
+    @abstractmethod
+    async def get_import_targets(self, unique_ids: List[str]) -> Dict[str, dict]:
+        """Существующие записи для пакета табельных номеров одним запросом"""
+        pass
+
+    @abstractmethod
+    async def bulk_write_users(self, inserts: List[dict], updates: List[dict], pending_updates: List[dict] = ()) -> Dict[str, int]:
+        """Пакетная запись вставок, обновлений по id и изменений из 1C в одной транзакции"""
+        pass
+
+    @abstractmethod
+    async def get_pending_changes(self, user_ids: List[int]) -> Dict[int, dict]:
+        """Ожидающие подтверждения изменения из 1C по id пользователей"""
+        pass
+
+    @abstractmethod
+    async def apply_pending_update(self, user_id: int, changes: dict) -> Optional[User]:
+        """Применение изменений из 1C и перевод пользователя в APPROVED"""
+        pass
+
+    @abstractmethod
+    async def discard_pending_update(self, user_id: int) -> Optional[User]:
+        """Отклонение изменений из 1C с возвратом прежнего статуса"""
+        pass
+
     @abstractmethod
     async def get_user_by_unique_id(self, unique_id: str) -> Optional[User]:
         """Получение пользователя по unique_id"""
@@ -70,16 +158,11 @@ class UserRepository(ABC):
         pass
 
     @abstractmethod
-    async def update_user_data(self, user_id: int, user_data: dict) -> Optional[User]:
-        """Обновление данных пользователя"""
+    async def update_user_data(self, user_id: int, user_data: dict, expected_status: Optional[Union[UserStatus, Iterable[UserStatus]]] = None) -> Optional[User]:
+        """Обновление данных пользователя (с тем же условием expected_status, что и update_status)"""
         pass
 
     @abstractmethod
     async def delete_user(self, user_id: int) -> bool:
         """Удаление пользователя"""
         pass
-
-    @abstractmethod
-    async def get_pending_update_by_original_unique_id(self, original_unique_id: str) -> Optional[User]:
-        """Поиск незавершенной записи об обновлении по оригинальному unique_id"""
-        pass
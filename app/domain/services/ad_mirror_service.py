@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from app.infrastructure.database.ad_mirror_repository import SQLAlchemyADMirrorRepository
+from app.infrastructure.external.ldap_service import LDAPService
+from app.core.config.settings import settings
+from app.core.logging.logger import app_logger
+from app.core.utils.aio import aclosing
+
+
+class ADMirrorService:
+    """Синхронизация таблицы ad_objects и индекса LDAPService.mirror с AD"""
+
+    def __init__(self, repository: SQLAlchemyADMirrorRepository, ldap_service: LDAPService):
+        self.repository = repository
+        self.ldap_service = ldap_service
+        self.mirror = ldap_service.mirror
+
+    async def load_mirror(self) -> int:
+        """Индекс в памяти из таблицы при запуске; отставание считается от последней синхронизации"""
+        state = await self.repository.get_sync_state()
+        rows = await self.repository.load_objects()
+        self.mirror.load(rows, state.synced_at if state else None)
+        app_logger.info(f"Зеркало AD загружено из БД: {len(rows)} объектов")
+        return len(rows)
+
+    async def sync(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Инкрементальная синхронизация: объекты и tombstone с uSNChanged больше
+        сохраненного highestCommittedUSN. Полная выгрузка - при первом запуске,
+        смене контроллера домена (USN у каждого свой), раз в ad_mirror_full_sync_hours
+        или по запросу; после нее удаляются объекты, которых в AD больше нет.
+        Каждая страница - отдельная короткая транзакция
+        """
+        async with self.mirror.sync_lock:
+            try:
+                started_at = datetime.now()
+                # highestCommittedUSN читается до выгрузки: изменения во время выгрузки попадут в следующую
+                server, highest_usn = await self.ldap_service.read_directory_state()
+                state = await self.repository.get_sync_state()
+                if state is None or state.server != server:
+                    full = True
+                elif started_at - state.full_sync_at >= timedelta(hours=settings.ad_mirror_full_sync_hours):
+                    full = True
+                since_usn = 0 if full else state.highest_usn + 1
+
+                changed = 0
+                pages = self.ldap_service.iter_directory_objects(since_usn, started_at)
+                async with aclosing(pages):
+                    async for rows in pages:
+                        await self.repository.upsert_objects(rows)
+                        self.mirror.apply(rows)
+                        changed += len(rows)
+
+                deleted = 0
+                if full:
+                    guids = await self.repository.delete_not_synced_since(started_at)
+                    self.mirror.apply((), guids)
+                    deleted = len(guids)
+                else:
+                    tombstones = self.ldap_service.iter_deleted_objects(since_usn)
+                    async with aclosing(tombstones):
+                        async for guids in tombstones:
+                            await self.repository.upsert_objects([], guids)
+                            self.mirror.apply((), guids)
+                            deleted += len(guids)
+
+                await self.repository.save_sync_state(server, highest_usn, started_at, full)
+                self.mirror.mark_synced(started_at)
+                elapsed = (datetime.now() - started_at).total_seconds()
+                app_logger.info(
+                    f"Зеркало AD синхронизировано ({'полная выгрузка' if full else f'с USN {since_usn}'}): "
+                    f"изменено {changed}, удалено {deleted}, USN {highest_usn}, {elapsed:.1f} с"
+                )
+                return {
+                    "full": full,
+                    "server": server,
+                    "highest_usn": highest_usn,
+                    "changed": changed,
+                    "deleted": deleted,
+                    "elapsed_seconds": round(elapsed, 3),
+                }
+            except Exception as e:
+                self.mirror.last_error = str(e)
+                app_logger.error(f"Ошибка синхронизации зеркала AD: {e}")
+                raise
+
+
+async def run_ad_mirror_sync(ldap_service: LDAPService, interval_seconds: Optional[int] = None) -> None:
+    """Фоновая задача: загрузка зеркала из БД и синхронизация раз в interval_seconds до отмены при остановке приложения"""
+    from app.infrastructure.database.database import AsyncSessionLocal
+
+    interval = interval_seconds or settings.ad_mirror_interval_seconds
+    app_logger.info(f"Фоновая синхронизация зеркала AD запущена: раз в {interval} с")
+    try:
+        async with AsyncSessionLocal() as session:
+            await ADMirrorService(SQLAlchemyADMirrorRepository(session), ldap_service).load_mirror()
+    except Exception as e:
+        # Без загруженного индекса поиски выполняются в AD до первой синхронизации
+        app_logger.error(f"Не удалось загрузить зеркало AD из БД: {e}")
+    while True:
+        try:
+            async with AsyncSessionLocal() as session:
+                await ADMirrorService(SQLAlchemyADMirrorRepository(session), ldap_service).sync()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Ошибка одного запуска не останавливает задачу: повтор в следующий интервал,
+            # а пока зеркало устаревает, поиски выполняются в AD
+            app_logger.error(f"Фоновая синхронизация зеркала AD не выполнена: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from app.domain.repositories.user_repository import UserRepository
+from app.domain.entities.user import UserStatus
+from app.core.config.settings import settings
+from app.core.logging.logger import app_logger
+
+# Конечные статусы: такие пользователи больше не появляются в рабочих очередях
+ARCHIVED_STATUSES = (UserStatus.DISMISSED, UserStatus.REJECTED)
+
+
+class UserArchiveService:
+    """Перенос давно уволенных и отклоненных пользователей в users_archive и обслуживание файла БД"""
+
+    def __init__(self, user_repository: UserRepository, after_days: Optional[int] = None, batch_size: Optional[int] = None):
+        self.user_repository = user_repository
+        self.after_days = after_days if after_days is not None else settings.users_archive_after_days
+        self.batch_size = batch_size or settings.users_archive_batch_size
+
+    async def archive_terminal_users(self) -> int:
+        """
+        Перенос в архив пользователей в конечном статусе без изменений дольше after_days.
+        Каждая порция - отдельная короткая транзакция, чтобы не задерживать запись из 1C
+        """
+        try:
+            updated_before = datetime.now() - timedelta(days=self.after_days)
+            total = 0
+            while True:
+                moved = await self.user_repository.archive_users(ARCHIVED_STATUSES, updated_before, self.batch_size)
+                total += moved
+                if moved < self.batch_size:
+                    break
+                # Между порциями отдаем event loop обработке запросов
+                await asyncio.sleep(0)
+            app_logger.info(f"Архивирование завершено: перенесено {total} пользователей (без изменений с {updated_before:%Y-%m-%d})")
+            return total
+        except Exception as e:
+            app_logger.error(f"Ошибка архивирования пользователей: {e}")
+            raise
+
+    async def get_storage_stats(self) -> dict:
+        """Размеры основной (hot) и архивной (cold) таблиц"""
+        try:
+            return await self.user_repository.get_storage_stats()
+        except Exception as e:
+            app_logger.error(f"Ошибка получения размеров таблиц: {e}")
+            raise
+
+    async def incremental_vacuum(self, pages: Optional[int] = None) -> Optional[dict]:
+        """Возврат свободных страниц файла БД после архивирования"""
+        try:
+            return await self.user_repository.incremental_vacuum(pages)
+        except Exception as e:
+            app_logger.error(f"Ошибка incremental vacuum: {e}")
+            raise
+
+
+async def run_archiver(interval_minutes: Optional[int] = None) -> None:
+    """Фоновая задача: архивирование раз в interval_minutes до отмены при остановке приложения"""
+    from app.infrastructure.database.database import AsyncSessionLocal
+    from app.infrastructure.database.user_repository_impl import SQLAlchemyUserRepository
+
+    interval = (interval_minutes or settings.users_archive_interval_minutes) * 60
+    app_logger.info(f"Фоновое архивирование запущено: раз в {interval // 60} мин, старше {settings.users_archive_after_days} дн.")
+    while True:
+        try:
+            async with AsyncSessionLocal() as session:
+                await UserArchiveService(SQLAlchemyUserRepository(session)).archive_terminal_users()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Ошибка одного запуска не останавливает задачу: повтор в следующий интервал
+            app_logger.error(f"Фоновое архивирование не выполнено: {e}")
+        await asyncio.sleep(interval)
@@ -1,9 +1,16 @@
+import asyncio
+import csv
+import os
+import tempfile
 import xlsxwriter
-from io import BytesIO
-from typing import List
+import orjson
+from io import BytesIO, StringIO
+from typing import Any, AsyncIterator, Dict, List
 from app.domain.entities.user import User, UserStatus
 from app.core.logging.logger import export_logger
 
+Rows = AsyncIterator[List[Dict[str, Any]]]
+
 
 class ExportService:
     def __init__(self):
@@ -140,3 +147,47 @@ class ExportService:
         except Exception as e:
             export_logger.error(f"Ошибка экспорта в XLSX: {e}")
             raise
+
+    async def stream_rows_ndjson(self, pages: Rows) -> AsyncIterator[bytes]:
+        """Страницы строк в NDJSON: по одной строке JSON на запись, страница - один фрагмент ответа"""
+        async for page in pages:
+            yield b"".join(orjson.dumps(row) + b"\n" for row in page)
+
+    async def stream_rows_csv(self, pages: Rows, columns: List[str]) -> AsyncIterator[bytes]:
+        """Страницы строк в CSV (UTF-8 с BOM, чтобы Excel распознал кириллицу)"""
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        yield "\ufeff".encode("utf-8") + buffer.getvalue().encode("utf-8")
+        async for page in pages:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(page)
+            yield buffer.getvalue().encode("utf-8")
+
+    async def write_rows_xlsx(self, pages: Rows, columns: List[str], sheet_name: str) -> str:
+        """
+        Страницы строк во временный XLSX-файл. constant_memory записывает каждую
+        строку на диск сразу, поэтому память не растет с числом записей. Возвращает
+        путь к файлу; удаляет его вызывающий код после отправки
+        """
+        fd, path = tempfile.mkstemp(prefix="export_", suffix=".xlsx")
+        os.close(fd)
+        try:
+            workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+            header_format = workbook.add_format({"bold": True, "bg_color": "#4F81BD", "font_color": "white", "border": 1})
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, columns, header_format)
+            worksheet.freeze_panes(1, 0)
+            row = 1
+            async for page in pages:
+                for item in page:
+                    worksheet.write_row(row, 0, [item.get(column, "") for column in columns])
+                    row += 1
+            # Сборка zip-архива книги - блокирующая операция
+            await asyncio.to_thread(workbook.close)
+            export_logger.info(f"XLSX сформирован: {row - 1} строк, {os.path.getsize(path)} байт")
+            return path
+        except BaseException:
+            os.remove(path)
+            raise
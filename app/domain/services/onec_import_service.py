@@ -0,0 +1,159 @@
+from typing import Dict, List, Optional, Tuple
+from app.domain.repositories.user_repository import UserRepository
+from app.domain.entities.user import PENDING_UPDATE_FIELDS, UserStatus
+from app.core.config.settings import settings
+from app.core.logging.logger import app_logger
+
+# Поля, которые не меняются при обновлении существующей записи данными из 1C
+PRESERVED_FIELDS = ("unique_id", "status", "is_update")
+# Попыток обработать строки, unique_id которых заняли параллельно между чтением и вставкой
+MAX_CHUNK_ATTEMPTS = 3
+
+
+class _PlannedInsert:
+    """Строка, которая будет вставлена; id известен только после INSERT ... RETURNING"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.user_id: Optional[int] = None
+
+
+class _ChunkPlan:
+    """Операции над пакетом строк: вставки, обновления по id и ответ по каждой строке"""
+
+    def __init__(self):
+        self.inserts: Dict[str, _PlannedInsert] = {}
+        self.updates: Dict[int, dict] = {}
+        # id пользователя -> запись pending_updates
+        self.pending_updates: Dict[int, dict] = {}
+        # (позиция в запросе, табельный номер, статус ответа, id или запланированная вставка)
+        self.outcomes: List[Tuple[int, str, str, object]] = []
+
+
+class OneCImportService:
+    """Пакетная загрузка сотрудников из 1C: одно чтение и одна транзакция на пакет строк"""
+
+    def __init__(self, user_repository: UserRepository, chunk_size: Optional[int] = None):
+        self.user_repository = user_repository
+        self.chunk_size = chunk_size or settings.onec_import_chunk_size
+
+    async def import_users(self, rows: List[Tuple[int, dict]]) -> Dict[int, dict]:
+        """
+        Загрузка преобразованных строк 1C (позиция в запросе, данные для БД).
+        Возвращает ответ по каждой позиции в формате receive_user_data
+        """
+        results: Dict[int, dict] = {}
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            try:
+                results.update(await self._import_chunk(chunk))
+            except Exception as e:
+                # Ошибка в пакете: обрабатываем его строки по одной, чтобы
+                # сохранить остальные и вернуть ошибку только по проблемной строке
+                app_logger.warning(f"Ошибка пакетной загрузки {len(chunk)} строк из 1C, построчная обработка: {e}")
+                for row in chunk:
+                    try:
+                        results.update(await self._import_chunk([row]))
+                    except Exception as row_error:
+                        position, data = row
+                        unique_id = data["unique_id"]
+                        app_logger.error(f"Ошибка создания пользователя {unique_id}: {row_error}")
+                        results[position] = {
+                            "unique_id": unique_id,
+                            "error": f"Ошибка создания сотрудника {unique_id}: {str(row_error)}",
+                            "status": "failed"
+                        }
+        return results
+
+    async def _import_chunk(self, rows: List[Tuple[int, dict]]) -> Dict[int, dict]:
+        results: Dict[int, dict] = {}
+        pending = rows
+        for _ in range(MAX_CHUNK_ATTEMPTS):
+            unique_ids = list({data["unique_id"] for _, data in pending})
+            existing = await self.user_repository.get_import_targets(unique_ids)
+            plan = self._plan(pending, existing)
+            inserted = await self.user_repository.bulk_write_users(
+                [planned.data for planned in plan.inserts.values()],
+                [{"id": user_id, **data} for user_id, data in plan.updates.items()],
+                list(plan.pending_updates.values()),
+            )
+            for planned in plan.inserts.values():
+                planned.user_id = inserted.get(planned.data["unique_id"])
+
+            retry = []
+            for position, unique_id, status, target in plan.outcomes:
+                user_id = target.user_id if isinstance(target, _PlannedInsert) else target
+                if user_id is None:
+                    # unique_id занят параллельной загрузкой: повторяем строку уже как обновление
+                    retry.append(next(row for row in pending if row[0] == position))
+                    continue
+                results[position] = {"unique_id": unique_id, "user_id": user_id, "status": status}
+
+            if not retry:
+                return results
+            pending = retry
+
+        raise RuntimeError(f"Не удалось записать {len(pending)} строк: табельные номера заняты параллельной загрузкой")
+
+    def _plan(self, rows: List[Tuple[int, dict]], existing: Dict[str, dict]) -> _ChunkPlan:
+        """
+        Классификация строк по правилам построчной загрузки. Повторы табельного
+        номера внутри пакета видят результат предыдущих строк, как при обработке по одной
+        """
+        plan = _ChunkPlan()
+        for position, data in rows:
+            unique_id = data["unique_id"]
+            target = existing.get(unique_id)
+            changes = {key: value for key, value in data.items() if key not in PRESERVED_FIELDS}
+
+            if target is None:
+                # Новый сотрудник
+                planned = _PlannedInsert(dict(data))
+                plan.inserts[unique_id] = planned
+                existing[unique_id] = {"id": planned, "status": data["status"], "is_update": False}
+                plan.outcomes.append((position, unique_id, "created", planned))
+
+            elif isinstance(target["id"], _PlannedInsert) or (
+                target["status"] == UserStatus.PENDING and not target["is_update"]
+            ):
+                # Еще не одобрен (или вставляется этим же пакетом): обновляем данные напрямую
+                self._update(plan, target["id"], changes)
+                plan.outcomes.append((position, unique_id, "updated", target["id"]))
+
+            else:
+                # Одобренный сотрудник: только измененные поля ждут подтверждения в
+                # pending_updates, пользователь попадает в ожидающие с пометкой is_update
+                user_id = target["id"]
+                pending_changes = {
+                    field: data.get(field) for field in PENDING_UPDATE_FIELDS
+                    if data.get(field) != target["values"][field]
+                }
+                if not pending_changes and not target["has_pending_update"]:
+                    # Данные не изменились (повторная выгрузка всего списка из 1C):
+                    # сотрудник остается в своем статусе, записывать нечего
+                    plan.outcomes.append((position, unique_id, "unchanged", user_id))
+                    continue
+                if target["has_pending_update"]:
+                    # Уже есть ожидающие изменения: заменяем их новыми
+                    status = "update_updated"
+                    pending_update = plan.pending_updates.setdefault(user_id, {
+                        "original_user_id": user_id,
+                        "previous_status": target["status"],
+                    })
+                else:
+                    status = "update_pending"
+                    pending_update = {"original_user_id": user_id, "previous_status": target["status"]}
+                    plan.pending_updates[user_id] = pending_update
+                    plan.updates.setdefault(user_id, {}).update(status=UserStatus.PENDING, is_update=True)
+                    target.update(status=UserStatus.PENDING, is_update=True, has_pending_update=True)
+                pending_update["changes"] = pending_changes
+                plan.outcomes.append((position, unique_id, status, user_id))
+
+        return plan
+
+    def _update(self, plan: _ChunkPlan, target, changes: dict) -> None:
+        """Изменения для существующей записи или для строки, которая еще только будет вставлена"""
+        if isinstance(target, _PlannedInsert):
+            target.data.update(changes)
+        else:
+            plan.updates.setdefault(target, {}).update(changes)
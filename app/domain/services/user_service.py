@@ -1,21 +1,36 @@
-from typing import List, Optional, Dict, Any
+import asyncio
+import time
+from typing import AsyncIterator, List, Optional, Dict, Any
 from app.domain.repositories.user_repository import UserRepository
-from app.domain.entities.user import User, UserStatus
+from app.domain.entities.user import PENDING_UPDATE_FIELDS, User, UserStatus
 from app.infrastructure.external.ldap_service import LDAPService
+from app.infrastructure.external.ou_routing import OURoutingError
 from app.infrastructure.external.exchange_service import ExchangeService
 from app.core.logging.logger import app_logger
 from app.api.schemas.user_schemas import CursorPaginatedUsersResponse, CursorPaginationInfo
 from app.core.config.settings import settings
 from sqlalchemy.exc import IntegrityError
 
+# Массовые действия над статусом: целевой статус и статусы, из которых переход разрешен
+BULK_STATUS_TRANSITIONS = {
+    "reject": (UserStatus.REJECTED, (UserStatus.PENDING,)),
+    "pending": (UserStatus.PENDING, (UserStatus.REJECTED,)),
+}
+# Статусы, из которых можно начать одобрение: только ожидающие. Одобренные, уволенные
+# и отклоненные не одобряются повторно (создание учетных записей изменило бы их учетную
+# запись AD, почтовый ящик и повторно отправило письма); отклоненного сначала
+# возвращают в ожидание
+APPROVABLE_STATUSES = (UserStatus.PENDING,)
+# Таймаут создания учетных записей одного пользователя при одобрении
+APPROVE_TIMEOUT_SECONDS = 45
 
 class UserService:
-    def __init__(self, user_repository: UserRepository):
+    def __init__(self, user_repository: UserRepository, ldap_service: Optional[LDAPService] = None, exchange_service: Optional[ExchangeService] = None):
+        # В приложении LDAP и Exchange общие на все запросы (app.core.container);
+        # без них сервис создает собственные, как в служебных скриптах
         self.user_repository = user_repository
-        self.ldap_service = LDAPService()
-        self.exchange_service = ExchangeService(self.ldap_service)
-        
-        app_logger.info("UserService инициализирован с LDAP сервисом")
+        self.ldap_service = ldap_service or LDAPService()
+        self.exchange_service = exchange_service or ExchangeService(self.ldap_service)
     
     async def create_user(self, user_data: dict) -> User:
         """Создание нового пользователя"""
@@ -51,9 +66,9 @@ class UserService:
 
             result = await self._execute_creation_scripts(user)
             if result["success"]:
-                await self.user_repository.update_status(user_id, UserStatus.APPROVED)
+                approved_user = await self.user_repository.update_status(user_id, UserStatus.APPROVED)
                 app_logger.info(f"Пользователь {user_id} успешно одобрен и создан в AD")
-                return await self.user_repository.get_user_by_id(user_id)
+                return approved_user
             else:
                 app_logger.error(f"Ошибка создания пользователя {user_id} в AD: {result['stderr']}")
                 return None
@@ -65,9 +80,16 @@ class UserService:
         """Отклонение пользователя"""
         try:
             app_logger.info(f"Отклонение пользователя ID: {user_id}")
-            await self.user_repository.update_status(user_id, UserStatus.REJECTED)
+            user = await self.user_repository.get_user_by_id(user_id)
+            if user and user.is_update:
+                # Отклоняются изменения из 1C, а не сам сотрудник: возвращаем прежний статус
+                restored_user = await self.user_repository.discard_pending_update(user_id)
+                if restored_user:
+                    app_logger.info(f"Изменения из 1C для пользователя {user_id} отклонены, статус {restored_user.status}")
+                    return restored_user
+            rejected_user = await self.user_repository.update_status(user_id, UserStatus.REJECTED)
             app_logger.info(f"Пользователь {user_id} успешно отклонен")
-            return await self.user_repository.get_user_by_id(user_id)
+            return rejected_user
         except Exception as e:
             app_logger.error(f"Ошибка отклонения пользователя {user_id}: {e}")
             raise
@@ -81,15 +103,16 @@ class UserService:
                 app_logger.warning(f"Пользователь с ID {user_id} не найден")
                 return None
 
-            await self.user_repository.update_status(user_id, UserStatus.DISMISSED)
+            dismissed_user = await self.user_repository.update_status(user_id, UserStatus.DISMISSED)
             app_logger.info(f"Статус пользователя {user_id} обновлен на DISMISSED")
             
             result = await self.ldap_service.block_user(user.unique_id)
             if result["success"]:
                 app_logger.info(f"Пользователь {user_id} успешно уволен и заблокирован в AD")
-                return await self.user_repository.get_user_by_id(user_id)
+                return dismissed_user
             else:
-                await self.user_repository.update_status(user_id, user.status)
+                # Возвращаем прежний статус, только если его не сменили параллельно
+                await self.user_repository.update_status(user_id, user.status, expected_status=UserStatus.DISMISSED)
                 app_logger.error(f"Ошибка блокировки пользователя {user_id} в AD: {result['stderr']}")
                 return None
         except Exception as e:
@@ -110,28 +133,51 @@ class UserService:
             app_logger.error(f"Ошибка получения всех пользователей: {e}")
             raise
 
-    async def _execute_creation_scripts(self, user: User) -> Dict[str, Any]:
-        """Выполнение скриптов создания пользователя в AD (точно как в PowerShell)"""
+    async def get_users_for_export(self, status: Optional[UserStatus] = None, search: Optional[str] = None, date_ranges: Optional[dict] = None) -> List[User]:
+        """Пользователи для экспорта; фильтры применяются в запросе к БД"""
+        try:
+            users = await self.user_repository.get_users_filtered(status, search, date_ranges)
+            app_logger.info(f"Для экспорта выбрано {len(users)} пользователей")
+            return users
+        except Exception as e:
+            app_logger.error(f"Ошибка выборки пользователей для экспорта: {e}")
+            raise
+
+    @staticmethod
+    def _creation_user_data(user: User) -> Dict[str, Any]:
+        """Данные пользователя для создания учетной записи в AD и писем"""
+        return {
+            'unique_id': user.unique_id,
+            'firstname': user.firstname,
+            'secondname': user.secondname,
+            'thirdname': user.thirdname,
+            'company': user.company,
+            'department': user.otdel,  # Передаем отдел как department (как в PowerShell)
+            'appointment': user.appointment,
+            'work_phone': user.work_phone,
+            'current_location_id': user.current_location_id,
+            'boss_id': user.boss_id,
+            'is_engineer': user.is_engineer,
+            # Для паритета со скриптами: передаем технический флаг
+            'technical': 'technical' if str(user.is_engineer).strip() in ['1', 'True', 'true'] else None
+        }
+
+    async def _execute_creation_scripts(
+        self,
+        user: User,
+        sam_allocation: Optional[Dict[str, Any]] = None,
+        manager_dns: Optional[Dict[str, Optional[str]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Выполнение скриптов создания пользователя в AD (точно как в PowerShell).
+        sam_allocation и manager_dns - имя учетной записи и DN руководителей,
+        найденные заранее для пачки пользователей
+        """
         try:
             app_logger.info(f"Выполнение скриптов создания пользователя: {user.unique_id}")
             
-            user_data = {
-                'unique_id': user.unique_id,
-                'firstname': user.firstname,
-                'secondname': user.secondname,
-                'thirdname': user.thirdname,
-                'company': user.company,
-                'department': user.otdel,  # Передаем отдел как department (как в PowerShell)
-                'appointment': user.appointment,
-                'work_phone': user.work_phone,
-                'current_location_id': user.current_location_id,
-                'boss_id': user.boss_id,
-                'is_engineer': user.is_engineer,
-                # Для паритета со скриптами: передаем технический флаг
-                'technical': 'technical' if str(user.is_engineer).strip() in ['1', 'True', 'true'] else None
-            }
-            
-            ad_result = await self.ldap_service.create_user_in_ad(user_data)
+            user_data = self._creation_user_data(user)
+            ad_result = await self.ldap_service.create_user_in_ad(user_data, sam_allocation, manager_dns)
             
             if not ad_result["success"]:
                 app_logger.error(f"Ошибка создания пользователя в AD: {ad_result['stderr']}")
@@ -196,50 +242,215 @@ class UserService:
             total_loaded=total_loaded
         )
     
-    async def get_pending_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0):
+    async def get_pending_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[dict] = None):
         """Получение пользователей ожидающих одобрения с курсорной пагинацией"""
         try:
             app_logger.info(f"Запрос pending пользователей: cursor={cursor}, limit={limit}, search={search}")
-            result = await self.user_repository.get_pending_users_cursor(cursor, limit, search, total_loaded)
+            result = await self.user_repository.get_pending_users_cursor(cursor, limit, search, total_loaded, sort, as_rows, date_ranges)
             app_logger.info(f"Получено {len(result['users'])} pending пользователей")
             return result
         except Exception as e:
             app_logger.error(f"Ошибка получения pending пользователей: {e}")
             raise
     
-    async def get_dismissed_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0):
+    async def get_dismissed_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[dict] = None):
         """Получение уволенных пользователей с курсорной пагинацией"""
         try:
             app_logger.info(f"Запрос dismissed пользователей: cursor={cursor}, limit={limit}, search={search}")
-            result = await self.user_repository.get_dismissed_users_cursor(cursor, limit, search, total_loaded)
+            result = await self.user_repository.get_dismissed_users_cursor(cursor, limit, search, total_loaded, sort, as_rows, date_ranges)
             app_logger.info(f"Получено {len(result['users'])} dismissed пользователей")
             return result
         except Exception as e:
             app_logger.error(f"Ошибка получения dismissed пользователей: {e}")
             raise
 
-    async def search_users_cursor(self, query: str, cursor: Optional[str] = None, limit: int = 20, status: Optional[UserStatus] = None, total_loaded: int = 0):
-        """Поиск пользователей с курсорной пагинацией"""
+    async def search_users_cursor(self, query: str, cursor: Optional[str] = None, limit: int = 20, status: Optional[UserStatus] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[dict] = None, include_archive: bool = False):
+        """Поиск пользователей с курсорной пагинацией; include_archive - искать и в архиве"""
         try:
-            app_logger.info(f"Поиск пользователей: query='{query}', cursor={cursor}, limit={limit}, status={status}")
-            result = await self.user_repository.search_users_cursor(query, cursor, limit, status, total_loaded)
+            app_logger.info(f"Поиск пользователей: query='{query}', cursor={cursor}, limit={limit}, status={status}, архив={include_archive}")
+            result = await self.user_repository.search_users_cursor(query, cursor, limit, status, total_loaded, sort, as_rows, date_ranges, include_archive)
             app_logger.info(f"Найдено {len(result['users'])} пользователей по запросу '{query}'")
             return result
         except Exception as e:
             app_logger.error(f"Ошибка поиска пользователей: {e}")
             raise
 
-    async def get_all_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, status: Optional[UserStatus] = None, total_loaded: int = 0):
+    async def get_all_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, status: Optional[UserStatus] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[dict] = None):
         """Получение всех пользователей с курсорной пагинацией"""
         try:
             app_logger.info(f"Запрос всех пользователей: cursor={cursor}, limit={limit}, search={search}, status={status}")
-            result = await self.user_repository.get_all_users_cursor(cursor, limit, search, status, total_loaded)
+            result = await self.user_repository.get_all_users_cursor(cursor, limit, search, status, total_loaded, sort, as_rows, date_ranges)
             app_logger.info(f"Получено {len(result['users'])} пользователей")
             return result
         except Exception as e:
             app_logger.error(f"Ошибка получения всех пользователей: {e}")
             raise
 
+    async def get_user_stats(self) -> Dict[str, Any]:
+        """Статистика пользователей по статусам"""
+        try:
+            counts = await self.user_repository.get_status_counts()
+            by_status = {status.value: count for status, count in counts.items()}
+            return {"total": sum(by_status.values()), "by_status": by_status}
+        except Exception as e:
+            app_logger.error(f"Ошибка получения статистики пользователей: {e}")
+            raise
+
+    async def get_change_sequence(self) -> Optional[int]:
+        """Номер последнего изменения пользователей; None если лента изменений не поддерживается"""
+        try:
+            return await self.user_repository.get_change_sequence()
+        except Exception as e:
+            app_logger.error(f"Ошибка получения номера последнего изменения: {e}")
+            raise
+
+    def stream_changes(self, since: int, until: int, limit: int) -> AsyncIterator[List[dict]]:
+        """Пакеты пользователей, измененных после since и не позже until"""
+        return self.user_repository.stream_changes(since, until, limit)
+
+    async def bulk_change_status(self, action: str, ids: Optional[List[int]] = None, **filters) -> Dict[str, Any]:
+        """
+        Массовое действие над статусом по списку id или фильтру (status, search,
+        upload_date_from, upload_date_to) с результатом по каждому id
+        """
+        try:
+            target_status, from_statuses = BULK_STATUS_TRANSITIONS[action]
+            app_logger.info(f"Массовое действие '{action}': ids={len(ids) if ids is not None else None}, фильтр={filters}")
+            updated, skipped = await self.user_repository.bulk_update_status(
+                target_status, from_statuses, ids=ids, **filters
+            )
+
+            if ids is None:
+                results = [{"id": user_id, "outcome": "updated", "status": target_status} for user_id in updated]
+            else:
+                # Результат по каждому переданному id в порядке запроса
+                updated_ids = set(updated)
+                results = []
+                for user_id in dict.fromkeys(ids):
+                    current = skipped.get(user_id)
+                    if user_id in updated_ids:
+                        results.append({"id": user_id, "outcome": "updated", "status": target_status})
+                    else:
+                        results.append({
+                            "id": user_id,
+                            "outcome": "status_conflict" if current else "not_found",
+                            "status": current,
+                        })
+
+            app_logger.info(f"Массовое действие '{action}': изменено {len(updated)}, пропущено {len(results) - len(updated)}")
+            return {
+                "success": True,
+                "action": action,
+                "target_status": target_status,
+                "updated": len(updated),
+                "skipped": len(results) - len(updated),
+                "results": results,
+            }
+        except Exception as e:
+            app_logger.error(f"Ошибка массового действия '{action}': {e}")
+            raise
+
+    async def bulk_approve(self, ids: List[int]) -> Dict[str, Any]:
+        """
+        Массовое одобрение по списку id: пользователи переводятся в CREATING одним
+        запросом, имена sAMAccountName подбираются для всей пачки несколькими поисками
+        в AD, руководители всей пачки тоже находятся заранее, учетные записи создаются
+        параллельно, не больше ldap_pool_size за раз.
+        Созданные переходят в APPROVED, неудачные возвращаются в статус, который был до одобрения
+        """
+        try:
+            app_logger.info(f"Массовое одобрение: ids={len(ids)}")
+            claimed, skipped = await self.user_repository.bulk_update_status(
+                UserStatus.CREATING, APPROVABLE_STATUSES, ids=ids
+            )
+            users = await self.user_repository.get_users_by_ids(list(claimed)) if claimed else []
+            try:
+                allocations = await self.ldap_service.allocate_sam_account_names(
+                    [self._creation_user_data(user) for user in users]
+                ) if users else []
+                manager_dns = await self.ldap_service.resolve_manager_dns(user.boss_id for user in users)
+            except Exception:
+                # Без имен и руководителей учетные записи не создаются: пользователи возвращаются
+                # в статус, который был до одобрения
+                for previous_status in set(claimed.values()):
+                    await self.user_repository.bulk_update_status(
+                        previous_status, (UserStatus.CREATING,),
+                        ids=[user_id for user_id, status in claimed.items() if status == previous_status],
+                    )
+                raise
+
+            semaphore = asyncio.Semaphore(max(1, settings.ldap_pool_size))
+            # Сессия БД одна на запрос: статусы меняются по очереди
+            status_lock = asyncio.Lock()
+            outcomes: Dict[int, Dict[str, Any]] = {}
+
+            async def approve(user: User, allocation: Dict[str, Any]) -> None:
+                error = None
+                try:
+                    async with semaphore:
+                        try:
+                            result = await asyncio.wait_for(
+                                self._execute_creation_scripts(user, allocation, manager_dns), timeout=APPROVE_TIMEOUT_SECONDS
+                            )
+                            error = None if result["success"] else result.get("stderr", "Неизвестная ошибка")
+                        except asyncio.TimeoutError:
+                            error = f"Таймаут создания учетных записей (превышено {APPROVE_TIMEOUT_SECONDS} секунд)"
+                    if error is None:
+                        async with status_lock:
+                            await self.user_repository.update_status(user.id, UserStatus.APPROVED, expected_status=UserStatus.CREATING)
+                        outcomes[user.id] = {
+                            "id": user.id,
+                            "outcome": "approved",
+                            "status": UserStatus.APPROVED,
+                            "sam_account_name": result["ad_result"].get("sam_account_name"),
+                        }
+                except Exception as e:
+                    # Ошибка одного пользователя (БД, LDAP) не прерывает пачку
+                    error = str(e) or type(e).__name__
+                finally:
+                    if user.id not in outcomes:
+                        # Строка не остается в CREATING: возвращается в статус до одобрения
+                        app_logger.error(f"Ошибка создания учетных записей для пользователя {user.id}: {error or 'одобрение прервано'}")
+                        try:
+                            async with status_lock:
+                                await self.user_repository.update_status(user.id, claimed[user.id], expected_status=UserStatus.CREATING)
+                        except Exception as e:
+                            app_logger.error(f"Не удалось вернуть статус {claimed[user.id].value} пользователю {user.id}: {e}")
+                        outcomes[user.id] = {
+                            "id": user.id,
+                            "outcome": "failed",
+                            "status": claimed[user.id],
+                            "error": error or "Одобрение прервано",
+                        }
+
+            await asyncio.gather(*(approve(user, allocation) for user, allocation in zip(users, allocations)))
+
+            # Результат по каждому переданному id в порядке запроса
+            results = []
+            for user_id in dict.fromkeys(ids):
+                if user_id in outcomes:
+                    results.append(outcomes[user_id])
+                else:
+                    current = skipped.get(user_id)
+                    results.append({
+                        "id": user_id,
+                        "outcome": "status_conflict" if current else "not_found",
+                        "status": current,
+                    })
+
+            approved = sum(1 for item in results if item["outcome"] == "approved")
+            failed = sum(1 for item in results if item["outcome"] == "failed")
+            app_logger.info(f"Массовое одобрение: одобрено {approved}, ошибок {failed}, пропущено {len(results) - approved - failed}")
+            return {
+                "success": True,
+                "approved": approved,
+                "failed": failed,
+                "skipped": len(results) - approved - failed,
+                "results": results,
+            }
+        except Exception as e:
+            app_logger.error(f"Ошибка массового одобрения: {e}")
+            raise
 
     async def change_password(self, username: str, new_password: str) -> dict:
         """Смена пароля пользователя в AD"""
@@ -277,6 +488,10 @@ class UserService:
             app_logger.error(f"Ошибка смены номера телефона для пользователя {pager}: {e}")
             raise
 
+    def iter_users_from_ad(self) -> AsyncIterator[List[dict]]:
+        """Постраничная выгрузка пользователей из AD для потокового экспорта"""
+        return self.ldap_service.iter_users_from_ad()
+
     async def export_users_from_ad(self) -> dict:
         """Экспорт всех пользователей из Active Directory"""
         try:
@@ -313,6 +528,26 @@ class UserService:
             app_logger.error(f"Ошибка полной блокировки пользователя {unique_id}: {e}")
             raise
 
+    async def bulk_block_users(self, unique_ids: List[str]) -> Dict[str, Any]:
+        """Полная блокировка пачки уволенных в AD с итогом по каждому сотруднику и шагу"""
+        try:
+            app_logger.info(f"Массовая полная блокировка: {len(unique_ids)} сотрудников")
+            started = time.perf_counter()
+            results = await self.ldap_service.block_users_bulk(unique_ids)
+            counts = {outcome: 0 for outcome in ("blocked", "partial", "failed", "not_found")}
+            for item in results:
+                counts[item["outcome"]] += 1
+            app_logger.info(f"Массовая полная блокировка завершена: {counts}")
+            return {
+                "success": True,
+                **counts,
+                "elapsed_seconds": round(time.perf_counter() - started, 3),
+                "results": results,
+            }
+        except Exception as e:
+            app_logger.error(f"Ошибка массовой полной блокировки: {e}")
+            raise
+
     async def assign_manager(self, employee_id: str, manager_id: str) -> dict:
         """Назначение менеджера для пользователя"""
         try:
@@ -358,6 +593,52 @@ class UserService:
             app_logger.error(f"Ошибка создания объекта в UserService: {e}")
             return {"success": False, "stderr": str(e)}
 
+    async def preview_pending_ous(self) -> Dict[str, Any]:
+        """
+        OU, в которой будет создан каждый ожидающий одобрения пользователь, по
+        текущим правилам (как при одобрении: инженеры - в OU технических логинов)
+        """
+        try:
+            started = time.perf_counter()
+            rows = await self.user_repository.get_pending_routing_rows()
+            rules = self.ldap_service.ou_router.rules
+            users = []
+            by_ou: Dict[str, int] = {}
+            unresolved = 0
+            for row in rows:
+                item = {
+                    "id": row["id"],
+                    "unique_id": row["unique_id"],
+                    "name": f"{row['secondname'] or ''} {row['firstname'] or ''}".strip(),
+                    "current_location_id": row["current_location_id"],
+                    "department": row["otdel"],
+                    "ou": None,
+                    "error": None,
+                }
+                try:
+                    if row["is_engineer"] == 1:
+                        item["ou"] = rules.technical_ou
+                    else:
+                        item["ou"] = rules.find_ou(row["current_location_id"], row["otdel"])
+                    by_ou[item["ou"]] = by_ou.get(item["ou"], 0) + 1
+                except OURoutingError as e:
+                    item["error"] = str(e)
+                    unresolved += 1
+                users.append(item)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            app_logger.info(f"Предпросмотр OU: {len(users)} pending пользователей, без OU {unresolved}, {elapsed_ms:.1f} мс")
+            return {
+                "total": len(users),
+                "resolved": len(users) - unresolved,
+                "unresolved": unresolved,
+                "by_ou": dict(sorted(by_ou.items(), key=lambda item: -item[1])),
+                "users": users,
+                "elapsed_ms": round(elapsed_ms, 2),
+            }
+        except Exception as e:
+            app_logger.error(f"Ошибка предпросмотра OU pending пользователей: {e}")
+            raise
+
     async def update_test_attributes(self, pager: str, test_type: str) -> Dict[str, Any]:
         """Обновление тестовых атрибутов пользователя"""
         try:
@@ -368,179 +649,143 @@ class UserService:
             app_logger.error(f"Ошибка обновления тестовых атрибутов в UserService: {e}")
             return {"success": False, "stderr": str(e)}
 
-    async def update_user_from_1c(self, unique_id: str, user_data: dict) -> Optional[User]:
-        """Автоматическое обновление пользователя из 1С (как в скриптах)"""
+    async def _apply_update_in_ad(
+        self,
+        user: User,
+        values: Dict[str, Any],
+        manager_dns: Optional[Dict[str, Optional[str]]] = None,
+    ) -> Optional[str]:
+        """
+        Изменения из 1C в AD: атрибуты, группы и руководитель (manager_dns - DN
+        руководителей пачки из resolve_manager_dns). Возвращает ошибку AD или None
+        """
+        # Обновляем в AD (как в скриптах - Set-ADUser)
+        user_data = {
+            'unique_id': user.unique_id,
+            'firstname': values["firstname"],
+            'secondname': values["secondname"],
+            'thirdname': values["thirdname"],
+            'company': values["company"],
+            'department': values["otdel"],  # department = otdel (как в скриптах)
+            'appointment': values["appointment"],
+            'work_phone': values["work_phone"],
+            'current_location_id': values["current_location_id"],
+            'boss_id': values["boss_id"],
+            'is_engineer': values["is_engineer"],
+        }
+        
+        # Обновляем атрибуты в AD
+        ad_result = await self.ldap_service.update_user_in_ad(user_data)
+        
+        if not ad_result.get("success"):
+            app_logger.warning(f"Ошибка обновления в AD: {ad_result.get('stderr')}. Продолжаем выполнение, изменения будут применены в БД.")
+            return ad_result.get("stderr") or "Ошибка обновления в AD"
+        
+        sam_account_name = ad_result.get("sam_account_name")
+        app_logger.info(f"Пользователь {sam_account_name} обновлен в AD")
+        
+        # Обновляем группы (как в скриптах - Add-ADGroupMember)
+        await self.ldap_service._add_user_to_groups(sam_account_name, user_data)
+        app_logger.info(f"Группы пользователя {sam_account_name} обновлены")
+        
+        # Обновляем менеджера если изменился
+        if values["boss_id"]:
+            await self.ldap_service._assign_manager(sam_account_name, values["boss_id"], manager_dns, ad_result.get("user_dn"))
+            app_logger.info(f"Менеджер для пользователя {sam_account_name} обновлен")
+        return None
+
+    async def update_existing_user(self, user_id: int) -> Optional[User]:
+        """Применение ожидающих изменений из 1C к сотруднику (как в скриптах)"""
         try:
-            app_logger.info(f"Автоматическое обновление пользователя из 1С: {unique_id}")
+            app_logger.info(f"Обновление пользователя ID: {user_id}")
             
-            # Получаем существующего пользователя
-            existing_user = await self.user_repository.get_user_by_unique_id(unique_id)
-            if not existing_user:
-                app_logger.warning(f"Пользователь с unique_id {unique_id} не найден")
+            user = await self.user_repository.get_user_by_id(user_id)
+            if not user or not user.is_update:
+                app_logger.warning(f"Пользователь {user_id} не ожидает изменений из 1C")
                 return None
             
-            app_logger.info(f"Обновление пользователя ID={existing_user.id} данными из 1С")
-            
-            # Обновляем данные в БД
-            update_data = {
-                "firstname": user_data.get("firstname"),
-                "secondname": user_data.get("secondname"),
-                "thirdname": user_data.get("thirdname"),
-                "company": user_data.get("company"),
-                "department": user_data.get("department"),
-                "otdel": user_data.get("otdel"),
-                "appointment": user_data.get("appointment"),
-                "work_phone": user_data.get("work_phone"),
-                "mobile_phone": user_data.get("mobile_phone"),
-                "current_location_id": user_data.get("current_location_id"),
-                "boss_id": user_data.get("boss_id"),
-                "is_engineer": user_data.get("is_engineer"),
-                "is_update": True,  # Пометка что это обновление из 1С
-            }
-            
-            # Если пользователь был APPROVED, меняем статус на PENDING чтобы админ увидел изменения
-            if existing_user.status == UserStatus.APPROVED:
-                update_data["status"] = UserStatus.PENDING
-                app_logger.info(f"Статус пользователя {existing_user.id} изменен на PENDING для просмотра изменений")
-            
-            await self.user_repository.update_user_data(existing_user.id, update_data)
-            app_logger.info(f"Данные пользователя {existing_user.id} обновлены в БД")
-            
-            # Обновляем в AD (как в скриптах - Set-ADUser)
-            ad_user_data = {
-                'unique_id': existing_user.unique_id,
-                'firstname': user_data.get("firstname"),
-                'secondname': user_data.get("secondname"),
-                'thirdname': user_data.get("thirdname"),
-                'company': user_data.get("company"),
-                'department': user_data.get("otdel"),  # department = otdel (как в скриптах)
-                'appointment': user_data.get("appointment"),
-                'work_phone': user_data.get("work_phone"),
-                'current_location_id': user_data.get("current_location_id"),
-                'boss_id': user_data.get("boss_id"),
-                'is_engineer': user_data.get("is_engineer"),
-            }
-            
-            # Обновляем атрибуты в AD
-            ad_result = await self.ldap_service.update_user_in_ad(ad_user_data)
+            changes = (await self.user_repository.get_pending_changes([user_id])).get(user_id, {})
+            app_logger.info(f"Изменения из 1C для пользователя {user_id}: {sorted(changes)}")
             
-            if not ad_result.get("success"):
-                app_logger.error(f"Ошибка обновления в AD: {ad_result.get('stderr')}")
-                # Не откатываем изменения в БД - они уже применены
-                return await self.user_repository.get_user_by_id(existing_user.id)
+            # Итоговые значения: текущие данные с примененными изменениями
+            values = {field: getattr(user, field) for field in PENDING_UPDATE_FIELDS}
+            values.update(changes)
             
-            sam_account_name = ad_result.get("sam_account_name")
-            app_logger.info(f"Пользователь {sam_account_name} обновлен в AD")
-            
-            # Обновляем группы (как в скриптах - Add-ADGroupMember)
-            await self.ldap_service._add_user_to_groups(sam_account_name, ad_user_data)
-            app_logger.info(f"Группы пользователя {sam_account_name} обновлены")
+            await self._apply_update_in_ad(user, values)
             
-            # Обновляем менеджера если изменился
-            if user_data.get("boss_id"):
-                await self.ldap_service._assign_manager(sam_account_name, user_data.get("boss_id"))
-                app_logger.info(f"Менеджер для пользователя {sam_account_name} обновлен")
+            # Данные, статус APPROVED и удаление записи pending_updates - одной транзакцией
+            approved_user = await self.user_repository.apply_pending_update(user_id, changes)
             
-            app_logger.info(f"Пользователь {existing_user.id} успешно обновлен из 1С")
-            return await self.user_repository.get_user_by_id(existing_user.id)
+            app_logger.info(f"Пользователь {user_id} успешно обновлен")
+            return approved_user
             
         except Exception as e:
-            app_logger.error(f"Ошибка обновления пользователя {unique_id} из 1С: {e}")
+            app_logger.error(f"Ошибка обновления пользователя {user_id}: {e}")
             raise
 
-    async def update_existing_user(self, update_user_id: int) -> Optional[User]:
-        """Обновление существующего пользователя (как в скриптах)"""
+    async def bulk_apply_updates(self, ids: List[int]) -> Dict[str, Any]:
+        """
+        Применение ожидающих изменений из 1C к пачке сотрудников: изменения читаются
+        одним запросом, руководители всей пачки находятся в AD заранее несколькими
+        поисками, обновления в AD выполняются параллельно, не больше ldap_pool_size за раз
+        """
         try:
-            app_logger.info(f"Обновление пользователя ID: {update_user_id}")
-            
-            # Получаем запись об обновлении
-            update_user = await self.user_repository.get_user_by_id(update_user_id)
-            if not update_user or not update_user.is_update:
-                app_logger.warning(f"Пользователь {update_user_id} не является записью об обновлении")
-                return None
-            
-            # Извлекаем оригинальный unique_id из временного (убираем суффикс _update_*)
-            # Формат: original_unique_update_timestamp
-            import re
-            match = re.match(r'^(.+?)_update_\d+$', update_user.unique_id)
-            if not match:
-                app_logger.error(f"Неверный формат unique_id записи об обновлении: {update_user.unique_id}")
-                return None
-            
-            original_unique_id = match.group(1)
-            app_logger.info(f"Извлечен оригинальный unique_id: {original_unique_id} из {update_user.unique_id}")
-            
-            # Получаем оригинального пользователя по извлеченному unique_id
-            original_user = await self.user_repository.get_user_by_unique_id(original_unique_id)
-            if not original_user:
-                app_logger.warning(f"Оригинальный пользователь с unique_id {original_unique_id} не найден")
-                return None
-            
-            app_logger.info(f"Обновление пользователя {original_user.id} данными из записи {update_user_id}")
-            
-            # Обновляем данные в БД
-            update_data = {
-                "firstname": update_user.firstname,
-                "secondname": update_user.secondname,
-                "thirdname": update_user.thirdname,
-                "company": update_user.company,
-                "department": update_user.department,
-                "otdel": update_user.otdel,
-                "appointment": update_user.appointment,
-                "work_phone": update_user.work_phone,
-                "mobile_phone": update_user.mobile_phone,
-                "current_location_id": update_user.current_location_id,
-                "boss_id": update_user.boss_id,
-                "is_engineer": update_user.is_engineer,
-            }
-            await self.user_repository.update_user_data(original_user.id, update_data)
-            app_logger.info(f"Данные пользователя {original_user.id} обновлены в БД")
-            
-            # Обновляем в AD (как в скриптах - Set-ADUser)
-            user_data = {
-                'unique_id': original_user.unique_id,
-                'firstname': update_user.firstname,
-                'secondname': update_user.secondname,
-                'thirdname': update_user.thirdname,
-                'company': update_user.company,
-                'department': update_user.otdel,  # department = otdel (как в скриптах)
-                'appointment': update_user.appointment,
-                'work_phone': update_user.work_phone,
-                'current_location_id': update_user.current_location_id,
-                'boss_id': update_user.boss_id,
-                'is_engineer': update_user.is_engineer,
+            app_logger.info(f"Массовое применение изменений из 1C: ids={len(ids)}")
+            users = [user for user in await self.user_repository.get_users_by_ids(ids) if user.is_update]
+            changes = await self.user_repository.get_pending_changes([user.id for user in users]) if users else {}
+
+            # Итоговые значения: текущие данные с примененными изменениями
+            values_by_id: Dict[int, Dict[str, Any]] = {}
+            for user in users:
+                values = {field: getattr(user, field) for field in PENDING_UPDATE_FIELDS}
+                values.update(changes.get(user.id, {}))
+                values_by_id[user.id] = values
+            manager_dns = await self.ldap_service.resolve_manager_dns(
+                values["boss_id"] for values in values_by_id.values()
+            ) if users else {}
+
+            semaphore = asyncio.Semaphore(max(1, settings.ldap_pool_size))
+            # Сессия БД одна на запрос: изменения применяются по очереди
+            db_lock = asyncio.Lock()
+            outcomes: Dict[int, Dict[str, Any]] = {}
+
+            async def apply(user: User) -> None:
+                try:
+                    async with semaphore:
+                        ad_error = await self._apply_update_in_ad(user, values_by_id[user.id], manager_dns)
+                    async with db_lock:
+                        # Как при одиночном применении: ошибка AD не отменяет изменений в БД
+                        approved_user = await self.user_repository.apply_pending_update(user.id, changes.get(user.id, {}))
+                except Exception as e:
+                    # Ошибка одного сотрудника не прерывает пачку: изменения остаются ожидающими
+                    app_logger.error(f"Ошибка применения изменений из 1C для пользователя {user.id}: {e}")
+                    outcomes[user.id] = {"id": user.id, "outcome": "failed", "error": str(e)}
+                    return
+                if approved_user:
+                    outcomes[user.id] = {"id": user.id, "outcome": "updated", "status": approved_user.status, "ad_error": ad_error}
+
+            await asyncio.gather(*(apply(user) for user in users))
+
+            # Результат по каждому переданному id в порядке запроса
+            results = [
+                outcomes.get(user_id) or {"id": user_id, "outcome": "no_pending_update"}
+                for user_id in dict.fromkeys(ids)
+            ]
+            updated = sum(1 for item in results if item["outcome"] == "updated")
+            failed = sum(1 for item in results if item["outcome"] == "failed")
+            ad_errors = sum(1 for item in results if item.get("ad_error"))
+            app_logger.info(
+                f"Массовое применение изменений из 1C: обновлено {updated} (ошибок AD {ad_errors}), "
+                f"ошибок {failed}, пропущено {len(results) - updated - failed}"
+            )
+            return {
+                "success": True,
+                "updated": updated,
+                "ad_errors": ad_errors,
+                "failed": failed,
+                "skipped": len(results) - updated - failed,
+                "results": results,
             }
-            
-            # Обновляем атрибуты в AD
-            ad_result = await self.ldap_service.update_user_in_ad(user_data)
-            
-            if not ad_result.get("success"):
-                app_logger.warning(f"Ошибка обновления в AD: {ad_result.get('stderr')}. Продолжаем выполнение, данные в БД обновлены.")
-                # Данные в БД уже обновлены, продолжаем выполнение
-            else:
-                sam_account_name = ad_result.get("sam_account_name")
-                app_logger.info(f"Пользователь {sam_account_name} обновлен в AD")
-                
-                # Обновляем группы (как в скриптах - Add-ADGroupMember)
-                await self.ldap_service._add_user_to_groups(sam_account_name, user_data)
-                app_logger.info(f"Группы пользователя {sam_account_name} обновлены")
-                
-                # Обновляем менеджера если изменился
-                if update_user.boss_id:
-                    await self.ldap_service._assign_manager(sam_account_name, update_user.boss_id)
-                    app_logger.info(f"Менеджер для пользователя {sam_account_name} обновлен")
-            
-            # Удаляем запись об обновлении
-            await self.user_repository.delete_user(update_user_id)
-            app_logger.info(f"Запись об обновлении {update_user_id} удалена")
-            
-            # Обновляем статус оригинального пользователя и сбрасываем флаг is_update
-            await self.user_repository.update_status(original_user.id, UserStatus.APPROVED)
-            await self.user_repository.update_user_data(original_user.id, {"is_update": False})
-            
-            app_logger.info(f"Пользователь {original_user.id} успешно обновлен")
-            return await self.user_repository.get_user_by_id(original_user.id)
-            
         except Exception as e:
-            app_logger.error(f"Ошибка обновления пользователя {update_user_id}: {e}")
+            app_logger.error(f"Ошибка массового применения изменений из 1C: {e}")
             raise
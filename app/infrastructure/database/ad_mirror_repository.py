@@ -0,0 +1,96 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.infrastructure.database.models import ADObjectModel, ADSyncStateModel
+from app.core.logging.logger import db_logger
+
+# Единственная строка состояния синхронизации
+SYNC_STATE_ID = 1
+# Колонки ad_objects, которые обновляет синхронизация
+AD_OBJECT_COLUMNS = [column.name for column in ADObjectModel.__table__.columns]
+
+
+class SQLAlchemyADMirrorRepository:
+    """Таблицы зеркала AD: объекты и состояние синхронизации"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_sync_state(self) -> Optional[ADSyncStateModel]:
+        return await self.db.get(ADSyncStateModel, SYNC_STATE_ID)
+
+    async def load_objects(self) -> List[Dict[str, Any]]:
+        """Все объекты зеркала для построения индекса в памяти"""
+        try:
+            result = await self.db.execute(select(ADObjectModel.__table__))
+            return [dict(row) for row in result.mappings()]
+        except Exception as e:
+            db_logger.error(f"Ошибка загрузки зеркала AD: {e}")
+            raise
+
+    async def upsert_objects(self, objects: List[Dict[str, Any]], deleted_guids: List[str] = ()) -> None:
+        """Запись порции объектов (вставка или замена по object_guid) и удаление удаленных в AD одной транзакцией"""
+        try:
+            if objects:
+                statement = self._upsert_statement()
+                if statement is not None:
+                    await self.db.execute(statement, objects)
+                else:
+                    for row in objects:
+                        await self.db.merge(ADObjectModel(**row))
+            if deleted_guids:
+                await self.db.execute(delete(ADObjectModel).where(ADObjectModel.object_guid.in_(list(deleted_guids))))
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            db_logger.error(f"Ошибка записи порции зеркала AD: {e}")
+            raise
+
+    def _upsert_statement(self):
+        """INSERT ... ON CONFLICT (object_guid) DO UPDATE для SQLite и PostgreSQL, None для остальных СУБД"""
+        dialect = self.db.bind.dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            return None
+        statement = dialect_insert(ADObjectModel)
+        return statement.on_conflict_do_update(
+            index_elements=["object_guid"],
+            set_={name: statement.excluded[name] for name in AD_OBJECT_COLUMNS if name != "object_guid"},
+        )
+
+    async def delete_not_synced_since(self, started_at: datetime) -> List[str]:
+        """После полной выгрузки: удаление объектов, которых в ней не было; возвращает их object_guid"""
+        try:
+            result = await self.db.execute(
+                delete(ADObjectModel).where(ADObjectModel.synced_at < started_at).returning(ADObjectModel.object_guid)
+            )
+            guids = list(result.scalars())
+            await self.db.commit()
+            return guids
+        except Exception as e:
+            await self.db.rollback()
+            db_logger.error(f"Ошибка удаления устаревших объектов зеркала AD: {e}")
+            raise
+
+    async def save_sync_state(self, server: str, highest_usn: int, synced_at: datetime, full: bool) -> None:
+        try:
+            state = await self.get_sync_state()
+            if state is None:
+                state = ADSyncStateModel(id=SYNC_STATE_ID, server=server, highest_usn=highest_usn,
+                                         full_sync_at=synced_at, synced_at=synced_at)
+                self.db.add(state)
+            else:
+                state.server = server
+                state.highest_usn = highest_usn
+                state.synced_at = synced_at
+                if full:
+                    state.full_sync_at = synced_at
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            db_logger.error(f"Ошибка сохранения состояния синхронизации AD: {e}")
+            raise
@@ -1,35 +1,95 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
+import asyncio
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config.settings import settings
 from app.core.logging.logger import db_logger
 
 
+def _async_database_url(database_url: str) -> str:
+    """Подбор асинхронного драйвера для URL базы данных"""
+    async_drivers = {
+        "sqlite://": "sqlite+aiosqlite://",
+        "postgresql://": "postgresql+asyncpg://",
+        "mysql://": "mysql+aiomysql://",
+    }
+    for prefix, async_prefix in async_drivers.items():
+        if database_url.startswith(prefix):
+            return async_prefix + database_url[len(prefix):]
+    return database_url
+
+
+# Синхронный движок оставлен для служебных скриптов и миграций
 engine = create_engine(
     settings.database_url,
     echo=False,
     pool_pre_ping=True
 )
 
-
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+# Асинхронный движок для обработки запросов без блокировки event loop
+async_engine = create_async_engine(
+    settings.database_async_url or _async_database_url(settings.database_url),
+    echo=False,
+    pool_pre_ping=True
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Pragmas из database_optimization.sql: применяются к каждому новому подключению,
+# так как большинство из них действует только в рамках соединения
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": 10000,
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,
+    "busy_timeout": 5000,
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+for _engine in (engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", _set_sqlite_pragmas)
+
 
 async def init_db():
     """Инициализация базы данных"""
     try:
-        from app.infrastructure.database.models import Base
-        Base.metadata.create_all(bind=engine)
+        from app.infrastructure.database.schema import upgrade_database, find_missing_indexes
+        # Миграции выполняются синхронным движком в отдельном потоке
+        await asyncio.to_thread(upgrade_database)
+        missing = await asyncio.to_thread(find_missing_indexes)
+        for table_name, index_name in missing:
+            db_logger.warning(f"Отсутствует индекс {index_name} в таблице {table_name}: запросы будут выполняться полным сканированием")
         db_logger.info(f"Инициализирован движок БД: {settings.database_url}")
     except Exception as e:
         db_logger.error(f"Ошибка инициализации БД: {e}")
         raise
 
-def get_db():
-    """Генератор сессий базы данных"""
-    db = SessionLocal()
-    try:
+async def close_db():
+    """Закрытие пулов подключений к базе данных"""
+    await async_engine.dispose()
+    engine.dispose()
+    db_logger.info("Подключения к БД закрыты")
+
+async def get_db():
+    """Генератор асинхронных сессий базы данных"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
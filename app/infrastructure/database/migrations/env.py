@@ -0,0 +1,78 @@
+"""Окружение Alembic для миграций схемы БД"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+from app.core.config.settings import settings
+from app.infrastructure.database.models import Base
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Таблицы, которые создаются миграциями вручную и не описаны в моделях
+UNMANAGED_TABLE_PREFIXES = ("users_fts",)
+
+
+def _include_name(name, type_, parent_names) -> bool:
+    if type_ == "table" and name:
+        return not name.startswith(UNMANAGED_TABLE_PREFIXES)
+    return True
+
+
+def _database_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or settings.database_url
+
+
+def run_migrations_offline() -> None:
+    """Генерация SQL без подключения к БД"""
+    url = _database_url()
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        include_name=_include_name,
+        render_as_batch=url.startswith("sqlite"),
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=_include_name,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Применение миграций к БД"""
+    # Приложение передает готовое подключение через Config.attributes
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations(connection)
+        return
+
+    engine = create_engine(_database_url())
+    try:
+        with engine.connect() as connection:
+            _run_migrations(connection)
+    finally:
+        engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
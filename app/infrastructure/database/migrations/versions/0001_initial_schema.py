@@ -0,0 +1,59 @@
+"""Исходная схема: таблица users
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-09-01 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('unique_id', sa.String(), nullable=False),
+        sa.Column('firstname', sa.String(), nullable=False),
+        sa.Column('secondname', sa.String(), nullable=False),
+        sa.Column('thirdname', sa.String(), nullable=True),
+        sa.Column('company', sa.String(), nullable=False),
+        sa.Column('department', sa.String(), nullable=False),
+        sa.Column('otdel', sa.String(), nullable=False),
+        sa.Column('appointment', sa.String(), nullable=False),
+        sa.Column('mobile_phone', sa.String(), nullable=True),
+        sa.Column('work_phone', sa.String(), nullable=True),
+        sa.Column('current_location_id', sa.String(), nullable=False),
+        sa.Column('boss_id', sa.String(), nullable=True),
+        sa.Column('birth_date', sa.String(), nullable=True),
+        sa.Column('object_date_vihod', sa.String(), nullable=True),
+        sa.Column('dismissal_date', sa.String(), nullable=True),
+        sa.Column('worktype_id', sa.String(), nullable=True),
+        sa.Column('is_engineer', sa.Integer(), nullable=True),
+        sa.Column('o_id', sa.String(), nullable=True),
+        sa.Column('status', sa.Enum('PENDING', 'CREATING', 'APPROVED', 'REJECTED', 'DISMISSED', name='userstatus'), nullable=True),
+        sa.Column('upload_date', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('is_update', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_unique_id', 'users', ['unique_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_unique_id', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,52 @@
+"""Индексы для курсорной пагинации из database_optimization.sql
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Имена совпадают с database_optimization.sql, поэтому индексы, созданные
+# вручную из этого файла, не дублируются (if_not_exists)
+STATUS_PARTIAL_INDEXES = {
+    'idx_users_pending': 'PENDING',
+    'idx_users_dismissed': 'DISMISSED',
+    'idx_users_approved': 'APPROVED',
+    'idx_users_rejected': 'REJECTED',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_users_status_id', 'users', ['status', 'id'], if_not_exists=True)
+    op.create_index('idx_users_upload_date', 'users', ['upload_date'], if_not_exists=True)
+    for index_name, status in STATUS_PARTIAL_INDEXES.items():
+        # Файл оптимизации создавал частичные индексы по значению ('pending'),
+        # а Enum хранится по имени ('PENDING') - такие индексы не используются
+        op.execute(f"DROP INDEX IF EXISTS {index_name}")
+        op.create_index(
+            index_name, 'users', ['id'],
+            sqlite_where=sa.text(f"status = '{status}'"),
+            postgresql_where=sa.text(f"status = '{status}'"),
+        )
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for index_name in STATUS_PARTIAL_INDEXES:
+        op.drop_index(index_name, table_name='users')
+    op.drop_index('idx_users_upload_date', table_name='users')
+    op.drop_index('idx_users_status_id', table_name='users')
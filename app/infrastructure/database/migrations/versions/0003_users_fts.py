@@ -0,0 +1,82 @@
+"""Полнотекстовый индекс FTS5 для поиска пользователей
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FTS_COLUMNS = ("firstname", "secondname", "thirdname", "unique_id")
+
+
+def _normalized(prefix: str) -> str:
+    """Значения колонок с заменой "ё" на "е" для записи в индекс"""
+    return ", ".join(
+        f"replace(replace({prefix}{name}, 'ё', 'е'), 'Ё', 'Е')" for name in FTS_COLUMNS
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # FTS5 есть только в SQLite; на других СУБД поиск остается на ILIKE
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    columns = ", ".join(FTS_COLUMNS)
+    # Contentless-индекс: хранит только токены, текст берется из users по rowid.
+    # unicode61 приводит кириллицу к нижнему регистру, но не сводит "ё" к "е",
+    # поэтому триггеры пишут в индекс уже нормализованные значения
+    op.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            {columns},
+            content='',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts(rowid, {columns})
+            VALUES (new.id, {_normalized('new.')});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts(users_fts, rowid, {columns})
+            VALUES ('delete', old.id, {_normalized('old.')});
+        END
+    """)
+    # Смена статуса не затрагивает индекс: триггер только на поля поиска
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_fts_au
+        AFTER UPDATE OF {columns} ON users BEGIN
+            INSERT INTO users_fts(users_fts, rowid, {columns})
+            VALUES ('delete', old.id, {_normalized('old.')});
+            INSERT INTO users_fts(rowid, {columns})
+            VALUES (new.id, {_normalized('new.')});
+        END
+    """)
+    op.execute(f"""
+        INSERT INTO users_fts(rowid, {columns})
+        SELECT id, {_normalized('')} FROM users
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS users_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS users_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS users_fts_ai")
+    op.execute("DROP TABLE IF EXISTS users_fts")
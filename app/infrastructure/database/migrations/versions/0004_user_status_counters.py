@@ -0,0 +1,71 @@
+"""Счетчики пользователей по статусам
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUSES = ('PENDING', 'CREATING', 'APPROVED', 'REJECTED', 'DISMISSED')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_status_counters',
+        sa.Column('status', sa.Enum(*STATUSES, name='userstatus'), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('status'),
+    )
+    # Строка на каждый статус заранее, чтобы триггерам хватало UPDATE
+    op.execute(
+        "INSERT INTO user_status_counters (status, count) VALUES "
+        + ", ".join(f"('{status}', 0)" for status in STATUSES)
+    )
+    op.execute("""
+        UPDATE user_status_counters
+        SET count = (SELECT COUNT(*) FROM users WHERE users.status = user_status_counters.status)
+    """)
+
+    # Триггеры есть только для SQLite; на других СУБД репозиторий считает COUNT(*)
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS user_status_counters_ai AFTER INSERT ON users BEGIN
+            UPDATE user_status_counters SET count = count + 1 WHERE status = new.status;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS user_status_counters_ad AFTER DELETE ON users BEGIN
+            UPDATE user_status_counters SET count = count - 1 WHERE status = old.status;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS user_status_counters_au
+        AFTER UPDATE OF status ON users
+        WHEN old.status IS NOT new.status BEGIN
+            UPDATE user_status_counters SET count = count - 1 WHERE status = old.status;
+            UPDATE user_status_counters SET count = count + 1 WHERE status = new.status;
+        END
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS user_status_counters_au")
+        op.execute("DROP TRIGGER IF EXISTS user_status_counters_ad")
+        op.execute("DROP TRIGGER IF EXISTS user_status_counters_ai")
+    op.drop_table('user_status_counters')
@@ -0,0 +1,62 @@
+"""Версия данных пользователей для проверки курсоров
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Изменения этих полей могут изменить состав выборки списка или поиска
+FILTER_COLUMNS = "status, firstname, secondname, thirdname, unique_id"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users_data_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.execute("INSERT INTO users_data_version (id, version) VALUES (1, 0)")
+
+    # Триггеры есть только для SQLite; на других СУБД курсор всегда пересчитывает итог
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_data_version_ai AFTER INSERT ON users BEGIN
+            UPDATE users_data_version SET version = version + 1 WHERE id = 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_data_version_ad AFTER DELETE ON users BEGIN
+            UPDATE users_data_version SET version = version + 1 WHERE id = 1;
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_data_version_au
+        AFTER UPDATE OF {FILTER_COLUMNS} ON users BEGIN
+            UPDATE users_data_version SET version = version + 1 WHERE id = 1;
+        END
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS users_data_version_au")
+        op.execute("DROP TRIGGER IF EXISTS users_data_version_ad")
+        op.execute("DROP TRIGGER IF EXISTS users_data_version_ai")
+    op.drop_table('users_data_version')
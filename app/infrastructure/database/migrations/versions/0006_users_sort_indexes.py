@@ -0,0 +1,42 @@
+"""Индексы для keyset-пагинации по полям сортировки
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (upload_date, id) покрывает существующий idx_users_upload_date
+SORT_INDEXES = {
+    'idx_users_status_secondname_id': ['status', 'secondname', 'id'],
+    'idx_users_status_firstname_id': ['status', 'firstname', 'id'],
+    'idx_users_status_company_id': ['status', 'company', 'id'],
+    'idx_users_status_upload_date_id': ['status', 'upload_date', 'id'],
+    'idx_users_secondname_id': ['secondname', 'id'],
+    'idx_users_firstname_id': ['firstname', 'id'],
+    'idx_users_company_id': ['company', 'id'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for index_name, columns in SORT_INDEXES.items():
+        op.create_index(index_name, 'users', columns, if_not_exists=True)
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for index_name in reversed(list(SORT_INDEXES)):
+        op.drop_index(index_name, table_name='users')
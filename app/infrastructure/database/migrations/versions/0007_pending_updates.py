@@ -0,0 +1,110 @@
+"""Таблица pending_updates вместо записей-дублей <unique_id>_update_<время>
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-10-17 00:00:00
+
+"""
+import json
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUSES = ('PENDING', 'CREATING', 'APPROVED', 'REJECTED', 'DISMISSED')
+# Копия app.domain.entities.user.PENDING_UPDATE_FIELDS на момент миграции
+FIELDS = (
+    'firstname', 'secondname', 'thirdname', 'company', 'department', 'otdel',
+    'appointment', 'work_phone', 'mobile_phone', 'current_location_id', 'boss_id', 'is_engineer',
+)
+SHADOW_UNIQUE_ID = re.compile(r'^(.+?)_update_\d+$')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'pending_updates',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('original_user_id', sa.Integer(), nullable=False),
+        sa.Column('previous_status', sa.Enum(*STATUSES, name='userstatus'), nullable=False),
+        sa.Column('changes', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['original_user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_pending_updates_original_user_id', 'pending_updates', ['original_user_id'], unique=True)
+    migrate_shadow_rows()
+
+
+def migrate_shadow_rows() -> None:
+    """
+    Незавершенные записи-дубли переносятся в pending_updates (только измененные поля),
+    оригинальный пользователь помечается is_update и попадает в ожидающие.
+    Отклоненные дубли удаляются; дубли без оригинала остаются как есть
+    """
+    bind = op.get_bind()
+    columns = ', '.join(('id', 'unique_id', 'status', 'created_at') + FIELDS)
+    shadows = bind.execute(sa.text(
+        f"SELECT {columns} FROM users WHERE is_update = :flag AND unique_id LIKE '%\\_update\\_%' ESCAPE '\\' ORDER BY id"
+    ), {'flag': True}).mappings().all()
+    if not shadows:
+        return
+
+    # Последняя запись об обновлении на каждого оригинального пользователя
+    latest = {}
+    for shadow in shadows:
+        match = SHADOW_UNIQUE_ID.match(shadow['unique_id'])
+        if match:
+            latest.setdefault(match.group(1), []).append(shadow)
+
+    originals = {}
+    original_ids = list(latest)
+    for start in range(0, len(original_ids), 500):
+        rows = bind.execute(
+            sa.text(f"SELECT id, unique_id, status, {', '.join(FIELDS)} FROM users WHERE unique_id IN :ids")
+            .bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': original_ids[start:start + 500]},
+        ).mappings().all()
+        originals.update({row['unique_id']: row for row in rows})
+
+    for original_unique_id, records in latest.items():
+        original = originals.get(original_unique_id)
+        if original is None:
+            continue
+        pending = [record for record in records if record['status'] == 'PENDING']
+        if pending:
+            shadow = pending[-1]
+            changes = {field: shadow[field] for field in FIELDS if shadow[field] != original[field]}
+            bind.execute(sa.text(
+                "INSERT INTO pending_updates (original_user_id, previous_status, changes, created_at, updated_at) "
+                "VALUES (:user_id, :status, :changes, :created_at, :created_at)"
+            ), {
+                'user_id': original['id'],
+                'status': original['status'],
+                'changes': json.dumps(changes, ensure_ascii=False),
+                'created_at': shadow['created_at'],
+            })
+            bind.execute(
+                sa.text("UPDATE users SET status = 'PENDING', is_update = :flag WHERE id = :user_id"),
+                {'flag': True, 'user_id': original['id']},
+            )
+        bind.execute(
+            sa.text("DELETE FROM users WHERE id IN :ids").bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': [record['id'] for record in records]},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Записи-дубли не восстанавливаются: ожидающие изменения теряются
+    op.drop_index('ix_pending_updates_original_user_id', table_name='pending_updates')
+    op.drop_table('pending_updates')
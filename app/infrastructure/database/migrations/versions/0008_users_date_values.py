@@ -0,0 +1,71 @@
+"""Даты из 1C в колонках DATE с индексами
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-10-17 00:00:00
+
+"""
+from datetime import date, datetime
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DATE_FIELDS = ('birth_date', 'object_date_vihod', 'dismissal_date')
+# Копия app.core.utils.dates.DATE_FORMATS на момент миграции
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%Y%m%d')
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    text = (value or '').strip().replace('T', ' ').split(' ', 1)[0]
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+        return parsed if parsed.year > 1 else None
+    return None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for field in DATE_FIELDS:
+        op.add_column('users', sa.Column(f'{field}_value', sa.Date(), nullable=True))
+
+    # Заполнение из строковых колонок
+    bind = op.get_bind()
+    users = sa.table('users', sa.column('id'), *[sa.column(f'{field}_value', sa.Date()) for field in DATE_FIELDS])
+    rows = bind.execute(sa.text(
+        f"SELECT id, {', '.join(DATE_FIELDS)} FROM users WHERE "
+        + " OR ".join(f"{field} IS NOT NULL" for field in DATE_FIELDS)
+    )).mappings().all()
+    values = [
+        {'user_id': row['id'], **{f'{field}_value': parse_date(row[field]) for field in DATE_FIELDS}}
+        for row in rows
+    ]
+    for start in range(0, len(values), 1000):
+        bind.execute(
+            users.update().where(users.c.id == sa.bindparam('user_id')),
+            values[start:start + 1000],
+        )
+
+    for field in DATE_FIELDS:
+        op.create_index(f'idx_users_{field}_value', 'users', [f'{field}_value'], unique=False)
+    if bind.dialect.name == 'sqlite':
+        op.execute('ANALYZE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for field in DATE_FIELDS:
+        op.drop_index(f'idx_users_{field}_value', table_name='users')
+    # ALTER TABLE ... DROP COLUMN (SQLite >= 3.35), без пересоздания таблицы и ее триггеров
+    for field in DATE_FIELDS:
+        op.drop_column('users', f'{field}_value')
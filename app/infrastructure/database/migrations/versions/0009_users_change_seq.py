@@ -0,0 +1,81 @@
+"""Последовательность изменений users для ленты изменений
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Следующий номер изменения и его запись в строку users с id = {user_id}
+NEXT_CHANGE_SEQ = """
+    UPDATE user_change_sequence SET value = value + 1 WHERE id = 1;
+    UPDATE users SET change_seq = (SELECT value FROM user_change_sequence WHERE id = 1) WHERE id = {user_id};
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_change_sequence',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.add_column('users', sa.Column('change_seq', sa.Integer(), nullable=True))
+
+    # Существующие записи нумеруются в порядке последнего изменения
+    op.execute("""
+        WITH ordered AS (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY updated_at, id) AS seq FROM users
+        )
+        UPDATE users SET change_seq = ordered.seq FROM ordered WHERE users.id = ordered.id
+    """)
+    op.execute("INSERT INTO user_change_sequence (id, value) SELECT 1, COUNT(*) FROM users")
+    op.create_index('idx_users_change_seq', 'users', ['change_seq'], unique=False)
+
+    # Триггеры есть только для SQLite; на других СУБД лента изменений недоступна
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_change_seq_ai AFTER INSERT ON users BEGIN
+            {NEXT_CHANGE_SEQ.format(user_id="new.id")}
+        END
+    """)
+    # Запись change_seq самим триггером его не запускает повторно (условие WHEN)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_change_seq_au
+        AFTER UPDATE ON users
+        WHEN new.change_seq IS old.change_seq BEGIN
+            {NEXT_CHANGE_SEQ.format(user_id="new.id")}
+        END
+    """)
+    # Замена ожидающих изменений из 1C без изменения самой строки users
+    # тоже попадает в ленту: pending_changes входят в ответ
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS pending_updates_change_seq_au AFTER UPDATE ON pending_updates BEGIN
+            {NEXT_CHANGE_SEQ.format(user_id="new.original_user_id")}
+        END
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS pending_updates_change_seq_au")
+        op.execute("DROP TRIGGER IF EXISTS users_change_seq_au")
+        op.execute("DROP TRIGGER IF EXISTS users_change_seq_ai")
+    op.drop_index('idx_users_change_seq', table_name='users')
+    op.drop_column('users', 'change_seq')
+    op.drop_table('user_change_sequence')
@@ -0,0 +1,66 @@
+"""Архивная таблица users_archive для уволенных и отклоненных пользователей
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUSES = ('PENDING', 'CREATING', 'APPROVED', 'REJECTED', 'DISMISSED')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('unique_id', sa.String(), nullable=False),
+        sa.Column('firstname', sa.String(), nullable=False),
+        sa.Column('secondname', sa.String(), nullable=False),
+        sa.Column('thirdname', sa.String(), nullable=True),
+        sa.Column('company', sa.String(), nullable=False),
+        sa.Column('department', sa.String(), nullable=False),
+        sa.Column('otdel', sa.String(), nullable=False),
+        sa.Column('appointment', sa.String(), nullable=False),
+        sa.Column('mobile_phone', sa.String(), nullable=True),
+        sa.Column('work_phone', sa.String(), nullable=True),
+        sa.Column('current_location_id', sa.String(), nullable=False),
+        sa.Column('boss_id', sa.String(), nullable=True),
+        sa.Column('birth_date', sa.String(), nullable=True),
+        sa.Column('object_date_vihod', sa.String(), nullable=True),
+        sa.Column('dismissal_date', sa.String(), nullable=True),
+        sa.Column('birth_date_value', sa.Date(), nullable=True),
+        sa.Column('object_date_vihod_value', sa.Date(), nullable=True),
+        sa.Column('dismissal_date_value', sa.Date(), nullable=True),
+        sa.Column('worktype_id', sa.String(), nullable=True),
+        sa.Column('is_engineer', sa.Integer(), nullable=True),
+        sa.Column('o_id', sa.String(), nullable=True),
+        sa.Column('status', sa.Enum(*STATUSES, name='userstatus'), nullable=True),
+        sa.Column('upload_date', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('is_update', sa.Boolean(), nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('idx_users_archive_unique_id', 'users_archive', ['unique_id'], unique=False)
+    op.create_index('idx_users_archive_archived_at', 'users_archive', ['archived_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_users_archive_archived_at', table_name='users_archive')
+    op.drop_index('idx_users_archive_unique_id', table_name='users_archive')
+    op.drop_table('users_archive')
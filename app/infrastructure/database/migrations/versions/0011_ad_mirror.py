@@ -0,0 +1,63 @@
+"""Зеркало AD: таблицы ad_objects и ad_sync_state
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2025-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ad_objects',
+        sa.Column('object_guid', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('dn', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('sam_account_name', sa.String(), nullable=True),
+        sa.Column('pager', sa.String(), nullable=True),
+        sa.Column('display_name', sa.String(), nullable=True),
+        sa.Column('user_principal_name', sa.String(), nullable=True),
+        sa.Column('mail', sa.String(), nullable=True),
+        sa.Column('department', sa.String(), nullable=True),
+        sa.Column('company', sa.String(), nullable=True),
+        sa.Column('enabled', sa.Boolean(), nullable=True),
+        sa.Column('usn_changed', sa.Integer(), nullable=False),
+        sa.Column('synced_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('object_guid'),
+    )
+    op.create_index('idx_ad_objects_kind_name', 'ad_objects', ['kind', 'name'], unique=False)
+    op.create_index('idx_ad_objects_sam_account_name', 'ad_objects', ['sam_account_name'], unique=False)
+    op.create_index('idx_ad_objects_pager', 'ad_objects', ['pager'], unique=False)
+    op.create_index('idx_ad_objects_synced_at', 'ad_objects', ['synced_at'], unique=False)
+    op.create_table(
+        'ad_sync_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('server', sa.String(), nullable=False),
+        sa.Column('highest_usn', sa.Integer(), nullable=False),
+        sa.Column('full_sync_at', sa.DateTime(), nullable=False),
+        sa.Column('synced_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ad_sync_state')
+    op.drop_index('idx_ad_objects_synced_at', table_name='ad_objects')
+    op.drop_index('idx_ad_objects_pager', table_name='ad_objects')
+    op.drop_index('idx_ad_objects_sam_account_name', table_name='ad_objects')
+    op.drop_index('idx_ad_objects_kind_name', table_name='ad_objects')
+    op.drop_table('ad_objects')
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Enum as SQLEnum, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Enum as SQLEnum, Boolean, ForeignKey, Index, JSON, text, table, column
 from sqlalchemy.ext.declarative import declarative_base
 from app.domain.entities.user import UserStatus
 
@@ -22,9 +22,14 @@ class UserModel(Base):
     work_phone = Column(String, nullable=True)
     current_location_id = Column(String, nullable=False)
     boss_id = Column(String, nullable=True)
+    # Даты в том виде, в каком их прислала 1C (для аудита)
     birth_date = Column(String, nullable=True)
     object_date_vihod = Column(String, nullable=True)
     dismissal_date = Column(String, nullable=True)
+    # Те же даты, приведенные к DATE при записи (app.core.utils.dates.parse_date)
+    birth_date_value = Column(Date, nullable=True)
+    object_date_vihod_value = Column(Date, nullable=True)
+    dismissal_date_value = Column(Date, nullable=True)
     worktype_id = Column(String, nullable=True)
     is_engineer = Column(Integer, nullable=True)
     o_id = Column(String, nullable=True)
@@ -33,3 +38,160 @@ class UserModel(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     is_update = Column(Boolean, default=False, nullable=False)
+    # Номер последнего изменения записи (лента /api/users/changes), ставится триггерами (SQLite)
+    change_seq = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # Курсорная пагинация по статусу: WHERE status = ? AND id > ? ORDER BY id
+        Index("idx_users_status_id", "status", "id"),
+        Index("idx_users_upload_date", "upload_date"),
+        # Keyset-пагинация по полям сортировки (query_spec.SORTABLE_FIELDS)
+        Index("idx_users_status_secondname_id", "status", "secondname", "id"),
+        Index("idx_users_status_firstname_id", "status", "firstname", "id"),
+        Index("idx_users_status_company_id", "status", "company", "id"),
+        Index("idx_users_status_upload_date_id", "status", "upload_date", "id"),
+        Index("idx_users_secondname_id", "secondname", "id"),
+        Index("idx_users_firstname_id", "firstname", "id"),
+        Index("idx_users_company_id", "company", "id"),
+        # Отчеты и фильтры по диапазону дат
+        Index("idx_users_birth_date_value", "birth_date_value"),
+        Index("idx_users_object_date_vihod_value", "object_date_vihod_value"),
+        Index("idx_users_dismissal_date_value", "dismissal_date_value"),
+        Index("idx_users_change_seq", "change_seq"),
+        # Частичные индексы по статусам (Enum хранится по имени члена)
+        Index("idx_users_pending", "id", sqlite_where=text("status = 'PENDING'"), postgresql_where=text("status = 'PENDING'")),
+        Index("idx_users_dismissed", "id", sqlite_where=text("status = 'DISMISSED'"), postgresql_where=text("status = 'DISMISSED'")),
+        Index("idx_users_approved", "id", sqlite_where=text("status = 'APPROVED'"), postgresql_where=text("status = 'APPROVED'")),
+        Index("idx_users_rejected", "id", sqlite_where=text("status = 'REJECTED'"), postgresql_where=text("status = 'REJECTED'")),
+    )
+
+
+class UserArchiveModel(Base):
+    """
+    Архив: уволенные и отклоненные пользователи, перенесенные из users фоновой
+    задачей (app.domain.services.archive_service). Колонки совпадают с users,
+    id сохраняется; табельный номер не уникален - сотрудник может попасть в архив повторно
+    """
+    __tablename__ = "users_archive"
+
+    id = Column(Integer, primary_key=True)
+    unique_id = Column(String, nullable=False)
+    firstname = Column(String, nullable=False)
+    secondname = Column(String, nullable=False)
+    thirdname = Column(String, nullable=True)
+    company = Column(String, nullable=False)
+    department = Column(String, nullable=False)
+    otdel = Column(String, nullable=False)
+    appointment = Column(String, nullable=False)
+    mobile_phone = Column(String, nullable=True)
+    work_phone = Column(String, nullable=True)
+    current_location_id = Column(String, nullable=False)
+    boss_id = Column(String, nullable=True)
+    birth_date = Column(String, nullable=True)
+    object_date_vihod = Column(String, nullable=True)
+    dismissal_date = Column(String, nullable=True)
+    birth_date_value = Column(Date, nullable=True)
+    object_date_vihod_value = Column(Date, nullable=True)
+    dismissal_date_value = Column(Date, nullable=True)
+    worktype_id = Column(String, nullable=True)
+    is_engineer = Column(Integer, nullable=True)
+    o_id = Column(String, nullable=True)
+    status = Column(SQLEnum(UserStatus), nullable=True)
+    upload_date = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    is_update = Column(Boolean, default=False, nullable=False)
+    change_seq = Column(Integer, nullable=True)
+    archived_at = Column(DateTime, default=datetime.now, nullable=False)
+
+    __table_args__ = (
+        Index("idx_users_archive_unique_id", "unique_id"),
+        Index("idx_users_archive_archived_at", "archived_at"),
+    )
+
+
+class PendingUpdateModel(Base):
+    """Изменения из 1C для уже одобренного сотрудника, ожидающие подтверждения"""
+    __tablename__ = "pending_updates"
+
+    id = Column(Integer, primary_key=True)
+    original_user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Статус пользователя до появления изменений; возвращается при отклонении
+    previous_status = Column(SQLEnum(UserStatus), nullable=False)
+    # Только измененные поля (PENDING_UPDATE_FIELDS) с новыми значениями
+    changes = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        Index("ix_pending_updates_original_user_id", "original_user_id", unique=True),
+    )
+
+
+class UserStatusCounterModel(Base):
+    """Количество пользователей по статусам, поддерживается триггерами (SQLite)"""
+    __tablename__ = "user_status_counters"
+
+    status = Column(SQLEnum(UserStatus), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class UsersDataVersionModel(Base):
+    """Счетчик изменений users, влияющих на выборки; увеличивается триггерами (SQLite)"""
+    __tablename__ = "users_data_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class UserChangeSequenceModel(Base):
+    """Последний выданный номер изменения users; увеличивается триггерами (SQLite)"""
+    __tablename__ = "user_change_sequence"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class ADObjectModel(Base):
+    """Зеркало пользователей, групп и OU из AD; обновляется фоновой синхронизацией по uSNChanged"""
+    __tablename__ = "ad_objects"
+
+    object_guid = Column(String, primary_key=True)
+    # user, group или ou
+    kind = Column(String, nullable=False)
+    dn = Column(String, nullable=False)
+    name = Column(String, nullable=True)
+    sam_account_name = Column(String, nullable=True)
+    pager = Column(String, nullable=True)
+    display_name = Column(String, nullable=True)
+    user_principal_name = Column(String, nullable=True)
+    mail = Column(String, nullable=True)
+    department = Column(String, nullable=True)
+    company = Column(String, nullable=True)
+    enabled = Column(Boolean, nullable=True)
+    usn_changed = Column(Integer, nullable=False)
+    synced_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("idx_ad_objects_kind_name", "kind", "name"),
+        Index("idx_ad_objects_sam_account_name", "sam_account_name"),
+        Index("idx_ad_objects_pager", "pager"),
+        Index("idx_ad_objects_synced_at", "synced_at"),
+    )
+
+
+class ADSyncStateModel(Base):
+    """Состояние синхронизации зеркала AD: контроллер домена и его highestCommittedUSN на момент выгрузки"""
+    __tablename__ = "ad_sync_state"
+
+    id = Column(Integer, primary_key=True)
+    # dsServiceName контроллера: номера USN у каждого контроллера свои
+    server = Column(String, nullable=False)
+    highest_usn = Column(Integer, nullable=False)
+    full_sync_at = Column(DateTime, nullable=False)
+    synced_at = Column(DateTime, nullable=False)
+
+
+# Contentless-индекс FTS5 (только SQLite), создается миграцией 0003
+# и синхронизируется с users триггерами; в metadata не входит
+users_fts = table("users_fts", column("rowid"))
@@ -0,0 +1,129 @@
+"""Подписанные курсоры для курсорной пагинации"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+from typing import Any, List, Optional
+
+from app.core.config.settings import settings
+
+
+class InvalidCursorError(ValueError):
+    """Курсор поврежден, подписан другим ключом или не подходит к сортировке выборки"""
+
+
+_secret_key: Optional[bytes] = None
+
+
+def _load_secret_key() -> bytes:
+    """
+    Ключ подписи курсоров: CURSOR_SECRET_KEY либо ключ из файла CURSOR_SECRET_KEY_PATH.
+    Файл создается при первой подписи курсора, поэтому курсоры переживают перезапуск
+    и одинаковы у всех процессов, использующих каталог данных. Ключ читается один раз
+    за процесс; импорт модуля файлов не создает
+    """
+    global _secret_key
+    if _secret_key is not None:
+        return _secret_key
+    if settings.cursor_secret_key:
+        _secret_key = settings.cursor_secret_key.encode()
+        return _secret_key
+    path = settings.cursor_secret_key_path
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    try:
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        # O_EXCL: ключ пишет только первый процесс, остальные читают его
+        with os.fdopen(descriptor, "w") as key_file:
+            key_file.write(secrets.token_urlsafe(32))
+    with open(path) as key_file:
+        key = key_file.read().strip()
+    if not key:
+        raise RuntimeError(f"Файл ключа подписи курсоров пуст: {path}")
+    _secret_key = key.encode()
+    return _secret_key
+
+
+class PageCursor:
+    """Позиция в выборке (значения ключа сортировки) и данные, посчитанные на первой странице"""
+
+    def __init__(self, key: List[Any], fingerprint: str, total_count: Optional[int] = None, data_version: Optional[int] = None):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.total_count = total_count
+        self.data_version = data_version
+
+    def is_valid_total(self, fingerprint: str, data_version: Optional[int]) -> bool:
+        """Итог из курсора действителен для того же фильтра и неизменившихся данных"""
+        return (
+            self.total_count is not None
+            and data_version is not None
+            and self.fingerprint == fingerprint
+            and self.data_version == data_version
+        )
+
+
+def filter_fingerprint(**filters: Any) -> str:
+    """Короткий отпечаток параметров фильтра выборки"""
+    normalized = json.dumps(
+        {key: str(value) for key, value in filters.items() if value is not None},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+
+def _sign(payload: bytes, secret_key: bytes) -> str:
+    digest = hmac.new(secret_key, payload, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def encode_cursor(cursor: PageCursor) -> str:
+    """Курсор в виде <payload>.<подпись>"""
+    payload = json.dumps(
+        [cursor.key, cursor.fingerprint, cursor.total_count, cursor.data_version],
+        separators=(",", ":"),
+    ).encode()
+    encoded = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+    return f"{encoded}.{_sign(payload, _load_secret_key())}"
+
+
+def decode_cursor(cursor: str) -> Optional[PageCursor]:
+    """Разбор курсора; None если курсор поврежден или подпись не совпадает"""
+    # Ошибка чтения ключа - ошибка конфигурации, а не некорректный курсор
+    secret_key = _load_secret_key()
+    try:
+        if "." not in cursor:
+            # Курсор старого формата: base64 от id, без итога и отпечатка
+            return PageCursor([int(base64.b64decode(cursor.encode()).decode())], fingerprint="")
+
+        encoded, signature = cursor.split(".", 1)
+        payload = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+        if not hmac.compare_digest(signature, _sign(payload, secret_key)):
+            return None
+        key, fingerprint, total_count, data_version = json.loads(payload)
+        return PageCursor(list(key), fingerprint, total_count, data_version)
+    except Exception:
+        return None
+
+
+def encode_change_token(change_seq: int) -> str:
+    """
+    Токен ленты изменений: номер последнего полученного изменения. Подпись не нужна:
+    номер ничего не раскрывает, и токены остаются действительными после перезапуска
+    """
+    return str(change_seq)
+
+
+def decode_change_token(token: str) -> Optional[int]:
+    """Номер изменения из токена; None если токен не является неотрицательным числом"""
+    token = token.strip()
+    if not token.isascii() or not token.isdigit():
+        return None
+    return int(token)
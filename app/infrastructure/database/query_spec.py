@@ -0,0 +1,135 @@
+"""Описание выборки пользователей: фильтры, сортировка и keyset-условие курсора"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, tuple_
+
+from app.infrastructure.database.pagination import filter_fingerprint
+
+# Поля, по которым разрешена сортировка списков. Все они NOT NULL, поэтому
+# keyset-сравнение не требует особой обработки NULL. Для каждого поля есть
+# индексы (status, поле, id) и (поле, id) - см. UserModel.__table_args__
+SORTABLE_FIELDS = {
+    "id": int,
+    "secondname": str,
+    "firstname": str,
+    "company": str,
+    "upload_date": datetime,
+}
+
+DEFAULT_SORT = "id"
+
+# Даты из 1C, для которых есть колонка <поле>_value типа DATE с индексом
+DATE_FIELDS = ("birth_date", "object_date_vihod", "dismissal_date")
+
+# Поле -> (начало, конец) включительно; любая граница может отсутствовать
+DateRanges = Dict[str, Tuple[Optional[date], Optional[date]]]
+
+
+def date_range_conditions(entity, date_ranges: Optional[DateRanges]) -> list:
+    """Условия диапазонов дат по колонкам <поле>_value"""
+    conditions = []
+    for field, (start, end) in (date_ranges or {}).items():
+        column = getattr(entity, f"{field}_value")
+        if start:
+            conditions.append(column >= start)
+        if end:
+            conditions.append(column <= end)
+    return conditions
+
+
+class SortKey:
+    """Поле сортировки и направление"""
+
+    def __init__(self, field: str, descending: bool = False):
+        self.field = field
+        self.descending = descending
+
+    def __str__(self) -> str:
+        return f"-{self.field}" if self.descending else self.field
+
+
+def parse_sort(sort: Optional[str]) -> List[SortKey]:
+    """
+    Разбор параметра сортировки вида "secondname,-upload_date".
+
+    В конец всегда добавляется id с направлением последнего поля, чтобы порядок
+    был однозначным и индекс можно было читать в одну сторону.
+    """
+    keys: List[SortKey] = []
+    for part in (sort or DEFAULT_SORT).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        descending = part.startswith("-")
+        field = part.lstrip("+-")
+        if field not in SORTABLE_FIELDS:
+            raise ValueError(
+                f"Недопустимое поле сортировки '{field}'. Доступны: {', '.join(SORTABLE_FIELDS)}"
+            )
+        if any(key.field == field for key in keys):
+            raise ValueError(f"Поле сортировки '{field}' указано несколько раз")
+        keys.append(SortKey(field, descending))
+        if field == "id":
+            break
+
+    if not keys:
+        keys.append(SortKey("id"))
+    if keys[-1].field != "id":
+        keys.append(SortKey("id", keys[-1].descending))
+    return keys
+
+
+class UserQuerySpec:
+    """Фильтры, сортировка и отпечаток выборки для курсорной пагинации"""
+
+    def __init__(self, conditions: list, sort: Optional[str] = None, **filters: Any):
+        self.conditions = conditions
+        self.sort_keys = parse_sort(sort)
+        self.fingerprint = filter_fingerprint(sort=",".join(map(str, self.sort_keys)), **filters)
+
+    def order_by(self, entity) -> list:
+        """ORDER BY для модели или ее псевдонима"""
+        columns = []
+        for key in self.sort_keys:
+            column = getattr(entity, key.field)
+            columns.append(column.desc() if key.descending else column.asc())
+        return columns
+
+    def key_values(self, model) -> list:
+        """Значения ключа сортировки строки для курсора (JSON-совместимые)"""
+        values = []
+        for key in self.sort_keys:
+            value = getattr(model, key.field)
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        return values
+
+    def parse_key(self, values: Optional[list]) -> Optional[list]:
+        """Значения ключа из курсора; None если курсор от другой сортировки"""
+        if not values or len(values) != len(self.sort_keys):
+            return None
+        parsed = []
+        for key, value in zip(self.sort_keys, values):
+            field_type = SORTABLE_FIELDS[key.field]
+            parsed.append(datetime.fromisoformat(value) if field_type is datetime else field_type(value))
+        return parsed
+
+    def seek_condition(self, entity, key: list):
+        """Условие "строго после ключа" в порядке сортировки"""
+        columns = [getattr(entity, sort_key.field) for sort_key in self.sort_keys]
+        directions = {sort_key.descending for sort_key in self.sort_keys}
+        if len(directions) == 1:
+            # Одно направление: сравнение кортежей, которое индекс читает как диапазон
+            if directions.pop():
+                return tuple_(*columns) < tuple_(*key)
+            return tuple_(*columns) > tuple_(*key)
+
+        # Разные направления: (a > x) OR (a = x AND b < y) OR ...
+        alternatives = []
+        for position, sort_key in enumerate(self.sort_keys):
+            column = columns[position]
+            value = key[position]
+            step = column < value if sort_key.descending else column > value
+            equal_prefix = [columns[i] == key[i] for i in range(position)]
+            alternatives.append(and_(*equal_prefix, step))
+        return or_(*alternatives)
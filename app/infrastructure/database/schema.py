@@ -0,0 +1,54 @@
+"""Управление схемой БД: миграции Alembic и проверка индексов"""
+from pathlib import Path
+from typing import List, Tuple
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from app.core.logging.logger import db_logger
+from app.infrastructure.database.database import engine
+from app.infrastructure.database.models import Base
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+# Ревизия, соответствующая схеме, которую раньше создавал create_all
+BASELINE_REVISION = "0001"
+
+
+def _alembic_config(connection) -> Config:
+    ini_path = PROJECT_ROOT / "alembic.ini"
+    config = Config(str(ini_path)) if ini_path.exists() else Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def upgrade_database() -> None:
+    """Применение миграций до последней ревизии"""
+    with engine.begin() as connection:
+        config = _alembic_config(connection)
+        tables = inspect(connection).get_table_names()
+        # База создана до появления миграций: фиксируем исходную ревизию
+        if "users" in tables and "alembic_version" not in tables:
+            db_logger.info(f"Существующая схема без версии, отметка ревизии {BASELINE_REVISION}")
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+    db_logger.info("Миграции БД применены")
+
+
+def find_missing_indexes() -> List[Tuple[str, str]]:
+    """Список индексов из моделей, которых нет в БД"""
+    missing = []
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            missing.extend((table.name, index.name) for index in table.indexes)
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(
+            (table.name, index.name) for index in table.indexes if index.name not in existing
+        )
+    return missing
@@ -1,49 +1,257 @@
-from typing import List, Optional, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, insert, literal_column, or_, select, text, union_all, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 from app.domain.repositories.user_repository import UserRepository
-from app.domain.entities.user import User, UserStatus
-from app.infrastructure.database.models import UserModel
+from app.domain.entities.user import PENDING_UPDATE_FIELDS, User, UserStatus
+from app.infrastructure.database.models import (
+    PendingUpdateModel, UserArchiveModel, UserChangeSequenceModel, UserModel, UserStatusCounterModel, UsersDataVersionModel,
+    users_fts,
+)
+from app.infrastructure.database.pagination import InvalidCursorError, PageCursor, decode_cursor, encode_cursor
+from app.infrastructure.database.query_spec import DATE_FIELDS, DateRanges, UserQuerySpec, date_range_conditions
+from app.core.utils.dates import parse_date
 from app.core.logging.logger import db_logger
 from datetime import datetime
-import base64
+import re
+
+# Слова поискового запроса; кавычки и операторы FTS5 в запрос не попадают
+FTS_TOKEN_PATTERN = re.compile(r"\w+")
+# Ожидаемый текущий статус (или несколько) для условных переходов
+ExpectedStatus = Optional[Union[UserStatus, Iterable[UserStatus]]]
+# Колонки, которые отдают списки пользователей (поля UserResponse)
+LIST_PAGE_COLUMNS = (
+    UserModel.id, UserModel.unique_id, UserModel.firstname, UserModel.secondname, UserModel.thirdname,
+    UserModel.company, UserModel.department, UserModel.otdel, UserModel.appointment,
+    UserModel.mobile_phone, UserModel.work_phone, UserModel.current_location_id, UserModel.boss_id,
+    UserModel.birth_date, UserModel.object_date_vihod, UserModel.dismissal_date, UserModel.worktype_id,
+    UserModel.is_engineer, UserModel.o_id, UserModel.status, UserModel.upload_date,
+    UserModel.created_at, UserModel.updated_at, UserModel.is_update,
+)
+# Веса bm25 по колонкам users_fts: firstname, secondname, thirdname, unique_id
+FTS_RANK_WEIGHTS = (2.0, 3.0, 1.0, 2.0)
+# Байт на диске по таблицам users (с FTS-индексом как users_fts) и users_archive вместе с индексами
+TABLE_SIZES_SQL = """
+    SELECT CASE WHEN m.tbl_name LIKE 'users_fts%' THEN 'users_fts' ELSE m.tbl_name END AS tbl, SUM(d.pgsize)
+    FROM dbstat AS d JOIN sqlite_master AS m ON m.name = d.name
+    WHERE m.tbl_name IN ('users', 'users_archive') OR m.tbl_name LIKE 'users_fts%'
+    GROUP BY tbl
+"""
+# Значения PRAGMA auto_vacuum
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+def with_date_values(values: dict) -> dict:
+    """Значения для записи с DATE-колонками (<поле>_value) для присланных строковых дат"""
+    dates = {f"{field}_value": parse_date(values[field]) for field in DATE_FIELDS if field in values}
+    return {**values, **dates} if dates else values
+
 
 class SQLAlchemyUserRepository(UserRepository):
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
+        # Карта идентичности на время запроса: прочитанные и записанные пользователи по id
+        self._identity: Dict[int, User] = {}
         db_logger.info("SQLAlchemyUserRepository инициализирован")
 
+    def _remember(self, user: User) -> User:
+        self._identity[user.id] = user
+        return user
+
+    async def _update_returning(self, user_id: int, values: dict, expected_status: ExpectedStatus = None) -> Optional[User]:
+        """
+        UPDATE ... RETURNING одной командой; с expected_status строка меняется,
+        только если ее текущий статус совпадает с ожидаемым
+        """
+        statement = update(UserModel).where(UserModel.id == user_id)
+        if expected_status is not None:
+            expected = (expected_status,) if isinstance(expected_status, UserStatus) else tuple(expected_status)
+            statement = statement.where(UserModel.status.in_(expected))
+        statement = statement.values(**with_date_values(values), updated_at=datetime.now()).returning(*LIST_PAGE_COLUMNS)
+
+        result = await self.db.execute(statement, execution_options={"synchronize_session": False})
+        row = result.first()
+        await self.db.commit()
+        if row is None:
+            self._identity.pop(user_id, None)
+            return None
+        return self._remember(User.model_validate(dict(row._mapping)))
+
+    def _fts_query(self, search: str) -> Optional[str]:
+        """Запрос FTS5 с поиском по префиксу каждого слова, None если FTS недоступен"""
+        if self.db.bind.dialect.name != "sqlite":
+            return None
+        # В индексе "ё" заменена на "е" (см. миграцию 0003)
+        tokens = FTS_TOKEN_PATTERN.findall(search.replace("ё", "е").replace("Ё", "Е"))
+        if not tokens:
+            return None
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    def _fts_match(self, fts_query: str):
+        return literal_column("users_fts").op("MATCH")(fts_query)
+
+    def _search_condition(self, search: str):
+        """Условие поиска по ФИО и unique_id"""
+        fts_query = self._fts_query(search)
+        if fts_query:
+            return UserModel.id.in_(
+                select(users_fts.c.rowid).where(self._fts_match(fts_query))
+            )
+        return self._like_search_condition(search)
+
+    def _like_search_condition(self, search: str, entity=UserModel):
+        """Условие поиска подстрокой (для СУБД без FTS5 и для архива)"""
+        search_term = f"%{search}%"
+        return (
+            (entity.firstname.ilike(search_term)) |
+            (entity.secondname.ilike(search_term)) |
+            (entity.thirdname.ilike(search_term)) |
+            (entity.unique_id.ilike(search_term))
+        )
+
+    async def _status_total(self, status: Optional[UserStatus] = None) -> Optional[int]:
+        """Количество пользователей по счетчикам статусов, None если счетчики не ведутся"""
+        if self.db.bind.dialect.name != "sqlite":
+            return None
+        query = select(func.coalesce(func.sum(UserStatusCounterModel.count), 0))
+        if status:
+            query = query.where(UserStatusCounterModel.status == status)
+        result = await self.db.execute(query)
+        return result.scalar_one()
+
+    async def _data_version(self) -> Optional[int]:
+        """Текущая версия данных users, None если версия не ведется"""
+        if self.db.bind.dialect.name != "sqlite":
+            return None
+        result = await self.db.execute(
+            select(UsersDataVersionModel.version).where(UsersDataVersionModel.id == 1)
+        )
+        return result.scalar_one_or_none()
+
+    async def _fetch_cursor_page(self, spec: UserQuerySpec, cursor: Optional[str], limit: int, total_count: Optional[int] = None, as_rows: bool = False, entity=UserModel) -> dict:
+        """
+        Общий запрос страницы с keyset-пагинацией по ключу сортировки спецификации.
+        as_rows=True читает только колонки ответа и возвращает словари вместо User;
+        entity - источник строк (UserModel или псевдоним над users и архивом)
+        """
+        page_cursor = decode_cursor(cursor) if cursor else None
+        key = spec.parse_key(page_cursor.key) if page_cursor else None
+        if cursor and key is None:
+            # Выборка с начала вернула бы клиенту уже полученные строки повторно
+            raise InvalidCursorError("Некорректный курсор пагинации")
+
+        data_version = None
+        if total_count is None:
+            data_version = await self._data_version()
+            # Итог, посчитанный на первой странице, пока данные не менялись
+            if key and page_cursor.is_valid_total(spec.fingerprint, data_version):
+                total_count = page_cursor.total_count
+
+        source = [getattr(entity, column.key) for column in LIST_PAGE_COLUMNS] if as_rows else [entity]
+        if total_count is None:
+            # Итог и страница одним запросом: окно считает всю выборку,
+            # условие курсора применяется снаружи
+            filtered = select(*source, func.count().over().label("total_count")).where(*spec.conditions).subquery()
+            if as_rows:
+                page_entity = filtered.c
+                query = select(*[filtered.c[column.key] for column in LIST_PAGE_COLUMNS], filtered.c.total_count)
+            else:
+                page_entity = aliased(UserModel, filtered)
+                query = select(page_entity, filtered.c.total_count)
+        else:
+            page_entity = entity
+            query = select(*source).where(*spec.conditions)
+
+        if key:
+            query = query.where(spec.seek_condition(page_entity, key))
+        query = query.order_by(*spec.order_by(page_entity)).limit(limit + 1)
+        rows = (await self.db.execute(query)).all()
+
+        if total_count is None:
+            if rows:
+                total_count = rows[0].total_count
+            else:
+                count_result = await self.db.execute(
+                    select(func.count(entity.id)).where(*spec.conditions)
+                )
+                total_count = count_result.scalar_one()
+
+        has_more = len(rows) > limit
+        if has_more:
+            rows = rows[:-1]
+
+        if as_rows:
+            users = [{column.key: row._mapping[column.key] for column in LIST_PAGE_COLUMNS} for row in rows]
+            for user in users:
+                user["pending_changes"] = None
+        else:
+            users = [User.model_validate(row[0]) for row in rows]
+        await self._attach_pending_changes(users)
+
+        next_cursor = None
+        if rows and has_more:
+            last = rows[-1] if as_rows else rows[-1][0]
+            next_cursor = encode_cursor(
+                PageCursor(spec.key_values(last), spec.fingerprint, total_count, data_version)
+            )
+
+        return {
+            "users": users,
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "total_count": total_count
+        }
+
+    async def _attach_pending_changes(self, users: list) -> None:
+        """Ожидающие изменения из 1C для пользователей страницы с is_update одним запросом"""
+        def get(user, field):
+            return user[field] if isinstance(user, dict) else getattr(user, field)
+
+        ids = [get(user, "id") for user in users if get(user, "is_update")]
+        if not ids:
+            return
+        changes = await self.get_pending_changes(ids)
+        for user in users:
+            value = changes.get(get(user, "id"))
+            if isinstance(user, dict):
+                user["pending_changes"] = value
+            else:
+                user.pending_changes = value
+
     async def create_user(self, user_data: dict) -> User:
         """Создание нового пользователя"""
         try:
             db_logger.info(f"Создание пользователя в БД: {user_data.get('unique_id', 'N/A')}")
-            user_model = UserModel(**user_data)
+            user_model = UserModel(**with_date_values(user_data))
             self.db.add(user_model)
-            self.db.commit()
-            self.db.refresh(user_model)
-            user = User.model_validate(user_model)
+            await self.db.commit()
+            user = self._remember(User.model_validate(user_model))
             
             db_logger.info(f"Пользователь успешно создан в БД: ID={user.id}")
             return user
             
         except IntegrityError as e:
             db_logger.error(f"Ошибка целостности данных при создании пользователя: {e}")
-            self.db.rollback()
+            await self.db.rollback()
             raise
         except Exception as e:
             db_logger.error(f"Ошибка создания пользователя в БД: {e}")
-            self.db.rollback()
+            await self.db.rollback()
             raise
 
     async def get_user_by_id(self, user_id: int) -> Optional[User]:
         """Получение пользователя по ID"""
         try:
+            if user_id in self._identity:
+                return self._identity[user_id]
+
             db_logger.debug(f"Запрос пользователя по ID: {user_id}")
-            user_model = self.db.query(UserModel).filter(UserModel.id == user_id).first()
+            result = await self.db.execute(select(*LIST_PAGE_COLUMNS).where(UserModel.id == user_id))
+            row = result.first()
             
-            if user_model:
-                user = User.model_validate(user_model)
+            if row:
+                user = self._remember(User.model_validate(dict(row._mapping)))
                 db_logger.debug(f"Пользователь найден: ID={user_id}")
                 return user
             else:
@@ -54,34 +262,40 @@ class SQLAlchemyUserRepository(UserRepository):
             db_logger.error(f"Ошибка получения пользователя по ID {user_id}: {e}")
             raise
 
-    async def update_status(self, user_id: int, status: UserStatus) -> Optional[User]:
+    async def get_users_by_ids(self, ids: List[int]) -> List[User]:
+        """Пользователи по списку ID одним запросом (отсутствующие пропускаются)"""
+        try:
+            result = await self.db.execute(select(*LIST_PAGE_COLUMNS).where(UserModel.id.in_(ids)))
+            users = [self._remember(User.model_validate(dict(row._mapping))) for row in result]
+            db_logger.debug(f"Запрошено пользователей по ID: {len(ids)}, найдено {len(users)}")
+            return users
+        except Exception as e:
+            db_logger.error(f"Ошибка получения пользователей по списку ID: {e}")
+            raise
+
+    async def update_status(self, user_id: int, status: UserStatus, expected_status: ExpectedStatus = None) -> Optional[User]:
         """Обновление статуса пользователя"""
         try:
-            db_logger.info(f"Обновление статуса пользователя: ID={user_id}, статус={status}")
+            db_logger.info(f"Обновление статуса пользователя: ID={user_id}, статус={status}, ожидаемый={expected_status}")
             
-            user_model = self.db.query(UserModel).filter(UserModel.id == user_id).first()
-            if user_model:
-                user_model.status = status
-                self.db.commit()
-                self.db.refresh(user_model)
-                
-                user = User.model_validate(user_model)
+            user = await self._update_returning(user_id, {"status": status}, expected_status)
+            if user:
                 db_logger.info(f"Статус пользователя обновлен: ID={user_id}, новый статус={status}")
-                return user
             else:
-                db_logger.warning(f"Пользователь не найден для обновления статуса: ID={user_id}")
-                return None
+                db_logger.warning(f"Статус пользователя не обновлен: ID={user_id} не найден или статус не {expected_status}")
+            return user
                 
         except Exception as e:
             db_logger.error(f"Ошибка обновления статуса пользователя {user_id}: {e}")
-            self.db.rollback()
+            await self.db.rollback()
             raise
 
     async def get_all_users(self) -> List[User]:
         """Получение всех пользователей"""
         try:
             db_logger.info("Запрос всех пользователей из БД")
-            user_models = self.db.query(UserModel).all()
+            result = await self.db.execute(select(UserModel))
+            user_models = result.scalars().all()
             users = [User.model_validate(model) for model in user_models]
             db_logger.info(f"Получено {len(users)} пользователей из БД")
             return users
@@ -90,66 +304,41 @@ class SQLAlchemyUserRepository(UserRepository):
             db_logger.error(f"Ошибка получения всех пользователей: {e}")
             raise
 
-    def _encode_cursor(self, user_id: int) -> str:
-        """Кодирование курсора"""
-        return base64.b64encode(str(user_id).encode()).decode()
-
-    def _decode_cursor(self, cursor: str) -> int:
-        """Декодирование курсора"""
+    async def get_users_filtered(self, status: Optional[UserStatus] = None, search: Optional[str] = None, date_ranges: Optional[DateRanges] = None) -> List[User]:
+        """Пользователи по статусу, поиску и диапазонам дат (для экспорта), по id"""
         try:
-            return int(base64.b64decode(cursor.encode()).decode())
-        except:
-            return 0
+            db_logger.info(f"Запрос пользователей по фильтру: status={status}, search={search}, даты={date_ranges}")
+            conditions = date_range_conditions(UserModel, date_ranges)
+            if status:
+                conditions.append(UserModel.status == status)
+            if search:
+                conditions.append(self._search_condition(search))
+            result = await self.db.execute(select(*LIST_PAGE_COLUMNS).where(*conditions).order_by(UserModel.id))
+            users = [User.model_validate(dict(row._mapping)) for row in result.all()]
+            db_logger.info(f"Получено {len(users)} пользователей по фильтру")
+            return users
 
-    async def get_pending_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0) -> dict:
+        except Exception as e:
+            db_logger.error(f"Ошибка получения пользователей по фильтру: {e}")
+            raise
+
+    async def get_pending_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[DateRanges] = None) -> dict:
         """Получение пользователей ожидающих одобрения с курсорной пагинацией"""
         try:
-            db_logger.info(f"Запрос pending пользователей: cursor={cursor}, limit={limit}, search={search}")
-            
-            count_query = self.db.query(UserModel).filter(UserModel.status == UserStatus.PENDING)
-            if search:
-                search_term = f"%{search}%"
-                count_query = count_query.filter(
-                    (UserModel.firstname.ilike(search_term)) |
-                    (UserModel.secondname.ilike(search_term)) |
-                    (UserModel.thirdname.ilike(search_term)) |
-                    (UserModel.unique_id.ilike(search_term))
-                )
-            total_count = count_query.count()
+            db_logger.info(f"Запрос pending пользователей: cursor={cursor}, limit={limit}, search={search}, sort={sort}")
 
-            query = self.db.query(UserModel).filter(UserModel.status == UserStatus.PENDING)
+            conditions = [UserModel.status == UserStatus.PENDING, *date_range_conditions(UserModel, date_ranges)]
+            total_count = None
             if search:
-                search_term = f"%{search}%"
-                query = query.filter(
-                    (UserModel.firstname.ilike(search_term)) |
-                    (UserModel.secondname.ilike(search_term)) |
-                    (UserModel.thirdname.ilike(search_term)) |
-                    (UserModel.unique_id.ilike(search_term))
-                )
-            if cursor:
-                cursor_id = self._decode_cursor(cursor)
-                query = query.filter(UserModel.id > cursor_id)
-            query = query.order_by(UserModel.id.asc()).limit(limit + 1)
-            user_models = query.all()
-            has_more = len(user_models) > limit
-            
-            if has_more:
-                user_models = user_models[:-1] 
-            
-            users = [User.model_validate(model) for model in user_models]
-            next_cursor = None
-            if users and has_more:
-                next_cursor = self._encode_cursor(users[-1].id)
-            
-            db_logger.info(f"Получено {len(users)} pending пользователей, has_more={has_more}, total_count={total_count}")
-            
-            return {
-                "users": users,
-                "next_cursor": next_cursor,
-                "has_more": has_more,
-                "total_count": total_count
-            }
-            
+                conditions.append(self._search_condition(search))
+            elif not date_ranges:
+                total_count = await self._status_total(UserStatus.PENDING)
+            spec = UserQuerySpec(conditions, sort, scope="pending", search=search, dates=date_ranges)
+            result = await self._fetch_cursor_page(spec, cursor, limit, total_count, as_rows)
+
+            db_logger.info(f"Получено {len(result['users'])} pending пользователей, has_more={result['has_more']}, total_count={result['total_count']}")
+            return result
+
         except Exception as e:
             db_logger.error(f"Ошибка получения pending пользователей: {e}")
             raise
@@ -158,7 +347,8 @@ class SQLAlchemyUserRepository(UserRepository):
         """Получение всех пользователей ожидающих одобрения"""
         try:
             db_logger.info("Запрос всех pending пользователей")
-            user_models = self.db.query(UserModel).filter(UserModel.status == UserStatus.PENDING).all()
+            result = await self.db.execute(select(UserModel).where(UserModel.status == UserStatus.PENDING))
+            user_models = result.scalars().all()
             users = [User.model_validate(model) for model in user_models]
             db_logger.info(f"Получено {len(users)} pending пользователей")
             return users
@@ -166,11 +356,28 @@ class SQLAlchemyUserRepository(UserRepository):
             db_logger.error(f"Ошибка получения всех pending пользователей: {e}")
             raise
 
+    async def get_pending_routing_rows(self) -> List[dict]:
+        """Поля pending пользователей для выбора OU одним запросом, без построения сущностей User"""
+        try:
+            result = await self.db.execute(
+                select(
+                    UserModel.id, UserModel.unique_id, UserModel.firstname, UserModel.secondname,
+                    UserModel.otdel, UserModel.current_location_id, UserModel.is_engineer,
+                )
+                .where(UserModel.status == UserStatus.PENDING)
+                .order_by(UserModel.id)
+            )
+            return [dict(row) for row in result.mappings()]
+        except Exception as e:
+            db_logger.error(f"Ошибка получения pending пользователей для выбора OU: {e}")
+            raise
+
     async def get_all_dismissed(self) -> List[User]:
         """Получение всех уволенных пользователей"""
         try:
             db_logger.info("Запрос всех dismissed пользователей")
-            user_models = self.db.query(UserModel).filter(UserModel.status == UserStatus.DISMISSED).all()
+            result = await self.db.execute(select(UserModel).where(UserModel.status == UserStatus.DISMISSED))
+            user_models = result.scalars().all()
             users = [User.model_validate(model) for model in user_models]
             db_logger.info(f"Получено {len(users)} dismissed пользователей")
             return users
@@ -182,13 +389,19 @@ class SQLAlchemyUserRepository(UserRepository):
         """Поиск пользователей"""
         try:
             db_logger.info(f"Поиск пользователей: {query}")
-            search_term = f"%{query}%"
-            user_models = self.db.query(UserModel).filter(
-                (UserModel.firstname.ilike(search_term)) |
-                (UserModel.secondname.ilike(search_term)) |
-                (UserModel.thirdname.ilike(search_term)) |
-                (UserModel.unique_id.ilike(search_term))
-            ).all()
+            fts_query = self._fts_query(query)
+            if fts_query:
+                # Сначала наиболее релевантные совпадения
+                statement = (
+                    select(UserModel)
+                    .join(users_fts, users_fts.c.rowid == UserModel.id)
+                    .where(self._fts_match(fts_query))
+                    .order_by(func.bm25(literal_column("users_fts"), *FTS_RANK_WEIGHTS), UserModel.id)
+                )
+            else:
+                statement = select(UserModel).where(self._like_search_condition(query))
+            result = await self.db.execute(statement)
+            user_models = result.scalars().all()
             users = [User.model_validate(model) for model in user_models]
             db_logger.info(f"Найдено {len(users)} пользователей")
             return users
@@ -196,177 +409,429 @@ class SQLAlchemyUserRepository(UserRepository):
             db_logger.error(f"Ошибка поиска пользователей: {e}")
             raise
 
-    async def get_dismissed_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0) -> dict:
+    async def get_dismissed_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[DateRanges] = None) -> dict:
         """Получение уволенных пользователей с курсорной пагинацией"""
         try:
-            db_logger.info(f"Запрос dismissed пользователей: cursor={cursor}, limit={limit}, search={search}")
-            
-            count_query = self.db.query(UserModel).filter(UserModel.status == UserStatus.DISMISSED)
-            if search:
-                search_term = f"%{search}%"
-                count_query = count_query.filter(
-                    (UserModel.firstname.ilike(search_term)) |
-                    (UserModel.secondname.ilike(search_term)) |
-                    (UserModel.thirdname.ilike(search_term)) |
-                    (UserModel.unique_id.ilike(search_term))
-                )
-            total_count = count_query.count()
+            db_logger.info(f"Запрос dismissed пользователей: cursor={cursor}, limit={limit}, search={search}, sort={sort}")
 
-            query = self.db.query(UserModel).filter(UserModel.status == UserStatus.DISMISSED)
+            conditions = [UserModel.status == UserStatus.DISMISSED, *date_range_conditions(UserModel, date_ranges)]
+            total_count = None
             if search:
-                search_term = f"%{search}%"
-                query = query.filter(
-                    (UserModel.firstname.ilike(search_term)) |
-                    (UserModel.secondname.ilike(search_term)) |
-                    (UserModel.thirdname.ilike(search_term)) |
-                    (UserModel.unique_id.ilike(search_term))
-                )
+                conditions.append(self._search_condition(search))
+            elif not date_ranges:
+                total_count = await self._status_total(UserStatus.DISMISSED)
+            spec = UserQuerySpec(conditions, sort, scope="dismissed", search=search, dates=date_ranges)
+            result = await self._fetch_cursor_page(spec, cursor, limit, total_count, as_rows)
+
+            db_logger.info(f"Получено {len(result['users'])} dismissed пользователей, has_more={result['has_more']}, total_count={result['total_count']}")
+            return result
 
-            if cursor:
-                cursor_id = self._decode_cursor(cursor)
-                query = query.filter(UserModel.id > cursor_id)
-            query = query.order_by(UserModel.id.asc()).limit(limit + 1)
-            user_models = query.all()
-            has_more = len(user_models) > limit
-            
-            if has_more:
-                user_models = user_models[:-1] 
-            
-            users = [User.model_validate(model) for model in user_models]
-            next_cursor = None
-            if users and has_more:
-                next_cursor = self._encode_cursor(users[-1].id)
-            
-            db_logger.info(f"Получено {len(users)} dismissed пользователей, has_more={has_more}, total_count={total_count}")
-            
-            return {
-                "users": users,
-                "next_cursor": next_cursor,
-                "has_more": has_more,
-                "total_count": total_count
-            }
-            
         except Exception as e:
             db_logger.error(f"Ошибка получения dismissed пользователей: {e}")
             raise
 
-    async def search_users_cursor(self, query: str, cursor: Optional[str] = None, limit: int = 20, status: Optional[UserStatus] = None, total_loaded: int = 0) -> dict:
-        """Поиск пользователей с курсорной пагинацией"""
+    async def search_users_cursor(self, query: str, cursor: Optional[str] = None, limit: int = 20, status: Optional[UserStatus] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[DateRanges] = None, include_archive: bool = False) -> dict:
+        """Поиск пользователей с курсорной пагинацией; архив просматривается только при include_archive"""
         try:
-            db_logger.info(f"Поиск пользователей: query='{query}', cursor={cursor}, limit={limit}, status={status}")
+            db_logger.info(f"Поиск пользователей: query='{query}', cursor={cursor}, limit={limit}, status={status}, sort={sort}, архив={include_archive}")
 
-            count_query = self.db.query(UserModel).filter(
-                (UserModel.firstname.ilike(f"%{query}%")) |
-                (UserModel.secondname.ilike(f"%{query}%")) |
-                (UserModel.thirdname.ilike(f"%{query}%")) |
-                (UserModel.unique_id.ilike(f"%{query}%"))
-            )
+            conditions = [self._search_condition(query), *date_range_conditions(UserModel, date_ranges)]
             if status:
-                count_query = count_query.filter(UserModel.status == status)
-            total_count = count_query.count()
-            
-            search_term = f"%{query}%"
-            db_query = self.db.query(UserModel).filter(
-                (UserModel.firstname.ilike(search_term)) |
-                (UserModel.secondname.ilike(search_term)) |
-                (UserModel.thirdname.ilike(search_term)) |
-                (UserModel.unique_id.ilike(search_term))
-            )
-            if status:
-                db_query = db_query.filter(UserModel.status == status)
-            if cursor:
-                cursor_id = self._decode_cursor(cursor)
-                db_query = db_query.filter(UserModel.id > cursor_id)
-            db_query = db_query.order_by(UserModel.id.asc()).limit(limit + 1)
-            user_models = db_query.all()
-            has_more = len(user_models) > limit
-            
-            if has_more:
-                user_models = user_models[:-1] 
-            
-            users = [User.model_validate(model) for model in user_models]
-            next_cursor = None
-            if users and has_more:
-                next_cursor = self._encode_cursor(users[-1].id)
-            
-            db_logger.info(f"Найдено {len(users)} пользователей по запросу '{query}', has_more={has_more}, total_count={total_count}")
-            
-            return {
-                "users": users,
-                "next_cursor": next_cursor,
-                "has_more": has_more,
-                "total_count": total_count
-            }
-            
+                conditions.append(UserModel.status == status)
+
+            entity = UserModel
+            if include_archive:
+                # Архив без FTS-индекса: поиск подстрокой, строки объединяются с users
+                archive_conditions = [
+                    self._like_search_condition(query, UserArchiveModel),
+                    *date_range_conditions(UserArchiveModel, date_ranges),
+                ]
+                if status:
+                    archive_conditions.append(UserArchiveModel.status == status)
+                combined = union_all(
+                    select(*UserModel.__table__.columns).where(*conditions),
+                    select(*[UserArchiveModel.__table__.c[column.name] for column in UserModel.__table__.columns]).where(*archive_conditions),
+                ).subquery("users_with_archive")
+                entity = aliased(UserModel, combined)
+                conditions = []
+
+            spec = UserQuerySpec(conditions, sort, scope="search", search=query, status=status, dates=date_ranges, archive=include_archive or None)
+            result = await self._fetch_cursor_page(spec, cursor, limit, as_rows=as_rows, entity=entity)
+
+            db_logger.info(f"Найдено {len(result['users'])} пользователей по запросу '{query}', has_more={result['has_more']}, total_count={result['total_count']}")
+            return result
+
         except Exception as e:
             db_logger.error(f"Ошибка поиска пользователей: {e}")
             raise
 
-    async def get_all_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, status: Optional[UserStatus] = None, total_loaded: int = 0) -> dict:
+    async def get_all_users_cursor(self, cursor: Optional[str] = None, limit: int = 20, search: Optional[str] = None, status: Optional[UserStatus] = None, total_loaded: int = 0, sort: Optional[str] = None, as_rows: bool = False, date_ranges: Optional[DateRanges] = None) -> dict:
         """Получение всех пользователей с курсорной пагинацией"""
         try:
-            db_logger.info(f"Запрос всех пользователей: cursor={cursor}, limit={limit}, search={search}, status={status}")
-            
-            count_query = self.db.query(UserModel)
+            db_logger.info(f"Запрос всех пользователей: cursor={cursor}, limit={limit}, search={search}, status={status}, sort={sort}")
+
+            conditions = date_range_conditions(UserModel, date_ranges)
+            total_count = None
             if status:
-                count_query = count_query.filter(UserModel.status == status)
+                conditions.append(UserModel.status == status)
             if search:
-                search_term = f"%{search}%"
-                count_query = count_query.filter(
-                    (UserModel.firstname.ilike(search_term)) |
-                    (UserModel.secondname.ilike(search_term)) |
-                    (UserModel.thirdname.ilike(search_term)) |
-                    (UserModel.unique_id.ilike(search_term))
+                conditions.append(self._search_condition(search))
+            elif not date_ranges:
+                total_count = await self._status_total(status)
+            spec = UserQuerySpec(conditions, sort, scope="all", search=search, status=status, dates=date_ranges)
+            result = await self._fetch_cursor_page(spec, cursor, limit, total_count, as_rows)
+
+            db_logger.info(f"Получено {len(result['users'])} пользователей, has_more={result['has_more']}, total_count={result['total_count']}")
+            return result
+
+        except Exception as e:
+            db_logger.error(f"Ошибка получения всех пользователей: {e}")
+            raise
+
+    async def get_status_counts(self) -> Dict[UserStatus, int]:
+        """Количество пользователей по каждому статусу"""
+        try:
+            db_logger.debug("Запрос количества пользователей по статусам")
+            if self.db.bind.dialect.name == "sqlite":
+                result = await self.db.execute(
+                    select(UserStatusCounterModel.status, UserStatusCounterModel.count)
                 )
-            total_count = count_query.count()
-            
-            query = self.db.query(UserModel)
-            if status:
-                query = query.filter(UserModel.status == status)
+            else:
+                result = await self.db.execute(
+                    select(UserModel.status, func.count(UserModel.id)).group_by(UserModel.status)
+                )
+            counts = {status: 0 for status in UserStatus}
+            for status, count in result.all():
+                if status is not None:
+                    counts[status] = count
+            return counts
+
+        except Exception as e:
+            db_logger.error(f"Ошибка получения количества пользователей по статусам: {e}")
+            raise
+
+    async def bulk_update_status(
+        self,
+        status: UserStatus,
+        from_statuses: Iterable[UserStatus],
+        ids: Optional[List[int]] = None,
+        search: Optional[str] = None,
+        status_filter: Optional[UserStatus] = None,
+        upload_date_from: Optional[datetime] = None,
+        upload_date_to: Optional[datetime] = None,
+    ) -> Tuple[Dict[int, UserStatus], Dict[int, UserStatus]]:
+        """
+        Перевод набора пользователей в статус UPDATE ... RETURNING в одной транзакции
+        (по команде на каждый статус из from_statuses, чтобы знать прежний статус строки).
+        Набор задается списком id или фильтром; меняются только строки в from_statuses.
+        Возвращает (прежний статус измененных по id, текущий статус пропущенных id из списка)
+        """
+        try:
+            # Пользователи с ожидающими изменениями из 1C обрабатываются только по одному
+            conditions = [UserModel.is_update == False]
+            if ids is not None:
+                conditions.append(UserModel.id.in_(ids))
+            if status_filter:
+                conditions.append(UserModel.status == status_filter)
             if search:
-                search_term = f"%{search}%"
-                query = query.filter(
-                    (UserModel.firstname.ilike(search_term)) |
-                    (UserModel.secondname.ilike(search_term)) |
-                    (UserModel.thirdname.ilike(search_term)) |
-                    (UserModel.unique_id.ilike(search_term))
+                conditions.append(self._search_condition(search))
+            if upload_date_from:
+                conditions.append(UserModel.upload_date >= upload_date_from)
+            if upload_date_to:
+                conditions.append(UserModel.upload_date <= upload_date_to)
+
+            db_logger.info(f"Массовый перевод в статус {status}: ids={len(ids) if ids is not None else 'по фильтру'}")
+            previous: Dict[int, UserStatus] = {}
+            for from_status in dict.fromkeys(from_statuses):
+                statement = update(UserModel).where(UserModel.status == from_status, *conditions)
+                if previous:
+                    # Строка, уже переведенная предыдущей командой, не меняется повторно
+                    statement = statement.where(UserModel.id.not_in(list(previous)))
+                result = await self.db.execute(
+                    statement.values(status=status, updated_at=datetime.now()).returning(UserModel.id),
+                    execution_options={"synchronize_session": False},
                 )
-            if cursor:
-                cursor_id = self._decode_cursor(cursor)
-                query = query.filter(UserModel.id > cursor_id)
-            query = query.order_by(UserModel.id.asc()).limit(limit + 1)
-            user_models = query.all()
-            has_more = len(user_models) > limit
-            
-            if has_more:
-                user_models = user_models[:-1] 
-            
-            users = [User.model_validate(model) for model in user_models]
-            next_cursor = None
-            if users and has_more:
-                next_cursor = self._encode_cursor(users[-1].id)
-            
-            db_logger.info(f"Получено {len(users)} пользователей, has_more={has_more}, total_count={total_count}")
-            
+                previous.update(dict.fromkeys(result.scalars().all(), from_status))
+            updated = dict(sorted(previous.items()))
+
+            skipped: Dict[int, UserStatus] = {}
+            missing = set(ids or ()) - set(updated)
+            if missing:
+                current = await self.db.execute(
+                    select(UserModel.id, UserModel.status).where(UserModel.id.in_(missing))
+                )
+                skipped = dict(current.all())
+            await self.db.commit()
+
+            for user_id in updated:
+                self._identity.pop(user_id, None)
+            db_logger.info(f"Массовый перевод в статус {status}: изменено {len(updated)}, пропущено {len(missing)}")
+            return updated, skipped
+
+        except Exception as e:
+            db_logger.error(f"Ошибка массового изменения статуса: {e}")
+            await self.db.rollback()
+            raise
+
+    async def get_change_sequence(self) -> Optional[int]:
+        """Номер последнего изменения users, None если лента изменений не ведется"""
+        if self.db.bind.dialect.name != "sqlite":
+            return None
+        result = await self.db.execute(
+            select(UserChangeSequenceModel.value).where(UserChangeSequenceModel.id == 1)
+        )
+        return result.scalar_one_or_none()
+
+    async def stream_changes(self, since: int, until: int, limit: int, batch_size: int = 500) -> AsyncIterator[List[dict]]:
+        """
+        Пользователи, измененные после номера since (не позже until), в порядке
+        изменений; читается по индексу change_seq пакетами по batch_size строк
+        """
+        try:
+            db_logger.info(f"Лента изменений пользователей: since={since}, until={until}, limit={limit}")
+            result = await self.db.stream(
+                select(*LIST_PAGE_COLUMNS, UserModel.change_seq)
+                .where(UserModel.change_seq > since, UserModel.change_seq <= until)
+                .order_by(UserModel.change_seq)
+                .limit(limit)
+            )
+            async for partition in result.mappings().partitions(batch_size):
+                users = [{**row, "pending_changes": None} for row in partition]
+                await self._attach_pending_changes(users)
+                yield users
+
+        except Exception as e:
+            db_logger.error(f"Ошибка чтения ленты изменений пользователей: {e}")
+            raise
+
+    async def archive_users(self, statuses: Iterable[UserStatus], updated_before: datetime, limit: int) -> int:
+        """
+        Перенос до limit пользователей в статусах statuses, не менявшихся с updated_before,
+        в users_archive. Строки выбираются и удаляются одним DELETE ... RETURNING, поэтому
+        параллельно измененная строка в архив не попадет. Самая новая запись users
+        остается: без AUTOINCREMENT SQLite выдает следующий id как max(id) + 1,
+        и id из архива не должен достаться новому пользователю
+        """
+        try:
+            candidates = (
+                select(UserModel.id)
+                .where(
+                    UserModel.status.in_(tuple(statuses)),
+                    UserModel.updated_at < updated_before,
+                    UserModel.is_update.is_(False),
+                    UserModel.id < select(func.max(UserModel.id)).scalar_subquery(),
+                    UserModel.id.not_in(select(PendingUpdateModel.original_user_id)),
+                )
+                .order_by(UserModel.id)
+                .limit(limit)
+            )
+            result = await self.db.execute(
+                delete(UserModel)
+                .where(UserModel.id.in_(candidates), UserModel.status.in_(tuple(statuses)))
+                .returning(*UserModel.__table__.columns),
+                execution_options={"synchronize_session": False},
+            )
+            rows = [dict(row._mapping) for row in result.all()]
+            if rows:
+                now = datetime.now()
+                await self.db.execute(insert(UserArchiveModel), [{**row, "archived_at": now} for row in rows])
+            await self.db.commit()
+            for row in rows:
+                self._identity.pop(row["id"], None)
+            if rows:
+                db_logger.info(f"Перенесено в архив {len(rows)} пользователей (изменены до {updated_before})")
+            return len(rows)
+
+        except Exception as e:
+            db_logger.error(f"Ошибка переноса пользователей в архив: {e}")
+            await self.db.rollback()
+            raise
+
+    async def get_storage_stats(self) -> dict:
+        """Количество строк и размер основной и архивной таблиц (с индексами), состояние файла БД"""
+        try:
+            stats = {}
+            for key, model in (("hot", UserModel), ("cold", UserArchiveModel)):
+                rows = (await self.db.execute(select(func.count()).select_from(model))).scalar_one()
+                stats[key] = {"table": model.__tablename__, "rows": rows, "bytes": None}
+
+            if self.db.bind.dialect.name != "sqlite":
+                return stats
+
+            try:
+                # Размер по страницам таблицы, ее индексов и (для users) FTS-индекса;
+                # dbstat есть не в каждой сборке SQLite
+                sizes = await self.db.execute(text(TABLE_SIZES_SQL))
+                by_table = dict(sizes.all())
+                stats["hot"]["bytes"] = by_table.get("users", 0) + by_table.get("users_fts", 0)
+                stats["cold"]["bytes"] = by_table.get("users_archive", 0)
+            except Exception as e:
+                db_logger.warning(f"Размер таблиц недоступен (dbstat): {e}")
+
+            pragmas = {}
+            for name in ("page_size", "page_count", "freelist_count", "auto_vacuum"):
+                pragmas[name] = (await self.db.execute(text(f"PRAGMA {name}"))).scalar_one()
+            pragmas["auto_vacuum"] = AUTO_VACUUM_MODES.get(pragmas["auto_vacuum"], pragmas["auto_vacuum"])
+            stats["database"] = pragmas
+            return stats
+
+        except Exception as e:
+            db_logger.error(f"Ошибка получения размеров таблиц: {e}")
+            raise
+
+    async def incremental_vacuum(self, pages: Optional[int] = None) -> Optional[dict]:
+        """
+        Возврат свободных страниц файла БД (PRAGMA incremental_vacuum), не больше pages
+        за вызов. Если база создана без auto_vacuum = INCREMENTAL, режим включается
+        однократным полным VACUUM. None для СУБД, отличных от SQLite
+        """
+        if self.db.bind.dialect.name != "sqlite":
+            return None
+        try:
+            async with self.db.bind.connect() as connection:
+                # VACUUM не выполняется внутри транзакции
+                connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+
+                async def pragma(statement: str):
+                    return (await connection.exec_driver_sql(f"PRAGMA {statement}")).scalar()
+
+                free_before = await pragma("freelist_count")
+                converted = await pragma("auto_vacuum") != 2
+                if converted:
+                    db_logger.warning("Включение auto_vacuum = INCREMENTAL: полный VACUUM базы")
+                    await connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+                    await connection.exec_driver_sql("VACUUM")
+                else:
+                    # sqlite3 выполняет один шаг прагмы на вызов, а каждый шаг
+                    # освобождает одну страницу: шаги выполняются в одной транзакции
+                    await connection.exec_driver_sql("BEGIN IMMEDIATE")
+                    try:
+                        for _ in range(min(pages or free_before, free_before)):
+                            await connection.exec_driver_sql("PRAGMA incremental_vacuum(1)")
+                        await connection.exec_driver_sql("COMMIT")
+                    except Exception:
+                        await connection.exec_driver_sql("ROLLBACK")
+                        raise
+                free_after = await pragma("freelist_count")
+
+            db_logger.info(f"Incremental vacuum: освобождено {free_before - free_after} страниц, осталось свободных {free_after}")
             return {
-                "users": users,
-                "next_cursor": next_cursor,
-                "has_more": has_more,
-                "total_count": total_count
+                "auto_vacuum": "incremental",
+                "converted": converted,
+                "freed_pages": free_before - free_after,
+                "free_pages": free_after,
             }
-            
+
         except Exception as e:
-            db_logger.error(f"Ошибка получения всех пользователей: {e}")
+            db_logger.error(f"Ошибка incremental vacuum: {e}")
+            raise
+
+    async def get_import_targets(self, unique_ids: List[str]) -> Dict[str, dict]:
+        """
+        Существующие записи для пакета табельных номеров одним запросом: id, статус,
+        текущие значения PENDING_UPDATE_FIELDS и наличие ожидающих изменений
+        """
+        try:
+            if not unique_ids:
+                return {}
+            fields = [getattr(UserModel, field) for field in PENDING_UPDATE_FIELDS]
+            result = await self.db.execute(
+                select(
+                    UserModel.id, UserModel.unique_id, UserModel.status, UserModel.is_update, *fields,
+                    PendingUpdateModel.id.label("pending_update_id"),
+                )
+                .outerjoin(PendingUpdateModel, PendingUpdateModel.original_user_id == UserModel.id)
+                .where(UserModel.unique_id.in_(unique_ids))
+            )
+            return {
+                row.unique_id: {
+                    "id": row.id,
+                    "status": row.status,
+                    "is_update": row.is_update,
+                    "has_pending_update": row.pending_update_id is not None,
+                    "values": {field: row._mapping[field] for field in PENDING_UPDATE_FIELDS},
+                }
+                for row in result.all()
+            }
+
+        except Exception as e:
+            db_logger.error(f"Ошибка получения существующих записей для пакета: {e}")
+            raise
+
+    def _dialect_insert(self, model):
+        """INSERT с поддержкой ON CONFLICT для SQLite и PostgreSQL, None для остальных СУБД"""
+        dialect = self.db.bind.dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            return None
+        return dialect_insert(model)
+
+    def _insert_ignoring_duplicates(self):
+        """INSERT, пропускающий строки с уже существующим unique_id"""
+        statement = self._dialect_insert(UserModel)
+        if statement is None:
+            return insert(UserModel)
+        return statement.on_conflict_do_nothing(index_elements=["unique_id"])
+
+    def _upsert_pending_updates(self):
+        """INSERT изменений из 1C; для пользователя с ожидающими изменениями они заменяются"""
+        statement = self._dialect_insert(PendingUpdateModel)
+        if statement is None:
+            return insert(PendingUpdateModel)
+        return statement.on_conflict_do_update(
+            index_elements=["original_user_id"],
+            set_={"changes": statement.excluded.changes, "updated_at": statement.excluded.updated_at},
+        )
+
+    async def bulk_write_users(self, inserts: List[dict], updates: List[dict], pending_updates: List[dict] = ()) -> Dict[str, int]:
+        """
+        Пакетная запись в одной транзакции: многострочный INSERT, UPDATE по id (executemany)
+        и ожидающие изменения из 1C (original_user_id, previous_status, changes).
+        Возвращает unique_id -> id вставленных записей; строки, unique_id которых
+        успели занять параллельно, не вставляются и в результат не попадают
+        """
+        try:
+            db_logger.info(f"Пакетная запись пользователей: вставка={len(inserts)}, обновление={len(updates)}")
+            now = datetime.now()
+            inserted: Dict[str, int] = {}
+            if inserts:
+                rows = [{"created_at": now, "updated_at": now, "is_update": False, **with_date_values(row)} for row in inserts]
+                result = await self.db.execute(
+                    self._insert_ignoring_duplicates().returning(UserModel.id, UserModel.unique_id),
+                    rows,
+                )
+                inserted = {row.unique_id: row.id for row in result.all()}
+            if updates:
+                await self.db.execute(
+                    update(UserModel),
+                    [{**with_date_values(row), "updated_at": now} for row in updates],
+                )
+            if pending_updates:
+                await self.db.execute(
+                    self._upsert_pending_updates(),
+                    [{**row, "created_at": now, "updated_at": now} for row in pending_updates],
+                )
+            await self.db.commit()
+            self._identity.clear()
+            return inserted
+
+        except Exception as e:
+            db_logger.error(f"Ошибка пакетной записи пользователей: {e}")
+            await self.db.rollback()
             raise
 
     async def get_user_by_unique_id(self, unique_id: str) -> Optional[User]:
         """Получение пользователя по unique_id"""
         try:
             db_logger.debug(f"Запрос пользователя по unique_id: {unique_id}")
-            user_model = self.db.query(UserModel).filter(UserModel.unique_id == unique_id).first()
+            result = await self.db.execute(select(*LIST_PAGE_COLUMNS).where(UserModel.unique_id == unique_id))
+            row = result.first()
             
-            if user_model:
-                user = User.model_validate(user_model)
+            if row:
+                user = self._remember(User.model_validate(dict(row._mapping)))
                 db_logger.debug(f"Пользователь найден: unique_id={unique_id}")
                 return user
             else:
@@ -377,28 +842,71 @@ class SQLAlchemyUserRepository(UserRepository):
             db_logger.error(f"Ошибка получения пользователя по unique_id {unique_id}: {e}")
             raise
 
-    async def get_pending_update_by_original_unique_id(self, original_unique_id: str) -> Optional[User]:
-        """Поиск незавершенной записи об обновлении по оригинальному unique_id"""
+    async def get_pending_changes(self, user_ids: List[int]) -> Dict[int, dict]:
+        """Ожидающие изменения из 1C по id пользователей"""
         try:
-            db_logger.debug(f"Поиск записи об обновлении для unique_id: {original_unique_id}")
-            # Ищем записи с is_update=True, status=PENDING и unique_id начинающимся с original_unique_id_update_
-            pattern = f"{original_unique_id}_update_%"
-            user_model = self.db.query(UserModel).filter(
-                UserModel.is_update == True,
-                UserModel.status == UserStatus.PENDING,
-                UserModel.unique_id.like(pattern)
-            ).first()
-            
-            if user_model:
-                user = User.model_validate(user_model)
-                db_logger.debug(f"Найдена запись об обновлении: ID={user.id}, unique_id={user.unique_id}")
-                return user
-            else:
-                db_logger.debug(f"Запись об обновлении не найдена для unique_id: {original_unique_id}")
+            if not user_ids:
+                return {}
+            result = await self.db.execute(
+                select(PendingUpdateModel.original_user_id, PendingUpdateModel.changes)
+                .where(PendingUpdateModel.original_user_id.in_(user_ids))
+            )
+            return dict(result.all())
+
+        except Exception as e:
+            db_logger.error(f"Ошибка получения ожидающих изменений пользователей: {e}")
+            raise
+
+    async def apply_pending_update(self, user_id: int, changes: dict) -> Optional[User]:
+        """
+        Применение изменений из 1C в одной транзакции: данные и статус APPROVED
+        пользователю, запись pending_updates удаляется
+        """
+        try:
+            db_logger.info(f"Применение изменений из 1C: ID={user_id}")
+            values = {field: value for field, value in changes.items() if field in PENDING_UPDATE_FIELDS}
+            result = await self.db.execute(
+                update(UserModel)
+                .where(UserModel.id == user_id, UserModel.is_update == True)
+                .values(**values, status=UserStatus.APPROVED, is_update=False, updated_at=datetime.now())
+                .returning(*LIST_PAGE_COLUMNS),
+                execution_options={"synchronize_session": False},
+            )
+            row = result.first()
+            await self.db.execute(delete(PendingUpdateModel).where(PendingUpdateModel.original_user_id == user_id))
+            await self.db.commit()
+            if row is None:
+                self._identity.pop(user_id, None)
+                db_logger.warning(f"Пользователь {user_id} не найден или не ожидает изменений из 1C")
                 return None
-                
+            return self._remember(User.model_validate(dict(row._mapping)))
+
+        except Exception as e:
+            db_logger.error(f"Ошибка применения изменений из 1C для пользователя {user_id}: {e}")
+            await self.db.rollback()
+            raise
+
+    async def discard_pending_update(self, user_id: int) -> Optional[User]:
+        """
+        Отклонение изменений из 1C: запись pending_updates удаляется, пользователю
+        возвращается статус до изменений. None если ожидающих изменений нет
+        """
+        try:
+            db_logger.info(f"Отклонение изменений из 1C: ID={user_id}")
+            deleted = await self.db.execute(
+                delete(PendingUpdateModel)
+                .where(PendingUpdateModel.original_user_id == user_id)
+                .returning(PendingUpdateModel.previous_status)
+            )
+            previous_status = deleted.scalar_one_or_none()
+            if previous_status is None:
+                await self.db.rollback()
+                return None
+            return await self._update_returning(user_id, {"status": previous_status, "is_update": False})
+
         except Exception as e:
-            db_logger.error(f"Ошибка поиска записи об обновлении для unique_id {original_unique_id}: {e}")
+            db_logger.error(f"Ошибка отклонения изменений из 1C для пользователя {user_id}: {e}")
+            await self.db.rollback()
             raise
 
     async def update_unique_id(self, user_id: int, unique_id: str) -> Optional[User]:
@@ -406,49 +914,34 @@ class SQLAlchemyUserRepository(UserRepository):
         try:
             db_logger.info(f"Обновление unique_id пользователя: ID={user_id}, unique_id={unique_id}")
             
-            user_model = self.db.query(UserModel).filter(UserModel.id == user_id).first()
-            if user_model:
-                user_model.unique_id = unique_id
-                self.db.commit()
-                self.db.refresh(user_model)
-                
-                user = User.model_validate(user_model)
+            user = await self._update_returning(user_id, {"unique_id": unique_id})
+            if user:
                 db_logger.info(f"unique_id пользователя обновлен: ID={user_id}")
-                return user
             else:
                 db_logger.warning(f"Пользователь не найден для обновления unique_id: ID={user_id}")
-                return None
+            return user
                 
         except Exception as e:
             db_logger.error(f"Ошибка обновления unique_id пользователя {user_id}: {e}")
-            self.db.rollback()
+            await self.db.rollback()
             raise
 
-    async def update_user_data(self, user_id: int, user_data: dict) -> Optional[User]:
+    async def update_user_data(self, user_id: int, user_data: dict, expected_status: ExpectedStatus = None) -> Optional[User]:
         """Обновление данных пользователя"""
         try:
             db_logger.info(f"Обновление данных пользователя: ID={user_id}")
             
-            user_model = self.db.query(UserModel).filter(UserModel.id == user_id).first()
-            if user_model:
-                for key, value in user_data.items():
-                    if hasattr(user_model, key):
-                        setattr(user_model, key, value)
-                
-                user_model.updated_at = datetime.now()
-                self.db.commit()
-                self.db.refresh(user_model)
-                
-                user = User.model_validate(user_model)
+            values = {key: value for key, value in user_data.items() if key in UserModel.__table__.columns}
+            user = await self._update_returning(user_id, values, expected_status)
+            if user:
                 db_logger.info(f"Данные пользователя обновлены: ID={user_id}")
-                return user
             else:
                 db_logger.warning(f"Пользователь не найден для обновления данных: ID={user_id}")
-                return None
+            return user
                 
         except Exception as e:
             db_logger.error(f"Ошибка обновления данных пользователя {user_id}: {e}")
-            self.db.rollback()
+            await self.db.rollback()
             raise
 
     async def delete_user(self, user_id: int) -> bool:
@@ -456,17 +949,21 @@ class SQLAlchemyUserRepository(UserRepository):
         try:
             db_logger.info(f"Удаление пользователя: ID={user_id}")
             
-            user_model = self.db.query(UserModel).filter(UserModel.id == user_id).first()
-            if user_model:
-                self.db.delete(user_model)
-                self.db.commit()
+            await self.db.execute(delete(PendingUpdateModel).where(PendingUpdateModel.original_user_id == user_id))
+            result = await self.db.execute(
+                delete(UserModel).where(UserModel.id == user_id).returning(UserModel.id),
+                execution_options={"synchronize_session": False},
+            )
+            deleted = result.first() is not None
+            await self.db.commit()
+            self._identity.pop(user_id, None)
+            if deleted:
                 db_logger.info(f"Пользователь удален: ID={user_id}")
-                return True
             else:
                 db_logger.warning(f"Пользователь не найден для удаления: ID={user_id}")
-                return False
+            return deleted
                 
         except Exception as e:
             db_logger.error(f"Ошибка удаления пользователя {user_id}: {e}")
-            self.db.rollback()
+            await self.db.rollback()
             raise
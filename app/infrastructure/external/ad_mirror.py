@@ -0,0 +1,238 @@
+"""Зеркало пользователей, групп и OU из AD в памяти: индексы по pager, sAMAccountName и имени группы"""
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.infrastructure.external.ldap_dn_cache import GROUP, PAGER, SAM
+
+# Виды объектов зеркала
+USER = "user"
+GROUP_OBJECT = "group"
+OU = "ou"
+
+# Объекты зеркала и атрибуты, которые читает синхронизация
+AD_MIRROR_FILTER = '(|(&(objectCategory=person)(objectClass=user))(objectClass=group)(objectClass=organizationalUnit))'
+AD_MIRROR_ATTRIBUTES = [
+    'objectGUID', 'objectClass', 'distinguishedName', 'name', 'sAMAccountName', 'pager', 'displayName',
+    'userPrincipalName', 'mail', 'department', 'company', 'userAccountControl', 'uSNChanged',
+]
+# Удаленные объекты (tombstone) видны только с control Show Deleted
+SHOW_DELETED_OID = '1.2.840.113556.1.4.417'
+ACCOUNTDISABLE = 0x2
+
+
+def _single(value: Any) -> Any:
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def object_guid(value: Any) -> Optional[str]:
+    """objectGUID из ответа ldap3: строка '{...}' при форматировании по схеме или 16 байт без схемы"""
+    value = _single(value)
+    if isinstance(value, bytes):
+        return str(uuid.UUID(bytes_le=value))
+    if value:
+        return str(value).strip('{}').lower()
+    return None
+
+
+def object_row(attributes: Dict[str, Any], synced_at: datetime) -> Optional[Dict[str, Any]]:
+    """Строка ad_objects из атрибутов найденной записи"""
+    guid = object_guid(attributes.get('objectGUID'))
+    dn = _single(attributes.get('distinguishedName'))
+    if not guid or not dn:
+        return None
+    classes = [str(c).lower() for c in (attributes.get('objectClass') or [])]
+    if 'organizationalunit' in classes:
+        kind = OU
+    elif 'group' in classes:
+        kind = GROUP_OBJECT
+    else:
+        kind = USER
+    control = _single(attributes.get('userAccountControl'))
+
+    def text(name: str) -> Optional[str]:
+        value = _single(attributes.get(name))
+        return str(value) if value not in (None, '') else None
+
+    return {
+        'object_guid': guid,
+        'kind': kind,
+        'dn': str(dn),
+        'name': text('name'),
+        'sam_account_name': text('sAMAccountName'),
+        'pager': text('pager'),
+        'display_name': text('displayName'),
+        'user_principal_name': text('userPrincipalName'),
+        'mail': text('mail'),
+        'department': text('department'),
+        'company': text('company'),
+        'enabled': not int(control) & ACCOUNTDISABLE if kind == USER and control is not None else None,
+        'usn_changed': int(_single(attributes.get('uSNChanged')) or 0),
+        'synced_at': synced_at,
+    }
+
+
+class ADMirror:
+    """
+    Индекс объектов ad_objects в памяти. Ответ дается, только пока последняя
+    синхронизация не старше max_staleness_seconds; иначе и при промахе
+    вызывающий код выполняет поиск в AD. Объекты, которые мы переместили или
+    изменили, убираются из индекса до следующей синхронизации
+    """
+
+    def __init__(self, max_staleness_seconds: int):
+        self.max_staleness_seconds = max_staleness_seconds
+        self.synced_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        # Синхронизации (фоновая и по запросу) выполняются по одной
+        self.sync_lock = asyncio.Lock()
+        self._objects: Dict[str, Dict[str, Any]] = {}
+        self._index: Dict[Tuple[str, str], str] = {}
+        self._by_dn: Dict[str, str] = {}
+        # Строка для поиска подстроки по cn, sAMAccountName, UPN, mail и pager
+        self._search_text: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def _normalize(value: str) -> str:
+        return value.lstrip('#').strip().lower()
+
+    def _keys(self, row: Dict[str, Any]) -> List[Tuple[str, str]]:
+        if row['kind'] == USER:
+            keys = [(SAM, row['sam_account_name']), (PAGER, row['pager'])]
+        elif row['kind'] == GROUP_OBJECT:
+            keys = [(GROUP, row['name'])]
+        else:
+            keys = []
+        return [(kind, self._normalize(value)) for kind, value in keys if value]
+
+    def _remove(self, guid: str) -> None:
+        row = self._objects.pop(guid, None)
+        if row is None:
+            return
+        for key in self._keys(row):
+            if self._index.get(key) == guid:
+                del self._index[key]
+        if self._by_dn.get(row['dn'].lower()) == guid:
+            del self._by_dn[row['dn'].lower()]
+        self._search_text.pop(guid, None)
+
+    def apply(self, rows: Iterable[Dict[str, Any]], deleted_guids: Iterable[str] = ()) -> None:
+        """Добавление и замена объектов по object_guid, удаление удаленных в AD"""
+        for guid in deleted_guids:
+            self._remove(guid)
+        for row in rows:
+            guid = row['object_guid']
+            self._remove(guid)
+            self._objects[guid] = row
+            for key in self._keys(row):
+                self._index[key] = guid
+            self._by_dn[row['dn'].lower()] = guid
+            if row['kind'] == USER:
+                self._search_text[guid] = '\n'.join(
+                    (row[column] or '').lower()
+                    for column in ('name', 'sam_account_name', 'user_principal_name', 'mail', 'pager')
+                )
+
+    def load(self, rows: Iterable[Dict[str, Any]], synced_at: Optional[datetime]) -> None:
+        """Построение индекса из таблицы при запуске"""
+        self._objects.clear()
+        self._index.clear()
+        self._by_dn.clear()
+        self._search_text.clear()
+        self.apply(rows)
+        self.synced_at = synced_at
+
+    def mark_synced(self, synced_at: datetime) -> None:
+        self.synced_at = synced_at
+        self.last_error = None
+
+    def forget_dn(self, dn: str) -> None:
+        """Объект перемещен или изменен нами: до следующей синхронизации ищется в AD"""
+        guid = self._by_dn.get(dn.lower()) if dn else None
+        if guid:
+            self._remove(guid)
+
+    @property
+    def lag_seconds(self) -> Optional[float]:
+        return (datetime.now() - self.synced_at).total_seconds() if self.synced_at else None
+
+    def is_fresh(self) -> bool:
+        lag = self.lag_seconds
+        return lag is not None and lag <= self.max_staleness_seconds
+
+    def _usable(self) -> bool:
+        if self.is_fresh():
+            return True
+        self.fallbacks += 1
+        return False
+
+    def _lookup(self, kind: str, name: str) -> Optional[Dict[str, Any]]:
+        if not name or not self._usable():
+            return None
+        guid = self._index.get((kind, self._normalize(name)))
+        if guid is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._objects[guid]
+
+    def find_dn(self, kind: str, name: str) -> Optional[str]:
+        """DN группы (GROUP) или пользователя (PAGER, SAM); None - искать в AD"""
+        row = self._lookup(kind, name)
+        return row['dn'] if row else None
+
+    def find_user_by_pager(self, pager: str) -> Optional[Dict[str, Any]]:
+        return self._lookup(PAGER, pager)
+
+    def search_users(self, query: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Пользователи, у которых query входит в cn, sAMAccountName, UPN, mail или pager; None - искать в AD"""
+        if not self._usable():
+            return None
+        self.hits += 1
+        needle = (query or '').strip().lower()
+        results = []
+        for guid, text in self._search_text.items():
+            if needle in text:
+                row = self._objects[guid]
+                results.append({
+                    'cn': row['name'] or '',
+                    'sAMAccountName': row['sam_account_name'] or '',
+                    'userPrincipalName': row['user_principal_name'] or '',
+                    'mail': row['mail'] or '',
+                    'pager': row['pager'] or '',
+                    'distinguishedName': row['dn'],
+                })
+                if len(results) >= limit:
+                    break
+        return results
+
+    def list_ous(self) -> Optional[List[str]]:
+        if not self._usable():
+            return None
+        self.hits += 1
+        return [row['dn'] for row in self._objects.values() if row['kind'] == OU]
+
+    def metrics(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        counts = {USER: 0, GROUP_OBJECT: 0, OU: 0}
+        for row in self._objects.values():
+            counts[row['kind']] += 1
+        lag = self.lag_seconds
+        return {
+            "objects": counts,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "lag_seconds": round(lag) if lag is not None else None,
+            "max_staleness_seconds": self.max_staleness_seconds,
+            "fresh": self.is_fresh(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+            "fallbacks": self.fallbacks,
+            "last_error": self.last_error,
+        }
@@ -13,9 +13,9 @@ from app.infrastructure.external.winrm_service import WinRMService
 
 
 class ExchangeService:
-    def __init__(self, ldap_service=None):
+    def __init__(self, ldap_service=None, winrm_service: Optional[WinRMService] = None):
         self.ldap_service = ldap_service
-        self.winrm_service = WinRMService()
+        self.winrm_service = winrm_service or WinRMService()
         self.exchange_server = settings.exchange_server
         self.exchange_database = settings.exchange_database
         self.smtp_server = settings.smtp_server
@@ -0,0 +1,97 @@
+"""Кэш DN объектов AD (группы, пользователи по pager и sAMAccountName) с TTL и ограничением размера"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Виды ключей кэша
+GROUP = "group"
+PAGER = "pager"
+SAM = "sam"
+
+
+class _KindStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def summary(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+class LDAPDNCache:
+    """
+    LRU-кэш найденных DN с временем жизни записи. Кэшируются только найденные
+    объекты: отсутствующая группа или пользователь ищутся заново при следующем
+    обращении. Наши перемещения и переименования удаляют записи по старому DN
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._stats = {kind: _KindStats() for kind in (GROUP, PAGER, SAM)}
+        self._evictions = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _key(kind: str, name: str) -> Tuple[str, str]:
+        # Поиск в AD по этим атрибутам регистронезависимый
+        return kind, name.strip().lower()
+
+    def get(self, kind: str, name: str) -> Optional[str]:
+        key = self._key(kind, name)
+        cached = self._entries.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            self._entries.move_to_end(key)
+            self._stats[kind].hits += 1
+            return cached[0]
+        if cached is not None:
+            del self._entries[key]
+        self._stats[kind].misses += 1
+        return None
+
+    def put(self, kind: str, name: str, dn: str) -> None:
+        if self.max_entries <= 0 or not dn:
+            return
+        key = self._key(kind, name)
+        self._entries[key] = (dn, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def invalidate(self, kind: str, name: str) -> None:
+        if self._entries.pop(self._key(kind, name), None) is not None:
+            self._invalidations += 1
+
+    def invalidate_dn(self, dn: str) -> None:
+        """Удаление всех записей, указывающих на dn (объект перемещен, переименован или изменен его ключ)"""
+        dn = dn.lower()
+        stale = [key for key, (cached_dn, _) in self._entries.items() if cached_dn.lower() == dn]
+        for key in stale:
+            del self._entries[key]
+        self._invalidations += len(stale)
+
+    def clear(self) -> None:
+        self._invalidations += len(self._entries)
+        self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        hits = sum(stats.hits for stats in self._stats.values())
+        misses = sum(stats.misses for stats in self._stats.values())
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "evictions": self._evictions,
+            "invalidations": self._invalidations,
+            "by_kind": {kind: stats.summary() for kind, stats in self._stats.items()},
+        }
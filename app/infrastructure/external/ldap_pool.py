@@ -0,0 +1,370 @@
+"""Пул привязанных подключений ldap3 с выполнением операций в отдельном executor"""
+import asyncio
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from ldap3 import BASE, SUBTREE, Connection
+from ldap3.core.exceptions import LDAPCommunicationError, LDAPResponseTimeoutError
+
+from app.core.logging.logger import ldap_logger
+
+T = TypeVar("T")
+
+# Ошибки соединения: подключение выбрасывается из пула, следующая операция получит новое
+CONNECTION_ERRORS = (LDAPCommunicationError, LDAPResponseTimeoutError)
+# Control Simple Paged Results (RFC 2696)
+PAGED_RESULTS_OID = "1.2.840.113556.1.4.319"
+# Замеров ожидания и длительности операций для перцентилей в метриках
+METRIC_SAMPLES = 1000
+
+
+class _PooledConnection:
+    """Подключение пула и время его последнего использования"""
+
+    def __init__(self, connection: Connection):
+        self.connection = connection
+        self.last_used = time.monotonic()
+
+
+class _Timings:
+    """Количество, сумма, максимум и последние замеры времени"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=METRIC_SAMPLES)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+
+        def percentile(share: float) -> float:
+            return ordered[max(0, int(len(ordered) * share) - 1)] * 1000 if ordered else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(percentile(0.5), 2),
+            "p95_ms": round(percentile(0.95), 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class LDAPConnectionPool:
+    """
+    Ограниченный пул подключений к AD. Блокирующие вызовы ldap3 выполняются в
+    собственном ThreadPoolExecutor и не останавливают event loop. Подключение,
+    простоявшее дольше max_idle_seconds, перед использованием проверяется
+    запросом к rootDSE; после ошибки соединения оно закрывается и создается заново
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Connection],
+        size: int,
+        max_idle_seconds: int,
+        name: str = "ldap",
+        keepalive_seconds: Optional[int] = None,
+    ):
+        self._connect = connect
+        self.size = size
+        self.max_idle_seconds = max_idle_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{name}-pool")
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle: List[_PooledConnection] = []
+        self._open = 0
+        self._waiting = 0
+        self._closed = False
+        # Счетчики подключений меняются и из потоков executor
+        self._lock = threading.Lock()
+        self._wait_times = _Timings()
+        self._operation_times = _Timings()
+        self._errors = 0
+        self._reconnects = 0
+        self._connections_created = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def run(self, operation: Callable[[Connection], T], retry: bool = False) -> T:
+        """
+        Выполнение operation(connection) на свободном подключении пула.
+        retry=True повторяет операцию на новом подключении после ошибки соединения
+        (только для операций без побочных эффектов - поиска)
+        """
+        async with self.lease() as lease:
+            return await lease.run(operation, retry)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator["_Lease"]:
+        """
+        Одно подключение на несколько операций подряд. Нужно постраничному поиску:
+        cookie Simple Paged Results действует только на том подключении, где выдан
+        """
+        if self._closed:
+            raise RuntimeError(f"Пул LDAP-подключений {self.name} закрыт")
+
+        wait_started = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._wait_times.add(time.perf_counter() - wait_started)
+
+        lease = _Lease(self, self._idle.pop() if self._idle else None)
+        try:
+            yield lease
+        finally:
+            self._semaphore.release()
+            pooled = lease.pooled
+            if pooled is not None:
+                if self._closed:
+                    self._discard(pooled)
+                else:
+                    self._idle.append(pooled)
+
+    def _execute(self, pooled: Optional[_PooledConnection], operation: Callable[[Connection], T], retry: bool):
+        """Выполняется в потоке executor: подготовка подключения и операция"""
+        pooled = self._ensure_usable(pooled)
+        try:
+            return operation(pooled.connection), pooled
+        except CONNECTION_ERRORS as e:
+            ldap_logger.warning(f"Ошибка соединения с AD ({self.name}), подключение пересоздается: {e}")
+            self._discard(pooled)
+            if not retry:
+                raise
+            pooled = self._new_connection()
+            with self._lock:
+                self._reconnects += 1
+            try:
+                return operation(pooled.connection), pooled
+            except Exception:
+                self._discard(pooled)
+                raise
+        except Exception:
+            # Ошибка вне протокола (например, в разборе ответа): состояние подключения неизвестно
+            self._discard(pooled)
+            raise
+
+    def _ensure_usable(self, pooled: Optional[_PooledConnection]) -> _PooledConnection:
+        if pooled is None:
+            return self._new_connection()
+        connection = pooled.connection
+        healthy = connection.bound and not connection.closed
+        if healthy and time.monotonic() - pooled.last_used > self.max_idle_seconds:
+            # Долго простаивавшее подключение мог закрыть сервер или межсетевой экран
+            try:
+                healthy = connection.search("", "(objectClass=*)", search_scope=BASE, attributes=["1.1"])
+            except Exception:
+                healthy = False
+        if healthy:
+            return pooled
+        ldap_logger.info(f"LDAP-подключение пула {self.name} недоступно, повторная привязка")
+        self._discard(pooled)
+        with self._lock:
+            self._reconnects += 1
+        return self._new_connection()
+
+    def _new_connection(self) -> _PooledConnection:
+        connection = self._connect()
+        if self.keepalive_seconds:
+            self._enable_keepalive(connection)
+        with self._lock:
+            self._open += 1
+            self._connections_created += 1
+        return _PooledConnection(connection)
+
+    def _enable_keepalive(self, connection: Connection) -> None:
+        """
+        TCP keepalive на сокете подключения: простаивающее соединение не закрывается
+        межсетевым экраном, а разорванное обнаруживается до следующей операции
+        """
+        sock = getattr(connection, "socket", None)
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_seconds)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, self.keepalive_seconds // 4))
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 4)
+        except OSError as e:
+            ldap_logger.warning(f"Не удалось включить TCP keepalive для подключения пула {self.name}: {e}")
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        with self._lock:
+            self._open -= 1
+        try:
+            pooled.connection.unbind()
+        except Exception:
+            pass
+
+    def metrics(self) -> Dict[str, Any]:
+        """Состояние пула, время ожидания свободного подключения и длительность операций"""
+        return {
+            "name": self.name,
+            "size": self.size,
+            "open": self._open,
+            "idle": len(self._idle),
+            "in_use": self._open - len(self._idle),
+            "waiting": self._waiting,
+            "connections_created": self._connections_created,
+            "reconnects": self._reconnects,
+            "errors": self._errors,
+            "wait": self._wait_times.summary(),
+            "operations": self._operation_times.summary(),
+        }
+
+    def close(self) -> None:
+        """Закрытие свободных подключений и executor; занятые закрываются по завершении операции"""
+        self._closed = True
+        while self._idle:
+            self._discard(self._idle.pop())
+        self._executor.shutdown(wait=False)
+
+
+class _Lease:
+    """Подключение, занятое у пула; операции выполняются в executor пула"""
+
+    def __init__(self, pool: LDAPConnectionPool, pooled: Optional[_PooledConnection]):
+        self._pool = pool
+        self.pooled = pooled
+
+    async def run(self, operation: Callable[[Connection], T], retry: bool = False) -> T:
+        pool = self._pool
+        started = time.perf_counter()
+        try:
+            result, self.pooled = await asyncio.get_running_loop().run_in_executor(
+                pool._executor, pool._execute, self.pooled, operation, retry
+            )
+        except Exception:
+            # После ошибки подключение уже закрыто в _execute
+            self.pooled = None
+            pool._errors += 1
+            raise
+        finally:
+            pool._operation_times.add(time.perf_counter() - started)
+        self.pooled.last_used = time.monotonic()
+        return result
+
+
+class _MicrosoftExtendedOperations:
+    """Расширенные операции AD (conn.extend.microsoft) через пул"""
+
+    def __init__(self, owner: "PooledLDAPConnection"):
+        self._owner = owner
+
+    async def modify_password(self, *args, **kwargs):
+        return await self._owner._call(lambda c: c.extend.microsoft.modify_password(*args, **kwargs))
+
+    async def add_members_to_groups(self, *args, **kwargs):
+        return await self._owner._call(lambda c: c.extend.microsoft.add_members_to_groups(*args, **kwargs))
+
+    async def remove_members_from_groups(self, *args, **kwargs):
+        return await self._owner._call(lambda c: c.extend.microsoft.remove_members_from_groups(*args, **kwargs))
+
+
+class _ExtendedOperations:
+    def __init__(self, owner: "PooledLDAPConnection"):
+        self.microsoft = _MicrosoftExtendedOperations(owner)
+
+
+class PooledLDAPConnection:
+    """
+    Асинхронный аналог ldap3 Connection поверх пула: каждая операция занимает
+    подключение только на время своего выполнения. entries, response и result
+    относятся к последней операции этого объекта, как у обычного подключения
+    """
+
+    def __init__(self, pool: LDAPConnectionPool):
+        self._pool = pool
+        self.entries: list = []
+        self.response: Optional[list] = None
+        self.result: dict = {}
+        self.extend = _ExtendedOperations(self)
+
+    @property
+    def bound(self) -> bool:
+        return not self._pool.closed
+
+    async def search(self, *args, **kwargs) -> bool:
+        def operation(connection: Connection):
+            success = connection.search(*args, **kwargs)
+            return success, list(connection.entries), connection.response, connection.result
+
+        success, self.entries, self.response, self.result = await self._pool.run(operation, retry=True)
+        return success
+
+    async def paged_search(
+        self,
+        search_base: str,
+        search_filter: str,
+        attributes: List[str],
+        page_size: int = 1000,
+        search_scope: str = SUBTREE,
+        controls: Optional[List[Tuple[str, bool, Any]]] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Постраничный поиск (Simple Paged Results): по странице атрибутов найденных
+        записей за раз. AD без control обрезает ответ на MaxPageSize (1000) записей.
+        Все страницы читаются на одном подключении, занятом до конца перебора.
+        controls - дополнительные controls запроса (например, Show Deleted)
+        """
+        async with self._pool.lease() as lease:
+            cookie = None
+            while True:
+                def page(connection: Connection) -> Tuple[List[Dict[str, Any]], Optional[bytes]]:
+                    connection.search(
+                        search_base,
+                        search_filter,
+                        search_scope=search_scope,
+                        attributes=attributes,
+                        paged_size=page_size,
+                        paged_cookie=cookie,
+                        controls=controls,
+                    )
+                    rows = [item["attributes"] for item in connection.response if item.get("type") == "searchResEntry"]
+                    control = connection.result.get("controls", {}).get(PAGED_RESULTS_OID, {})
+                    return rows, control.get("value", {}).get("cookie")
+
+                # Повтор возможен только для первой страницы: cookie не переносится на новое подключение
+                rows, cookie = await lease.run(page, retry=cookie is None)
+                if rows:
+                    yield rows
+                if not cookie:
+                    return
+
+    async def add(self, *args, **kwargs) -> bool:
+        return await self._call(lambda c: c.add(*args, **kwargs))
+
+    async def modify(self, *args, **kwargs) -> bool:
+        return await self._call(lambda c: c.modify(*args, **kwargs))
+
+    async def modify_dn(self, *args, **kwargs) -> bool:
+        return await self._call(lambda c: c.modify_dn(*args, **kwargs))
+
+    async def delete(self, *args, **kwargs) -> bool:
+        return await self._call(lambda c: c.delete(*args, **kwargs))
+
+    async def _call(self, function: Callable[[Connection], Any]) -> Any:
+        """Изменяющая операция: без повтора, чтобы не выполнить ее дважды"""
+        def operation(connection: Connection):
+            return function(connection), connection.response, connection.result
+
+        value, self.response, self.result = await self._pool.run(operation)
+        return value
@@ -0,0 +1,113 @@
+"""Локальный снимок схемы и сведений о сервере AD (DSA info) для привязки без загрузки схемы"""
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from ldap3 import ALL, NONE, Connection, Server
+from ldap3.protocol.rfc4512 import DsaInfo, SchemaInfo
+
+from app.core.logging.logger import ldap_logger
+
+
+class LDAPSchemaCache:
+    """
+    Снимок схемы и DSA info в JSON-файле. ldap3 с get_info=ALL читает rootDSE и
+    схему (сотни КБ) при каждой привязке; сервер с приложенным снимком и
+    get_info=NONE привязывается без этих запросов, а форматирование атрибутов
+    по схеме сохраняется
+    """
+
+    def __init__(self, path: str, host: str, ttl_seconds: int):
+        self.path = path
+        self.host = host
+        self.ttl_seconds = ttl_seconds
+        self.info: Optional[DsaInfo] = None
+        self.schema: Optional[SchemaInfo] = None
+        self.saved_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.schema is not None
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        return time.time() - self.saved_at if self.saved_at else None
+
+    @property
+    def is_stale(self) -> bool:
+        return not self.loaded or self.age_seconds >= self.ttl_seconds
+
+    def load(self) -> bool:
+        """Загрузка снимка из файла; снимок другого сервера или поврежденный файл игнорируются"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("server") != self.host:
+                ldap_logger.info(f"Снимок схемы AD {self.path} сделан для {snapshot.get('server')}, не используется")
+                return False
+            self._set(DsaInfo.from_json(json.dumps(snapshot["info"])),
+                      SchemaInfo.from_json(json.dumps(snapshot["schema"])),
+                      snapshot["saved_at"])
+        except Exception as e:
+            ldap_logger.warning(f"Не удалось загрузить снимок схемы AD {self.path}: {e}")
+            return False
+        ldap_logger.info(f"Схема AD загружена из {self.path} (снимок от {time.strftime('%Y-%m-%d %H:%M', time.localtime(self.saved_at))})")
+        return True
+
+    def save(self, server: Server) -> None:
+        """Сохранение схемы и DSA info, прочитанных сервером при привязке"""
+        if server.info is None or server.schema is None:
+            return
+        saved_at = time.time()
+        snapshot = {
+            "server": self.host,
+            "saved_at": saved_at,
+            "info": json.loads(server.info.to_json()),
+            "schema": json.loads(server.schema.to_json()),
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Запись во временный файл и замена: читатель не увидит файл наполовину записанным
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(temporary, self.path)
+        self._set(server.info, server.schema, saved_at)
+        ldap_logger.info(f"Снимок схемы AD сохранен в {self.path}")
+
+    def attach(self, server: Server) -> None:
+        """Снимок в сервер ldap3; последующие привязки не читают схему с сервера"""
+        server.attach_dsa_info(self.info)
+        server.attach_schema_info(self.schema)
+        server.get_info = NONE
+
+    def refresh(self, server: Server, bind: Any) -> None:
+        """
+        Повторное чтение схемы на отдельном подключении и сохранение снимка
+        (выполняется в потоке). bind(server) возвращает привязанное подключение
+        """
+        reader = Server(server.host, port=server.port, use_ssl=server.ssl, get_info=ALL,
+                        connect_timeout=server.connect_timeout)
+        connection: Connection = bind(reader)
+        try:
+            self.save(reader)
+        finally:
+            connection.unbind()
+        self.attach(server)
+
+    def _set(self, info: DsaInfo, schema: SchemaInfo, saved_at: float) -> None:
+        self.info = info
+        self.schema = schema
+        self.saved_at = saved_at
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "loaded": self.loaded,
+            "age_seconds": round(self.age_seconds) if self.saved_at else None,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -1,10 +1,76 @@
 import asyncio
 import os
+import re
 import subprocess
-from typing import Dict, Any, Optional, List
-from ldap3 import Server, Connection, ALL, NTLM, SIMPLE, SUBTREE, MODIFY_REPLACE
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, List, AsyncIterator, Iterable, Tuple
+from ldap3 import Server, Connection, ALL, BASE, NONE, NTLM, SIMPLE, SUBTREE, MODIFY_DELETE, MODIFY_REPLACE
+from ldap3.utils.conv import escape_filter_chars
 from app.core.config.settings import settings
 from app.core.logging.logger import ldap_logger
+from app.core.utils.aio import aclosing
+from app.infrastructure.external.ldap_pool import LDAPConnectionPool, PooledLDAPConnection
+from app.infrastructure.external.ldap_schema_cache import LDAPSchemaCache
+from app.infrastructure.external.ldap_dn_cache import GROUP, PAGER, SAM, LDAPDNCache
+from app.infrastructure.external.ou_routing import OURouter
+from app.infrastructure.external.ad_mirror import (
+    ACCOUNTDISABLE, AD_MIRROR_ATTRIBUTES, AD_MIRROR_FILTER, SHOW_DELETED_OID, ADMirror, object_guid, object_row,
+)
+
+# Повтор фонового обновления снимка схемы после ошибки
+SCHEMA_REFRESH_RETRY_SECONDS = 600
+
+# Экспорт из AD: включенные учетные записи сотрудников и колонки выгрузки
+AD_EXPORT_FILTER = '(&(objectClass=user)(objectCategory=person)(!(userAccountControl:1.2.840.113556.1.4.803:=2)))'
+AD_EXPORT_COLUMNS = [
+    'displayName', 'mail', 'givenName', 'physicalDeliveryOfficeName', 'department', 'description', 'pager',
+    'sAMAccountName', 'company', 'telephoneNumber', 'lastLogon', 'pwdLastSet', 'whenCreated', 'whenChanged',
+    'userAccountControl',
+]
+AD_EXPORT_SYSTEM_ACCOUNTS = ('Служебная учетная запись', 'Microsoft', 'E4E', 'SystemMailbox', 'HealthMailbox', 'wms', 'WMS')
+
+# Транслитерация имен для sAMAccountName (как в PowerShell): таблица для str.translate
+TRANSLIT_TABLE = str.maketrans({
+    'а': 'a', 'А': 'a', 'б': 'b', 'Б': 'b', 'в': 'v', 'В': 'v',
+    'г': 'g', 'Г': 'g', 'д': 'd', 'Д': 'd', 'е': 'e', 'Е': 'e',
+    'ё': 'e', 'Ё': 'e', 'ж': 'zh', 'Ж': 'zh', 'з': 'z', 'З': 'z',
+    'и': 'i', 'И': 'i', 'й': 'i', 'Й': 'i', 'к': 'k', 'К': 'k',
+    'л': 'l', 'Л': 'l', 'м': 'm', 'М': 'm', 'н': 'n', 'Н': 'n',
+    'о': 'o', 'О': 'o', 'п': 'p', 'П': 'p', 'р': 'r', 'Р': 'r',
+    'с': 's', 'С': 's', 'т': 't', 'Т': 't', 'у': 'u', 'У': 'u',
+    'ф': 'f', 'Ф': 'f', 'х': 'h', 'Х': 'h', 'ц': 'ts', 'Ц': 'ts',
+    'ч': 'ch', 'Ч': 'ch', 'ш': 'sh', 'Ш': 'sh', 'щ': 'sch', 'Щ': 'sch',
+    'ъ': '', 'Ъ': '', 'ы': 'y', 'Ы': 'y', 'ь': '', 'Ь': '',
+    'э': 'e', 'Э': 'e', 'ю': 'yu', 'Ю': 'yu', 'я': 'ya', 'Я': 'ya',
+    ' ': '-',
+})
+# В sAMAccountName остаются только латиница, цифры, точки и дефисы
+SAM_INVALID_CHARS = re.compile(r'[^a-zA-Z0-9.\-]')
+# Резерв подобранного имени на время создания учетной записи
+SAM_RESERVATION_SECONDS = 600
+
+
+def _single(value: Any) -> Any:
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _export_value(value: Any) -> Any:
+    """Значение атрибута из ответа ldap3 для выгрузки: пустое - '', несколько значений - через '; '"""
+    if value is None or value == []:
+        return ''
+    if isinstance(value, list):
+        if len(value) > 1:
+            return '; '.join(str(_export_value(item)) for item in value)
+        value = value[0]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return value
 
 
 class LDAPService:
@@ -13,12 +79,45 @@ class LDAPService:
         self.ad_server = settings.ad_server
         self.admin_username = settings.admin_username
         self.admin_password = settings.admin_password
-        self.conn = None
         
         ldap_logger.info(f"LDAPService инициализирован. Сервер: {self.ad_server}")
         
         self.server = Server(self.ad_server, get_info=ALL, connect_timeout=settings.ldap_timeout, use_ssl=False, port=389)
-        self.connection = None
+        # Со снимком схемы привязки не читают схему с сервера; без снимка его сохранит первая привязка
+        self.schema_cache = LDAPSchemaCache(
+            settings.ldap_schema_cache_path,
+            self.ad_server,
+            ttl_seconds=settings.ldap_schema_cache_ttl_hours * 3600,
+        )
+        self._schema_lock = threading.Lock()
+        if self.schema_cache.load():
+            self.schema_cache.attach(self.server)
+        # DN групп и пользователей почти не меняются: повторные поиски по каталогу не нужны
+        self.dn_cache = LDAPDNCache(settings.ldap_dn_cache_ttl_seconds, settings.ldap_dn_cache_max_entries)
+        # Правила выбора OU для новых пользователей; файл перечитывается при изменении
+        self.ou_router = OURouter(settings.ou_routing_path)
+        # Зеркало AD в памяти (заполняет ADMirrorService): поиски без обращения к контроллеру
+        self.mirror = ADMirror(settings.ad_mirror_max_staleness_seconds)
+        # Имена sAMAccountName, выданные allocate_sam_account_names и еще не созданные в AD
+        self._sam_reservations: Dict[str, float] = {}
+        # Пароли AD принимает только по защищенному каналу. Схема для операций с паролем
+        # не нужна, поэтому LDAPS-сервер создается без ее загрузки
+        self.secure_server = Server(self.ad_server, get_info=NONE, connect_timeout=settings.ldap_timeout, use_ssl=True, port=636)
+        # Операции ldap3 выполняются на подключениях пула в отдельном executor
+        self.pool = LDAPConnectionPool(
+            self._bind,
+            size=settings.ldap_pool_size,
+            max_idle_seconds=settings.ldap_pool_max_idle_seconds,
+            keepalive_seconds=settings.ldap_keepalive_seconds,
+        )
+        # Долгоживущие LDAPS-подключения для установки и смены паролей
+        self.secure_pool = LDAPConnectionPool(
+            self._bind_secure,
+            size=settings.ldaps_pool_size,
+            max_idle_seconds=settings.ldap_pool_max_idle_seconds,
+            name="ldaps",
+            keepalive_seconds=settings.ldap_keepalive_seconds,
+        )
     
     def _normalize_pager(self, pager: str) -> str:
         """Убирает решетку из pager для работы с AD (как в скриптах)"""
@@ -26,75 +125,208 @@ class LDAPService:
             return pager
         return str(pager).lstrip('#').strip()
     
-    async def _get_connection(self) -> Connection:
-        """Получение подключения к AD"""
-        if not self.connection or not self.connection.bound:
-            # Логируем параметры подключения
-            ldap_logger.info(f"Создание LDAP подключения:")
-            ldap_logger.info(f"  Сервер: {self.ad_server}")
-            ldap_logger.info(f"  Домен: {self.ad_domain}")
-            ldap_logger.info(f"  Пользователь: {self.admin_username}")
-            # фактический формат логина и тип аутентификации уточняются ниже (SIMPLE, UPN)
-            ldap_logger.info(f"  Формат пользователя: UPN")
-            ldap_logger.info(f"  Аутентификация: SIMPLE")
-            ldap_logger.info(f"  Timeout: {settings.ldap_timeout}")
-            ldap_logger.info(f"  SSL: False")
-            
-            try:
-                auth_user = (
-                    self.admin_username
-                    if "@" in self.admin_username
-                    else f"{self.admin_username}@{self.ad_domain}"
-                )
-                self.connection = Connection(
-                    self.server,
-                    user=auth_user,
-                    password=self.admin_password,
-                    authentication=SIMPLE,
-                    auto_bind=True
-                )
-                
-                ldap_logger.info(f"LDAP подключение создано успешно")
-                ldap_logger.info(f"  Статус привязки: {self.connection.bound}")
-                ldap_logger.info(f"  Результат подключения: {self.connection.result}")
-                
-                if not self.connection.bound:
-                    ldap_logger.error(f"LDAP подключение не привязано!")
-                    ldap_logger.error(f"  Код ошибки: {self.connection.result.get('result', 'N/A')}")
-                    ldap_logger.error(f"  Описание: {self.connection.result.get('description', 'N/A')}")
-                    ldap_logger.error(f"  Сообщение: {self.connection.result.get('message', 'N/A')}")
-                    raise Exception(f"Не удалось подключиться к AD: {self.connection.result}")
-                else:
-                    ldap_logger.info(f"LDAP подключение успешно привязано!")
-                    
-            except Exception as e:
-                ldap_logger.error(f"Исключение при создании LDAP подключения: {str(e)}")
-                ldap_logger.error(f"  Тип исключения: {type(e).__name__}")
-                raise
+    def _admin_user(self) -> str:
+        return self.admin_username if "@" in self.admin_username else f"{self.admin_username}@{self.ad_domain}"
+    
+    def _bind(self) -> Connection:
+        """Новое привязанное подключение к AD (выполняется в потоке пула)"""
+        connection = self._bind_server(self.server)
+        if not self.schema_cache.loaded:
+            with self._schema_lock:
+                if not self.schema_cache.loaded:
+                    self._save_schema_snapshot()
+        return connection
+    
+    def _save_schema_snapshot(self) -> None:
+        """Сохранение схемы, прочитанной первой привязкой; следующие привязки ее не читают"""
+        try:
+            self.schema_cache.save(self.server)
+            self.schema_cache.attach(self.server)
+        except Exception as e:
+            ldap_logger.warning(f"Не удалось сохранить снимок схемы AD: {e}")
+    
+    async def refresh_schema_cache(self) -> None:
+        """Чтение актуальной схемы AD на отдельном подключении и обновление снимка"""
+        await asyncio.to_thread(self.schema_cache.refresh, self.server, self._bind_server)
+    
+    def _bind_secure(self) -> Connection:
+        """Новое привязанное LDAPS-подключение для операций с паролями"""
+        return self._bind_server(self.secure_server)
+    
+    def _bind_server(self, server: Server) -> Connection:
+        ldap_logger.info(f"Создание LDAP подключения: сервер {server.host}:{server.port}, пользователь {self._admin_user()}, SIMPLE, timeout {settings.ldap_timeout}")
+        try:
+            connection = Connection(
+                server,
+                user=self._admin_user(),
+                password=self.admin_password,
+                authentication=SIMPLE,
+                auto_bind=True,
+                receive_timeout=settings.ldap_timeout
+            )
+        except Exception as e:
+            ldap_logger.error(f"Исключение при создании LDAP подключения: {str(e)}")
+            ldap_logger.error(f"  Тип исключения: {type(e).__name__}")
+            raise
+        
+        if not connection.bound:
+            ldap_logger.error(f"LDAP подключение не привязано!")
+            ldap_logger.error(f"  Код ошибки: {connection.result.get('result', 'N/A')}")
+            ldap_logger.error(f"  Описание: {connection.result.get('description', 'N/A')}")
+            ldap_logger.error(f"  Сообщение: {connection.result.get('message', 'N/A')}")
+            raise Exception(f"Не удалось подключиться к AD: {connection.result}")
         
-        return self.connection
+        ldap_logger.info(f"LDAP подключение успешно привязано")
+        return connection
+    
+    async def _get_connection(self) -> PooledLDAPConnection:
+        """Подключение к AD: операции выполняются на свободных подключениях пула"""
+        return PooledLDAPConnection(self.pool)
+    
+    async def _find_dn(self, conn: PooledLDAPConnection, kind: str, name: str, search_filters: List[str]) -> Optional[str]:
+        """DN из зеркала AD, кэша или поиском по фильтрам по очереди; найденный поиском DN сохраняется в кэш"""
+        dn = self.mirror.find_dn(kind, name) or self.dn_cache.get(kind, name)
+        if dn:
+            return dn
+        for search_filter in search_filters:
+            await conn.search('DC=central,DC=st-ing,DC=com', search_filter, attributes=['distinguishedName'])
+            if conn.entries:
+                dn = conn.entries[0].distinguishedName.value
+                self.dn_cache.put(kind, name, dn)
+                return dn
+        return None
+    
+    async def _find_user_dn_by_sam(self, conn: PooledLDAPConnection, sam_account_name: str) -> Optional[str]:
+        return await self._find_dn(conn, SAM, sam_account_name, [f'(sAMAccountName={sam_account_name})'])
+    
+    async def _find_dn_by_pager(self, conn: PooledLDAPConnection, pager: str) -> Optional[str]:
+        normalized_pager = self._normalize_pager(pager)
+        return await self._find_dn(conn, PAGER, normalized_pager, [f'(pager={normalized_pager})'])
+    
+    def _forget_dn(self, dn: str) -> None:
+        """Объект перемещен или изменен: записи зеркала и кэша по его DN больше не достоверны"""
+        self.dn_cache.invalidate_dn(dn)
+        self.mirror.forget_dn(dn)
+    
+    async def _get_secure_connection(self) -> PooledLDAPConnection:
+        """LDAPS-подключение для установки и смены паролей из отдельного пула"""
+        return PooledLDAPConnection(self.secure_pool)
+    
+    async def _set_password(self, user_dn: str, password: str) -> None:
+        """Установка пароля по LDAPS на подключении из пула"""
+        secure_conn = await self._get_secure_connection()
+        if not await secure_conn.extend.microsoft.modify_password(user_dn, password):
+            raise Exception(f"Не удалось установить пароль: {secure_conn.result}")
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Метрики пулов LDAP- и LDAPS-подключений, снимка схемы, кэша DN, зеркала AD и правил OU"""
+        return {
+            "ldap": self.pool.metrics(),
+            "ldaps": self.secure_pool.metrics(),
+            "schema": self.schema_cache.metrics(),
+            "dn_cache": self.dn_cache.metrics(),
+            "ad_mirror": self.mirror.metrics(),
+            "ou_routing": self.ou_router.metrics(),
+        }
+    
+    def close(self) -> None:
+        """Закрытие подключений к AD при остановке приложения"""
+        self.pool.close()
+        self.secure_pool.close()
+        ldap_logger.info("Пул LDAP подключений закрыт")
     
     def translit(self, text: str) -> str:
         """Транслитерация русского текста в латиницу (точно как в PowerShell)"""
-        translit_map = {
-            'а': 'a', 'А': 'a', 'б': 'b', 'Б': 'b', 'в': 'v', 'В': 'v',
-            'г': 'g', 'Г': 'g', 'д': 'd', 'Д': 'd', 'е': 'e', 'Е': 'e',
-            'ё': 'e', 'Ё': 'e', 'ж': 'zh', 'Ж': 'zh', 'з': 'z', 'З': 'z',
-            'и': 'i', 'И': 'i', 'й': 'i', 'Й': 'i', 'к': 'k', 'К': 'k',
-            'л': 'l', 'Л': 'l', 'м': 'm', 'М': 'm', 'н': 'n', 'Н': 'n',
-            'о': 'o', 'О': 'o', 'п': 'p', 'П': 'p', 'р': 'r', 'Р': 'r',
-            'с': 's', 'С': 's', 'т': 't', 'Т': 't', 'у': 'u', 'У': 'u',
-            'ф': 'f', 'Ф': 'f', 'х': 'h', 'Х': 'h', 'ц': 'ts', 'Ц': 'ts',
-            'ч': 'ch', 'Ч': 'ch', 'ш': 'sh', 'Ш': 'sh', 'щ': 'sch', 'Щ': 'sch',
-            'ъ': '', 'Ъ': '', 'ы': 'y', 'Ы': 'y', 'ь': '', 'Ь': '',
-            'э': 'e', 'Э': 'e', 'ю': 'yu', 'Ю': 'yu', 'я': 'ya', 'Я': 'ya',
-            ' ': '-'
-        }
+        return (text or '').translate(TRANSLIT_TABLE)
+    
+    def sam_account_base(self, firstname: str, secondname: str) -> str:
+        """
+        Имя учетной записи без номера: имя.фамилия латиницей, только допустимые в
+        sAMAccountName символы; пустая строка, если от имени не осталось букв и цифр
+        """
+        base = SAM_INVALID_CHARS.sub('', f"{self.translit(firstname)}.{self.translit(secondname)}")
+        return base if base.strip('.-') else ""
+    
+    def _reserved_sam_names(self) -> set:
+        now = time.monotonic()
+        for name, expires_at in list(self._sam_reservations.items()):
+            if expires_at <= now:
+                del self._sam_reservations[name]
+        return set(self._sam_reservations)
+    
+    def release_sam_account_name(self, sam_account_name: str) -> None:
+        """Снятие резерва имени после создания учетной записи или ошибки"""
+        self._sam_reservations.pop(sam_account_name.lower(), None)
+    
+    async def allocate_sam_account_names(self, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        sAMAccountName для пачки новых пользователей: имя.фамилия, а если имя занято -
+        с наименьшим свободным номером (ivan.petrov2, ivan.petrov3, ...). Занятые имена
+        ищутся одним OR-фильтром на ldap_filter_chunk_size имен; учетная запись с тем
+        же pager используется повторно. Новые имена резервируются до release_sam_account_name,
+        чтобы параллельные одобрения не выбрали одно имя.
+        Возвращает по элементу на пользователя: {"sam_account_name", "existing_dn"}
+        """
+        bases = [self.sam_account_base(user.get('firstname', ''), user.get('secondname', '')) for user in users]
+        unique_bases = list(dict.fromkeys(base.lower() for base in bases if base))
+        # Все учетные записи, имя которых начинается с одного из имен пачки
+        taken: Dict[str, Tuple[str, Optional[str], str]] = {}
+        chunk_size = max(1, settings.ldap_filter_chunk_size)
+        searches = 0
+        if unique_bases:
+            conn = await self._get_connection()
+            for start in range(0, len(unique_bases), chunk_size):
+                chunk = unique_bases[start:start + chunk_size]
+                # Имена содержат только латиницу, цифры, точки и дефисы: экранирование не нужно
+                search_filter = '(|' + ''.join(f'(sAMAccountName={base}*)' for base in chunk) + ')'
+                pages = conn.paged_search(
+                    'DC=central,DC=st-ing,DC=com',
+                    search_filter,
+                    ['sAMAccountName', 'pager', 'distinguishedName'],
+                    page_size=settings.ldap_page_size,
+                )
+                async with aclosing(pages):
+                    async for rows in pages:
+                        for attributes in rows:
+                            sam = _single(attributes.get('sAMAccountName'))
+                            if sam:
+                                pager = _single(attributes.get('pager'))
+                                taken[str(sam).lower()] = (str(sam), self._normalize_pager(pager) if pager else None, _single(attributes.get('distinguishedName')))
+                searches += 1
         
-        result = ""
-        for char in text:
-            result += translit_map.get(char, char)
-        return result
+        reserved = self._reserved_sam_names()
+        expires_at = time.monotonic() + SAM_RESERVATION_SECONDS
+        allocations = []
+        for user, base in zip(users, bases):
+            if not base:
+                allocations.append({"sam_account_name": base, "existing_dn": None})
+                continue
+            key = base.lower()
+            pager = self._normalize_pager(user.get('unique_id', ''))
+            # Повторное одобрение: учетная запись этого сотрудника уже создана под именем из его ряда
+            existing = next(
+                (
+                    account for name, account in sorted(taken.items())
+                    if pager and account[1] == pager and (name == key or (name.startswith(key) and name[len(key):].isdigit()))
+                ),
+                None,
+            )
+            if existing:
+                allocations.append({"sam_account_name": existing[0], "existing_dn": existing[2]})
+                continue
+            candidate, number = base, 1
+            while candidate.lower() in taken or candidate.lower() in reserved:
+                number += 1
+                candidate = f"{base}{number}"
+            reserved.add(candidate.lower())
+            self._sam_reservations[candidate.lower()] = expires_at
+            allocations.append({"sam_account_name": candidate, "existing_dn": None})
+        
+        ldap_logger.info(
+            f"Подбор sAMAccountName: {len(users)} пользователей, {len(unique_bases)} имен, "
+            f"{searches} поисков в AD, занято {len(taken)}"
+        )
+        return allocations
     
     def get_user_principal_name(self, sam_account_name: str, company: str) -> str:
         """Определение UserPrincipalName на основе компании (точно как в PowerShell)"""
@@ -106,77 +338,23 @@ class LDAPService:
             return f"{sam_account_name}@st-ing.com"
     
     def find_ou(self, obj_name: str, department: str) -> str:
-        """Определение OU в Active Directory (точно как в PowerShell)"""
-        if 'прудный' in obj_name.lower():
-            return "OU=Доп. офис Трёхпрудный,OU=Отдел управления проектами,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-        
-        if 'лобня' in obj_name.lower():
-            if 'логистик' in department.lower():
-                return "OU=Отдел логистики и складского учета,OU=Коммерческий департамент,OU=DtTermo,DC=central,DC=st-ing,DC=com"
-        
-        if 'медовый' in obj_name.lower():
-            # Используем только название отдела (как в PowerShell)
-            if 'информац' in department.lower():
-                return "OU=Отдел информационных технологий,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'кадро' in department.lower():
-                return "OU=Отдел кадров,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'персона' in department.lower():
-                return "OU=Отдел персонала,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'управленческ' in department.lower():
-                return "OU=Отдел управленческого учета,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'проектир' in department.lower():
-                return "OU=Отдел проектирования,OU=Департамент развития,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'ендерны' in department.lower():
-                return "OU=Тендерный отдел,OU=Департамент развития,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'закупок' in department.lower():
-                return "OU=Отдел закупок,OU=Коммерческий департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'логистик' in department.lower():
-                return "OU=Отдел логистики и складского учета,OU=Коммерческий департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'снабже' in department.lower():
-                return "OU=Отдел снабжения,OU=Коммерческий департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'труд' in department.lower():
-                return "OU=Отдел охраны труда,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'пто' in department.lower():
-                return "OU=Отдел ПТО,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'метный' in department.lower():
-                return "OU=Сметный отдел,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'управления проект' in department.lower():
-                return "OU=Отдел управления проектами,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'планово' in department.lower():
-                return "OU=Планово экономический отдел,OU=Финансовый департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'ухгалтери' in department.lower():
-                return "OU=Бухгалтерия,OU=Финансовый департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'азначе' in department.lower():
-                return "OU=Казначейство,OU=Финансовый департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'ридически' in department.lower():
-                return "OU=Юридический отдел,OU=Юридический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-            elif 'дминистративны' in department.lower():
-                return "OU=Административный отдел,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-        
-        # Проверяем строительные объекты - используем полное название объекта
-        construction_objects = ['емеров', 'амчатк', 'гнитогор', 'завидов', 'эс2', 'сбер к32', 'инькофф', 'цод']
-        for obj in construction_objects:
-            if obj in obj_name.lower():
-                # Точно как в PowerShell: создаем индивидуальную OU для каждого строительного объекта
-                individual_ou = f"OU={obj_name},OU=Строительные объекты,OU=Отдел управления проектами,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-                
-                # Проверяем, не превышает ли DN лимит в 256 символов
-                if len(individual_ou) > 256:
-                    ldap_logger.warning(f"Индивидуальная OU слишком длинная ({len(individual_ou)} символов), используем общую OU")
-                    return "OU=Строительные объекты,OU=Отдел управления проектами,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
-                
-                return individual_ou
-        
-        # Если не найдена подходящая OU, возвращаем ошибку (точно как в PowerShell)
-        raise ValueError(f"Не найдена подходящая организационная единица для объекта '{obj_name}' и отдела '{department}'")
+        """
+        Определение OU в Active Directory (как в PowerShell) по правилам и реестру
+        строительных объектов из файла settings.ou_routing_path
+        """
+        return self.ou_router.find_ou(obj_name, department)
     
     async def list_available_ous(self) -> List[str]:
         """Получение списка всех доступных организационных единиц в AD"""
         try:
+            ous = self.mirror.list_ous()
+            if ous is not None:
+                return ous
+            
             conn = await self._get_connection()
             
             # Поиск всех OU в домене
-            conn.search(
+            await conn.search(
                 'DC=central,DC=st-ing,DC=com',
                 '(objectClass=organizationalUnit)',
                 attributes=['distinguishedName']
@@ -196,8 +374,18 @@ class LDAPService:
             ldap_logger.error(f"Ошибка получения списка OU: {e}")
             return []
     
-    async def create_user_in_ad(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Создание пользователя в Active Directory через LDAP (точно как в PowerShell)"""
+    async def create_user_in_ad(
+        self,
+        user_data: Dict[str, Any],
+        allocation: Optional[Dict[str, Any]] = None,
+        manager_dns: Optional[Dict[str, Optional[str]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Создание пользователя в Active Directory через LDAP (точно как в PowerShell).
+        allocation - имя из allocate_sam_account_names (при массовом одобрении имена
+        подбираются для всей пачки); без него имя подбирается для одного пользователя.
+        manager_dns - DN руководителей пачки из resolve_manager_dns
+        """
         try:
             ldap_logger.info(f"=== НАЧАЛО СОЗДАНИЯ ПОЛЬЗОВАТЕЛЯ В AD ===")
             ldap_logger.info(f"ID пользователя: {user_data.get('unique_id', 'Unknown')}")
@@ -216,7 +404,10 @@ class LDAPService:
             ldap_logger.info(f"Подготовка данных пользователя...")
             firstname_translit = self.translit(user_data.get('firstname', ''))
             secondname_translit = self.translit(user_data.get('secondname', ''))
-            sam_account_name = f"{firstname_translit}.{secondname_translit}"
+            if allocation is None:
+                allocation = (await self.allocate_sam_account_names([user_data]))[0]
+            sam_account_name = allocation["sam_account_name"]
+            exists_dn = allocation["existing_dn"]
             
             ldap_logger.info(f"  Транслитерация: {user_data.get('firstname', '')} -> {firstname_translit}")
             ldap_logger.info(f"  Транслитерация: {user_data.get('secondname', '')} -> {secondname_translit}")
@@ -227,7 +418,7 @@ class LDAPService:
             
             # Определяем тип пользователя: если is_engineer == 1, то технический
             if user_data.get('is_engineer') == 1:
-                ou = 'OU=Технические логины,DC=central,DC=st-ing,DC=com'
+                ou = self.ou_router.rules.technical_ou
                 ldap_logger.info(f"  Тип пользователя: Технический (is_engineer=1)")
             else:
                 # Определяем OU по логике из PowerShell скрипта
@@ -408,11 +599,7 @@ class LDAPService:
             
             ldap_logger.info(f"Все обязательные атрибуты присутствуют: {', '.join(required_attrs)}")
             
-            # Проверка существования по sAMAccountName
-            conn.search('DC=central,DC=st-ing,DC=com', f'(sAMAccountName={sam_account_name})', attributes=['distinguishedName'])
-            exists_dn = conn.entries[0].distinguishedName.value if conn.entries else None
-
-            # Создание или обновление пользователя в AD
+            # Создание или обновление пользователя в AD (учетная запись с тем же pager найдена при подборе имени)
             if exists_dn:
                 ldap_logger.info(f"Пользователь уже существует: {sam_account_name} -> {exists_dn}")
                 user_dn = exists_dn
@@ -439,7 +626,7 @@ class LDAPService:
 
                 # Выполняем обновление атрибутов с правильным форматом
                 if changes:
-                    success = conn.modify(user_dn, changes)
+                    success = await conn.modify(user_dn, changes)
                 else:
                     ldap_logger.info("  Нет атрибутов для обновления - пользователь уже актуален")
                     success = True
@@ -473,7 +660,16 @@ class LDAPService:
                         if len(attr_value) > 255:
                             ldap_logger.error(f"    СЛИШКОМ ДЛИННЫЙ {attr_name}: {len(attr_value)} символов")
                 
-                success = conn.add(user_dn, attributes=validated_attributes)
+                success = await conn.add(user_dn, attributes=validated_attributes)
+                if not success and conn.result.get('result') == 68:
+                    # CN занят однофамильцем в той же OU: уникальное имя учетной записи добавляется в CN
+                    cn_name = f"{validated_attributes['cn']} ({sam_account_name})"
+                    if len(f"CN={_escape_rdn_value(cn_name)},{ou}") > max_dn_length:
+                        cn_name = sam_account_name
+                    user_dn = f"CN={_escape_rdn_value(cn_name)},{ou}"
+                    validated_attributes['cn'] = cn_name
+                    ldap_logger.warning(f"  Объект с таким CN уже существует, повтор с DN: {user_dn}")
+                    success = await conn.add(user_dn, attributes=validated_attributes)
             
             # Логирование результата
             if exists_dn:
@@ -486,31 +682,27 @@ class LDAPService:
             if success:
                 if exists_dn:
                     ldap_logger.info(f"✅ Пользователь {sam_account_name} успешно обновлен в AD через LDAP")
+                    # Мог измениться pager: записи, указывающие на пользователя, больше не достоверны
+                    self._forget_dn(user_dn)
                 else:
                     ldap_logger.info(f"✅ Пользователь {sam_account_name} успешно создан в AD через LDAP")
+                # Добавление в группы и назначение менеджера ниже найдут DN без поиска
+                self.dn_cache.put(SAM, sam_account_name, user_dn)
                 # Установка пароля по LDAPS и включение пользователя, чтобы совпадать с поведением PowerShell
                 ldap_logger.info(f"Установка пароля для пользователя по LDAPS...")
                 try:
-                    secure_server = Server(self.ad_server, get_info=ALL, connect_timeout=settings.ldap_timeout, use_ssl=True, port=636)
-                    secure_conn = Connection(
-                        secure_server,
-                        user=(self.admin_username if "@" in self.admin_username else f"{self.admin_username}@{self.ad_domain}"),
-                        password=self.admin_password,
-                        authentication=SIMPLE,
-                        auto_bind=True
-                    )
-                    secure_conn.extend.microsoft.modify_password(user_dn, settings.default_user_password)
+                    await self._set_password(user_dn, settings.default_user_password)
                     ldap_logger.info(f"✅ Пароль установлен успешно (LDAPS)")
                     
                     # Включаем учетную запись (NORMAL_ACCOUNT = 512)
-                    conn.modify(
+                    await conn.modify(
                         user_dn,
                         {'userAccountControl': [(MODIFY_REPLACE, ['512'])]}
                     )
                     ldap_logger.info(f"✅ Пользователь включен (userAccountControl=512)")
                     
                     # Требовать смену пароля при первом входе
-                    conn.modify(
+                    await conn.modify(
                         user_dn,
                         {'pwdLastSet': [(MODIFY_REPLACE, ['0'])]}
                     )
@@ -522,7 +714,7 @@ class LDAPService:
                 await self._add_user_to_groups(sam_account_name, user_data)
                 
                 if user_data.get('boss_id'):
-                    await self._assign_manager(sam_account_name, user_data.get('boss_id'))
+                    await self._assign_manager(sam_account_name, user_data.get('boss_id'), manager_dns, user_dn)
                 
                 return {
                     "success": True,
@@ -608,6 +800,10 @@ class LDAPService:
             ldap_logger.error(f"  Тип исключения: {type(e).__name__}")
             ldap_logger.error(f"  Детали: {str(e)}")
             return {"success": False, "stderr": str(e)}
+        finally:
+            # Созданная учетная запись видна следующим поискам, несозданное имя снова свободно
+            if allocation and not allocation["existing_dn"] and allocation["sam_account_name"]:
+                self.release_sam_account_name(allocation["sam_account_name"])
     
     async def _add_user_to_groups(self, sam_account_name: str, user_data: Dict[str, Any]):
         """Добавление пользователя в группы AD (точно как в PowerShell)"""
@@ -615,75 +811,121 @@ class LDAPService:
             conn = await self._get_connection()
             
             # Ищем DN пользователя по sAMAccountName, так как методы расширения ждут DN
-            user_dn: Optional[str] = None
-            conn.search('DC=central,DC=st-ing,DC=com', f'(sAMAccountName={sam_account_name})', attributes=['distinguishedName'])
-            if conn.entries:
-                user_dn = conn.entries[0].distinguishedName.value
-            else:
+            user_dn = await self._find_user_dn_by_sam(conn, sam_account_name)
+            if not user_dn:
                 ldap_logger.warning(f"Пользователь {sam_account_name} не найден для добавления в группы")
                 return
 
             company = user_data.get('company', '')
             # Добавляем в организационные группы, используя DN групп
+            org_group = None
             if any(keyword in company.upper() for keyword in ['СТРОЙ', 'ТЕХНО', 'ИНЖЕНЕРИНГ', 'STI', 'ТРОЙ']):
-                conn.search('DC=central,DC=st-ing,DC=com', '(cn=СтройТехноИнженеринг)', attributes=['distinguishedName'])
-                if conn.entries:
-                    org_grp_dn = conn.entries[0].distinguishedName.value
-                    conn.extend.microsoft.add_members_to_groups(user_dn, org_grp_dn)
+                org_group = 'СтройТехноИнженеринг'
             elif any(keyword in company.upper() for keyword in ['DTTERMO', 'ДТ']):
-                conn.search('DC=central,DC=st-ing,DC=com', '(cn=DttermoSign)', attributes=['distinguishedName'])
-                if conn.entries:
-                    org_grp_dn = conn.entries[0].distinguishedName.value
-                    conn.extend.microsoft.add_members_to_groups(user_dn, org_grp_dn)
+                org_group = 'DttermoSign'
+            if org_group:
+                org_grp_dn = await self._find_dn(conn, GROUP, org_group, [f'(cn={org_group})'])
+                if org_grp_dn:
+                    await conn.extend.microsoft.add_members_to_groups(user_dn, org_grp_dn)
             
             department = user_data.get('department', '')
             if department:
                 # Ищем DN группы по имени/CN, чтобы избежать ошибки "attribute type not present"
-                grp_dn = None
-                for filt in [f'(name={department})', f'(cn={department})']:
-                    conn.search('DC=central,DC=st-ing,DC=com', filt, attributes=['distinguishedName'])
-                    if conn.entries:
-                        grp_dn = conn.entries[0].distinguishedName.value
-                        break
+                grp_dn = await self._find_dn(conn, GROUP, department, [f'(name={department})', f'(cn={department})'])
                 if grp_dn:
-                    conn.extend.microsoft.add_members_to_groups(user_dn, grp_dn)
+                    await conn.extend.microsoft.add_members_to_groups(user_dn, grp_dn)
                 else:
                     ldap_logger.warning(f"Группа отдела не найдена: {department}")
                 
         except Exception as e:
             ldap_logger.warning(f"Ошибка добавления в группы: {e}")
     
-    async def _assign_manager(self, sam_account_name: str, manager_id: str):
-        """Назначение менеджера (как в PowerShell)"""
+    async def resolve_manager_dns(self, manager_ids: Iterable[Optional[str]]) -> Dict[str, Optional[str]]:
+        """
+        DN руководителей пачки пользователей по pager: из зеркала AD и кэша DN, остальные -
+        поисками с OR-фильтром на ldap_filter_chunk_size pager. Ключ - pager без решетки,
+        None - руководитель в AD не найден. Найденные поиском DN сохраняются в кэш
+        """
+        started = time.perf_counter()
+        pagers = list(dict.fromkeys(filter(None, (self._normalize_pager(manager_id) for manager_id in manager_ids))))
+        resolved: Dict[str, Optional[str]] = {}
+        missing = []
+        for pager in pagers:
+            dn = self.mirror.find_dn(PAGER, pager) or self.dn_cache.get(PAGER, pager)
+            if dn:
+                resolved[pager] = dn
+            else:
+                missing.append(pager)
+        
+        searches = 0
+        if missing:
+            conn = await self._get_connection()
+            chunk_size = max(1, settings.ldap_filter_chunk_size)
+            for start in range(0, len(missing), chunk_size):
+                chunk = missing[start:start + chunk_size]
+                search_filter = '(|' + ''.join(f'(pager={escape_filter_chars(pager)})' for pager in chunk) + ')'
+                pages = conn.paged_search(
+                    'DC=central,DC=st-ing,DC=com',
+                    search_filter,
+                    ['pager', 'distinguishedName'],
+                    page_size=settings.ldap_page_size,
+                )
+                async with aclosing(pages):
+                    async for rows in pages:
+                        for attributes in rows:
+                            pager = _single(attributes.get('pager'))
+                            dn = _single(attributes.get('distinguishedName'))
+                            if not pager or not dn:
+                                continue
+                            pager = self._normalize_pager(pager)
+                            # Как при поиске по одному pager: из нескольких записей берется первая
+                            if pager not in resolved:
+                                resolved[pager] = dn
+                                self.dn_cache.put(PAGER, pager, dn)
+                searches += 1
+        
+        not_found = [pager for pager in missing if pager not in resolved]
+        for pager in not_found:
+            resolved[pager] = None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        ldap_logger.info(
+            f"Поиск руководителей: {len(pagers)} pager, из кэша {len(pagers) - len(missing)}, "
+            f"{searches} поисков в AD, не найдено {len(not_found)}, {elapsed_ms:.1f} мс"
+        )
+        return resolved
+    
+    async def _assign_manager(
+        self,
+        sam_account_name: str,
+        manager_id: str,
+        manager_dns: Optional[Dict[str, Optional[str]]] = None,
+        user_dn: Optional[str] = None,
+    ):
+        """
+        Назначение менеджера (как в PowerShell). С manager_dns из resolve_manager_dns
+        и известным user_dn выполняется только modify, без поисков
+        """
         try:
             conn = await self._get_connection()
             
             # Поиск менеджера по pager - убираем решетку
-            normalized_manager_id = self._normalize_pager(manager_id)
-            manager_filter = f"(pager={normalized_manager_id})"
-            conn.search(
-                'DC=central,DC=st-ing,DC=com',
-                manager_filter,
-                attributes=['distinguishedName']
-            )
+            if manager_dns is not None:
+                manager_dn = manager_dns.get(self._normalize_pager(manager_id))
+            else:
+                manager_dn = await self._find_dn_by_pager(conn, manager_id)
             
-            if conn.entries:
-                manager = conn.entries[0]
-                manager_dn = manager.distinguishedName.value
+            if manager_dn:
+                user_dn = user_dn or await self._find_user_dn_by_sam(conn, sam_account_name)
                 
-                user_filter = f"(sAMAccountName={sam_account_name})"
-                conn.search(
-                    'DC=central,DC=st-ing,DC=com',
-                    user_filter,
-                    attributes=['distinguishedName']
-                )
-                
-                if conn.entries:
-                    user_dn = conn.entries[0].distinguishedName.value
-                    conn.modify(
+                if user_dn:
+                    await conn.modify(
                         user_dn,
                         {'manager': [(MODIFY_REPLACE, [manager_dn])]}
                     )
+                    if conn.result['result'] != 0:
+                        # DN из кэша мог устареть (объект перемещен не нами): следующая попытка найдет заново
+                        self._forget_dn(user_dn)
+                        self._forget_dn(manager_dn)
                     ldap_logger.info(f"Менеджер {manager_id} назначен для пользователя {sam_account_name}")
                 else:
                     ldap_logger.warning(f"Пользователь {sam_account_name} не найден для назначения менеджера")
@@ -704,7 +946,7 @@ class LDAPService:
             normalized_unique_id = self._normalize_pager(unique_id)
             search_filter = f"(&(" + "objectClass=user)(objectCategory=person)" + f"(pager={normalized_unique_id}))"
             ldap_logger.info(f"LDAP поиск пользователя: base={search_base}, filter={search_filter}")
-            conn.search(
+            await conn.search(
                 search_base,
                 search_filter,
                 search_scope=SUBTREE,
@@ -739,7 +981,7 @@ class LDAPService:
             if not current_dn:
                 # Финальный фоллбэк: отдельный поиск по sAMAccountName
                 try:
-                    conn.search(
+                    await conn.search(
                         'DC=central,DC=st-ing,DC=com',
                         f'(sAMAccountName={sam_account_name})',
                         attributes=['distinguishedName']
@@ -763,7 +1005,7 @@ class LDAPService:
             if current_dn and hasattr(user, 'memberOf') and user.memberOf:
                 for group_dn in user.memberOf.values:
                     try:
-                        conn.extend.microsoft.remove_members_from_groups(
+                        await conn.extend.microsoft.remove_members_from_groups(
                             current_dn,
                             group_dn
                         )
@@ -771,19 +1013,21 @@ class LDAPService:
                     except Exception as e:
                         ldap_logger.warning(f"Ошибка удаления из группы {group_dn}: {e}")
             
-            conn.modify(
+            await conn.modify(
                 user.entry_dn,
                 {'userAccountControl': [(MODIFY_REPLACE, ['2'])]}  # ACCOUNTDISABLE
             )
             
-            conn.modify(
+            await conn.modify(
                 user.entry_dn,
                 {'pager': [(MODIFY_REPLACE, [unique_id])]}
             )
             
             target_ou = "OU=Уволенные сотрудники,DC=central,DC=st-ing,DC=com"
+            # pager и DN пользователя меняются: кэшированные записи по старому DN удаляем
+            self._forget_dn(user.entry_dn)
             try:
-                conn.modify_dn(
+                await conn.modify_dn(
                     user.distinguishedName.value,
                     f"CN={sam_account_name}",
                     new_superior=target_ou
@@ -812,7 +1056,7 @@ class LDAPService:
             conn = await self._get_connection()
             
             search_filter = f"(sAMAccountName={username})"
-            conn.search(
+            await conn.search(
                 'DC=central,DC=st-ing,DC=com',
                 search_filter,
                 attributes=['distinguishedName']
@@ -823,9 +1067,9 @@ class LDAPService:
             
             user_dn = conn.entries[0].distinguishedName.value
             
-            conn.extend.microsoft.modify_password(user_dn, new_password)
+            await self._set_password(user_dn, new_password)
             
-            conn.modify(
+            await conn.modify(
                 user_dn,
                 {'pwdLastSet': [(MODIFY_REPLACE, ['-1'])]} 
             )
@@ -842,41 +1086,37 @@ class LDAPService:
             ldap_logger.error(f"Исключение при смене пароля через LDAP: {e}")
             return {"success": False, "stderr": str(e)}
     
+    async def iter_users_from_ad(self, page_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Постраничная выгрузка пользователей из AD: по странице строк (колонки
+        AD_EXPORT_COLUMNS) за раз, без служебных учетных записей. Строки собираются
+        из атрибутов ответа, без объектов Entry
+        """
+        conn = await self._get_connection()
+        pages = conn.paged_search(
+            'DC=central,DC=st-ing,DC=com',
+            AD_EXPORT_FILTER,
+            attributes=AD_EXPORT_COLUMNS,
+            page_size=page_size or settings.ldap_page_size,
+        )
+        async with aclosing(pages):
+            async for page in pages:
+                rows = []
+                for attributes in page:
+                    display_name = _export_value(attributes.get('displayName'))
+                    if display_name and not any(system in display_name for system in AD_EXPORT_SYSTEM_ACCOUNTS):
+                        rows.append({column: _export_value(attributes.get(column)) for column in AD_EXPORT_COLUMNS})
+                if rows:
+                    yield rows
+    
     async def export_users_from_ad(self) -> Dict[str, Any]:
         """Экспорт всех пользователей из AD через LDAP (точно как в PowerShell)"""
         try:
             ldap_logger.info("Экспорт пользователей из AD через LDAP")
             
-            conn = await self._get_connection()
-            
-            conn.search(
-                'DC=central,DC=st-ing,DC=com',
-                '(&(objectClass=user)(objectCategory=person)(!(userAccountControl:1.2.840.113556.1.4.803:=2)))',
-                attributes=['sAMAccountName', 'displayName', 'mail', 'department', 'company', 'pager', 'givenName', 'physicalDeliveryOfficeName', 'telephoneNumber', 'description', 'lastLogon', 'pwdLastSet', 'whenCreated', 'whenChanged', 'userAccountControl'],
-                search_scope=SUBTREE
-            )
-            
             users = []
-            for entry in conn.entries:
-                display_name = entry.displayName.value if hasattr(entry, 'displayName') else ''
-                if display_name and not any(system in display_name for system in ['Служебная учетная запись', 'Microsoft', 'E4E', 'SystemMailbox', 'HealthMailbox', 'wms', 'WMS']):
-                    users.append({
-                        'displayName': display_name,
-                        'mail': entry.mail.value if hasattr(entry, 'mail') else '',
-                        'givenName': entry.givenName.value if hasattr(entry, 'givenName') else '',
-                        'physicalDeliveryOfficeName': entry.physicalDeliveryOfficeName.value if hasattr(entry, 'physicalDeliveryOfficeName') else '',
-                        'department': entry.department.value if hasattr(entry, 'department') else '',
-                        'description': entry.description.value if hasattr(entry, 'description') else '',
-                        'pager': entry.pager.value if hasattr(entry, 'pager') else '',
-                        'sAMAccountName': entry.sAMAccountName.value if hasattr(entry, 'sAMAccountName') else '',
-                        'company': entry.company.value if hasattr(entry, 'company') else '',
-                        'telephoneNumber': entry.telephoneNumber.value if hasattr(entry, 'telephoneNumber') else '',
-                        'lastLogon': entry.lastLogon.value if hasattr(entry, 'lastLogon') else '',
-                        'pwdLastSet': entry.pwdLastSet.value if hasattr(entry, 'pwdLastSet') else '',
-                        'whenCreated': entry.whenCreated.value if hasattr(entry, 'whenCreated') else '',
-                        'whenChanged': entry.whenChanged.value if hasattr(entry, 'whenChanged') else '',
-                        'userAccountControl': entry.userAccountControl.value if hasattr(entry, 'userAccountControl') else ''
-                    })
+            async for rows in self.iter_users_from_ad():
+                users.extend(rows)
             
             ldap_logger.info(f"Экспортировано {len(users)} пользователей через LDAP")
             return {
@@ -890,6 +1130,54 @@ class LDAPService:
             ldap_logger.error(f"Исключение при экспорте через LDAP: {e}")
             return {"success": False, "stderr": str(e)}
     
+    async def read_directory_state(self) -> Tuple[str, int]:
+        """dsServiceName контроллера домена и его highestCommittedUSN из rootDSE"""
+        conn = await self._get_connection()
+        await conn.search('', '(objectClass=*)', search_scope=BASE, attributes=['dsServiceName', 'highestCommittedUSN'])
+        entries = [item['attributes'] for item in conn.response or [] if item.get('type') == 'searchResEntry']
+        if not entries:
+            raise Exception(f"Не удалось прочитать rootDSE: {conn.result}")
+        server = entries[0].get('dsServiceName')
+        usn = entries[0].get('highestCommittedUSN')
+        server = server[0] if isinstance(server, list) else server
+        usn = usn[0] if isinstance(usn, list) else usn
+        return str(server or self.ad_server), int(usn)
+
+    async def iter_directory_objects(self, since_usn: int, synced_at: datetime) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Пользователи, группы и OU с uSNChanged >= since_usn (0 - все), по странице
+        строк ad_objects за раз
+        """
+        search_filter = AD_MIRROR_FILTER if since_usn <= 0 else f'(&{AD_MIRROR_FILTER}(uSNChanged>={since_usn}))'
+        conn = await self._get_connection()
+        pages = conn.paged_search(
+            'DC=central,DC=st-ing,DC=com',
+            search_filter,
+            attributes=AD_MIRROR_ATTRIBUTES,
+            page_size=settings.ldap_page_size,
+        )
+        async with aclosing(pages):
+            async for page in pages:
+                rows = [row for row in (object_row(attributes, synced_at) for attributes in page) if row]
+                if rows:
+                    yield rows
+
+    async def iter_deleted_objects(self, since_usn: int) -> AsyncIterator[List[str]]:
+        """objectGUID объектов, удаленных в AD с uSNChanged >= since_usn (tombstone с control Show Deleted)"""
+        conn = await self._get_connection()
+        pages = conn.paged_search(
+            'DC=central,DC=st-ing,DC=com',
+            f'(&(isDeleted=TRUE)(uSNChanged>={since_usn}))',
+            attributes=['objectGUID'],
+            page_size=settings.ldap_page_size,
+            controls=[(SHOW_DELETED_OID, True, None)],
+        )
+        async with aclosing(pages):
+            async for page in pages:
+                guids = [guid for guid in (object_guid(attributes.get('objectGUID')) for attributes in page) if guid]
+                if guids:
+                    yield guids
+
     async def change_phone_number(self, pager: str, new_phone: str) -> Dict[str, Any]:
         """Смена номера телефона пользователя через LDAP (точно как в PowerShell)"""
         try:
@@ -899,7 +1187,7 @@ class LDAPService:
             
             normalized_pager = self._normalize_pager(pager)
             search_filter = f"(pager={normalized_pager})"
-            conn.search(
+            await conn.search(
                 'DC=central,DC=st-ing,DC=com',
                 search_filter,
                 attributes=['sAMAccountName']
@@ -911,7 +1199,7 @@ class LDAPService:
             user = conn.entries[0]
             sam_account_name = user.sAMAccountName.value
             
-            conn.modify(
+            await conn.modify(
                 user.entry_dn,
                 {'telephoneNumber': [(MODIFY_REPLACE, [new_phone])]}
             )
@@ -935,35 +1223,16 @@ class LDAPService:
             
             conn = await self._get_connection()
             
-            normalized_manager_id = self._normalize_pager(manager_id)
-            manager_filter = f"(pager={normalized_manager_id})"
-            conn.search(
-                'DC=central,DC=st-ing,DC=com',
-                manager_filter,
-                attributes=['sAMAccountName', 'distinguishedName']
-            )
-            
-            if not conn.entries:
-                return {"success": False, "stderr": f"Менеджер с pager {normalized_manager_id} не найден"}
-            
-            manager = conn.entries[0]
-            manager_dn = manager.distinguishedName.value
-            
-            normalized_employee_id = self._normalize_pager(employee_id)
-            employee_filter = f"(pager={normalized_employee_id})"
-            conn.search(
-                'DC=central,DC=st-ing,DC=com',
-                employee_filter,
-                attributes=['sAMAccountName']
-            )
+            manager_dn = await self._find_dn_by_pager(conn, manager_id)
+            if not manager_dn:
+                return {"success": False, "stderr": f"Менеджер с pager {self._normalize_pager(manager_id)} не найден"}
             
-            if not conn.entries:
-                return {"success": False, "stderr": f"Сотрудник с pager {normalized_employee_id} не найден"}
-            
-            employee = conn.entries[0]
+            employee_dn = await self._find_dn_by_pager(conn, employee_id)
+            if not employee_dn:
+                return {"success": False, "stderr": f"Сотрудник с pager {self._normalize_pager(employee_id)} не найден"}
 
-            conn.modify(
-                employee.entry_dn,
+            await conn.modify(
+                employee_dn,
                 {'manager': [(MODIFY_REPLACE, [manager_dn])]}
             )
             
@@ -971,6 +1240,8 @@ class LDAPService:
                 ldap_logger.info(f"Менеджер {manager_id} назначен для сотрудника {employee_id} через LDAP")
                 return {"success": True, "stdout": f"Manager assigned successfully"}
             else:
+                self._forget_dn(employee_dn)
+                self._forget_dn(manager_dn)
                 error_msg = f"Ошибка назначения менеджера: {conn.result}"
                 ldap_logger.error(error_msg)
                 return {"success": False, "stderr": error_msg}
@@ -990,7 +1261,7 @@ class LDAPService:
             
             normalized_unique_id = self._normalize_pager(unique_id)
             search_filter = f"(pager={normalized_unique_id})"
-            conn.search(
+            await conn.search(
                 'DC=central,DC=st-ing,DC=com',
                 search_filter,
                 attributes=['sAMAccountName', 'memberOf', 'distinguishedName']
@@ -1019,7 +1290,7 @@ class LDAPService:
             if not current_dn and sam_account_name:
                 try:
                     ldap_logger.info(f"Фоллбэк-поиск DN по sAMAccountName={sam_account_name}")
-                    conn.search(
+                    await conn.search(
                         search_base,
                         f'(&(objectClass=user)(objectCategory=person)(sAMAccountName={sam_account_name}))',
                         search_scope=SUBTREE,
@@ -1040,7 +1311,7 @@ class LDAPService:
                 ]
                 for af in alt_filters:
                     try:
-                        conn.search(search_base, af, search_scope=SUBTREE, attributes=['distinguishedName'])
+                        await conn.search(search_base, af, search_scope=SUBTREE, attributes=['distinguishedName'])
                         ldap_logger.info(f"Пробный поиск {af} → найдено: {len(conn.entries)}")
                     except Exception as e:
                         ldap_logger.warning(f"Ошибка пробного поиска {af}: {e}")
@@ -1049,7 +1320,7 @@ class LDAPService:
             if current_dn and hasattr(user, 'memberOf') and user.memberOf:
                 for group_dn in user.memberOf.values:
                     try:
-                        conn.extend.microsoft.remove_members_from_groups(
+                        await conn.extend.microsoft.remove_members_from_groups(
                             current_dn,
                             group_dn
                         )
@@ -1068,7 +1339,7 @@ class LDAPService:
             # Отключаем учетную запись по текущему DN (идемпотентно) и фиксируем pager
             try:
                 # ACCOUNTDISABLE
-                conn.modify(current_dn, {'userAccountControl': [(MODIFY_REPLACE, ['2'])]})
+                await conn.modify(current_dn, {'userAccountControl': [(MODIFY_REPLACE, ['2'])]})
                 if conn.result['result'] == 0:
                     ldap_logger.info("Учетная запись отключена (ACCOUNTDISABLE)")
                     disabled_ok = True
@@ -1080,7 +1351,7 @@ class LDAPService:
             # Перезаписываем pager на актуальный unique_id (как в PowerShell) - убираем решетку
             try:
                 normalized_unique_id = self._normalize_pager(unique_id)
-                conn.modify(current_dn, {'pager': [(MODIFY_REPLACE, [normalized_unique_id])]})
+                await conn.modify(current_dn, {'pager': [(MODIFY_REPLACE, [normalized_unique_id])]})
                 if conn.result.get('result') == 0:
                     ldap_logger.info("Атрибут pager синхронизирован с unique_id")
                 else:
@@ -1090,9 +1361,11 @@ class LDAPService:
 
             # Перемещаем в OU "Уволенные сотрудники" с сохранением RDN
             target_ou = "OU=Уволенные сотрудники,DC=central,DC=st-ing,DC=com"
+            # pager и DN пользователя меняются: кэшированные записи по старому DN удаляем
+            self._forget_dn(current_dn)
             try:
                 rdn = current_dn.split(",", 1)[0]  # например, CN=ФИО
-                conn.modify_dn(current_dn, rdn, new_superior=target_ou)
+                await conn.modify_dn(current_dn, rdn, new_superior=target_ou)
                 if conn.result.get('result') == 0:
                     current_dn = f"{rdn},{target_ou}"
                     moved_ok = True
@@ -1118,6 +1391,126 @@ class LDAPService:
             ldap_logger.error(f"Исключение при полной блокировке через LDAP: {e}")
             return {"success": False, "stderr": str(e)}
     
+    async def block_users_bulk(self, unique_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Полная блокировка пачки уволенных, как block_user_complete для каждого. Пользователи
+        находятся поисками с OR-фильтром на ldap_filter_chunk_size pager; удаление из групп -
+        отдельный modify каждой группы, параллельно на подключениях пула (не больше
+        ldap_pool_size операций сразу); отключение и pager - одним modify, затем перемещение
+        в ldap_dismissed_ou. Возвращает по элементу на pager с итогом каждого шага
+        """
+        started = time.perf_counter()
+        pagers = list(dict.fromkeys(filter(None, (self._normalize_pager(unique_id) for unique_id in unique_ids))))
+        found: Dict[str, Dict[str, Any]] = {}
+        chunk_size = max(1, settings.ldap_filter_chunk_size)
+        searches = 0
+        conn = await self._get_connection()
+        for start in range(0, len(pagers), chunk_size):
+            chunk = pagers[start:start + chunk_size]
+            search_filter = '(|' + ''.join(f'(pager={escape_filter_chars(pager)})' for pager in chunk) + ')'
+            pages = conn.paged_search(
+                'DC=central,DC=st-ing,DC=com',
+                search_filter,
+                ['sAMAccountName', 'memberOf', 'distinguishedName', 'pager', 'userAccountControl'],
+                page_size=settings.ldap_page_size,
+            )
+            async with aclosing(pages):
+                async for rows in pages:
+                    for attributes in rows:
+                        pager = _single(attributes.get('pager'))
+                        if pager and _single(attributes.get('distinguishedName')):
+                            # Как при поиске по одному pager: из нескольких записей берется первая
+                            found.setdefault(self._normalize_pager(pager), attributes)
+            searches += 1
+        resolve_ms = (time.perf_counter() - started) * 1000
+        
+        semaphore = asyncio.Semaphore(max(1, settings.ldap_pool_size))
+        
+        async def remove_from_group(user_dn: str, group_dn: str) -> Optional[str]:
+            """Удаление из одной группы; ошибка или None"""
+            async with semaphore:
+                # У каждой параллельной операции свой объект: result не перезаписывается соседями
+                group_conn = await self._get_connection()
+                try:
+                    await group_conn.modify(group_dn, {'member': [(MODIFY_DELETE, [user_dn])]})
+                except Exception as e:
+                    return str(e)
+            # noSuchAttribute: пользователь уже удален из группы
+            if group_conn.result.get('result') in (0, 16):
+                return None
+            return group_conn.result.get('description') or str(group_conn.result)
+        
+        async def block(pager: str) -> Dict[str, Any]:
+            entry = found.get(pager)
+            if entry is None:
+                return {"unique_id": pager, "outcome": "not_found", "error": f"Пользователь с pager {pager} не найден"}
+            user_dn = _single(entry['distinguishedName'])
+            sam_account_name = _single(entry.get('sAMAccountName'))
+            groups = entry.get('memberOf') or []
+            if isinstance(groups, str):
+                groups = [groups]
+            
+            errors = await asyncio.gather(*(remove_from_group(user_dn, group_dn) for group_dn in groups))
+            groups_failed = [{"group": group_dn, "error": error} for group_dn, error in zip(groups, errors) if error]
+            for failure in groups_failed:
+                ldap_logger.warning(f"Ошибка удаления {sam_account_name} из группы {failure['group']}: {failure['error']}")
+            
+            result = {
+                "unique_id": pager,
+                "sam_account_name": sam_account_name,
+                "groups_removed": len(groups) - len(groups_failed),
+                "groups_failed": groups_failed,
+                "disabled": False,
+                "moved": False,
+            }
+            control = _single(entry.get('userAccountControl'))
+            # Остальные флаги учетной записи сохраняются
+            account_control = int(control) | ACCOUNTDISABLE if control is not None else ACCOUNTDISABLE
+            async with semaphore:
+                step_conn = await self._get_connection()
+                try:
+                    await step_conn.modify(user_dn, {
+                        'userAccountControl': [(MODIFY_REPLACE, [str(account_control)])],
+                        'pager': [(MODIFY_REPLACE, [pager])],
+                    })
+                    result["disabled"] = step_conn.result.get('result') == 0
+                    if not result["disabled"]:
+                        ldap_logger.warning(f"Не удалось отключить {sam_account_name}: {step_conn.result}")
+                except Exception as e:
+                    ldap_logger.warning(f"Ошибка отключения {sam_account_name}: {e}")
+                
+                # pager и DN пользователя меняются: кэшированные записи по старому DN удаляем
+                self._forget_dn(user_dn)
+                rdn, parent = user_dn.split(",", 1)
+                if parent.lower() == settings.ldap_dismissed_ou.lower():
+                    # Повторная блокировка: пользователь уже перемещен
+                    result["moved"] = True
+                else:
+                    try:
+                        await step_conn.modify_dn(user_dn, rdn, new_superior=settings.ldap_dismissed_ou)
+                        result["moved"] = step_conn.result.get('result') == 0
+                        if not result["moved"]:
+                            ldap_logger.warning(f"Не удалось переместить {sam_account_name}: {step_conn.result}")
+                    except Exception as e:
+                        ldap_logger.warning(f"Ошибка перемещения {sam_account_name} в OU: {e}")
+            
+            if not result["disabled"]:
+                # Как в block_user_complete: без отключения блокировка не выполнена
+                result["outcome"] = "failed"
+                result["error"] = "Учетная запись не отключена"
+            elif result["moved"] and not groups_failed:
+                result["outcome"] = "blocked"
+            else:
+                result["outcome"] = "partial"
+            return result
+        
+        results = await asyncio.gather(*(block(pager) for pager in pagers))
+        ldap_logger.info(
+            f"Массовая блокировка: {len(pagers)} pager, найдено {len(found)} за {searches} поисков "
+            f"({resolve_ms:.1f} мс), всего {(time.perf_counter() - started) * 1000:.1f} мс"
+        )
+        return list(results)
+    
     async def create_new_object(self, object_name: str) -> Dict[str, Any]:
         """Создание нового объекта в AD (точно как в CreateNewObject.ps1)"""
         try:
@@ -1187,7 +1580,7 @@ class LDAPService:
             ou_name = f"права {object_name}"
             ou_path = f"OU={ou_name},OU=права доступа к папкам строительных объектов,OU=Группы прав доступа к папкам,DC=central,DC=st-ing,DC=com"
             
-            conn.search(
+            await conn.search(
                 'DC=central,DC=st-ing,DC=com',
                 f'(name="{ou_name}")',
                 attributes=['distinguishedName']
@@ -1199,7 +1592,7 @@ class LDAPService:
                     'name': ou_name
                 }
                 
-                success = conn.add(ou_path, attributes=attributes)
+                success = await conn.add(ou_path, attributes=attributes)
                 
                 if success:
                     ldap_logger.info(f"OU '{ou_name}' создана в AD")
@@ -1276,7 +1669,7 @@ class LDAPService:
         try:
             conn = await self._get_connection()
             
-            conn.search(
+            await conn.search(
                 'DC=central,DC=st-ing,DC=com',
                 f'(name="{group_name}")',
                 attributes=['distinguishedName']
@@ -1293,7 +1686,7 @@ class LDAPService:
                     'groupCategory': '1'  
                 }
                 
-                success = conn.add(group_dn, attributes=attributes)
+                success = await conn.add(group_dn, attributes=attributes)
                 
                 if success:
                     ldap_logger.info(f"Группа '{group_name}' создана")
@@ -1381,7 +1774,7 @@ class LDAPService:
             
             normalized_pager = self._normalize_pager(pager)
             search_filter = f"(pager={normalized_pager})"
-            conn.search(
+            await conn.search(
                 'DC=central,DC=st-ing,DC=com',
                 search_filter,
                 attributes=['sAMAccountName', 'extensionAttribute1', 'extensionAttribute2']
@@ -1401,7 +1794,7 @@ class LDAPService:
             else:
                 return {"success": False, "stderr": f"Неизвестный тип теста: {test_type}"}
             
-            conn.modify(
+            await conn.modify(
                 user.entry_dn,
                 {attribute_to_update: [(MODIFY_REPLACE, ['true'])]}  # Устанавливаем true как в PowerShell
             )
@@ -1426,8 +1819,13 @@ class LDAPService:
     async def search_users(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Поиск пользователей в AD. Возвращает список сокращённых карточек.
 
-        Поля: cn, sAMAccountName, userPrincipalName, mail, pager, distinguishedName
+        Поля: cn, sAMAccountName, userPrincipalName, mail, pager, distinguishedName.
+        Пока зеркало AD актуально, поиск выполняется по нему
         """
+        mirrored = self.mirror.search_users(query, limit)
+        if mirrored is not None:
+            return mirrored
+        
         conn = await self._get_connection()
         safe_query = (query or "").strip()
         if safe_query:
@@ -1438,7 +1836,7 @@ class LDAPService:
         else:
             filter_expr = "(objectClass=user)"
 
-        conn.search(
+        await conn.search(
             'DC=central,DC=st-ing,DC=com',
             filter_expr,
             SUBTREE,
@@ -1471,16 +1869,21 @@ class LDAPService:
             
             # Находим пользователя по unique_id (pager) - убираем решетку для поиска
             normalized_pager = self._normalize_pager(user_data.get('unique_id', ''))
-            search_filter = f"(pager={normalized_pager})"
-            conn.search('DC=central,DC=st-ing,DC=com', search_filter, attributes=['sAMAccountName', 'distinguishedName'])
-            
-            if not conn.entries:
-                error_msg = f"Пользователь с pager {normalized_pager} не найден"
-                ldap_logger.error(f"❌ {error_msg}")
-                return {"success": False, "stderr": error_msg}
-            
-            user_dn = conn.entries[0].distinguishedName.value
-            sam_account_name = conn.entries[0].sAMAccountName.value
+            mirrored = self.mirror.find_user_by_pager(normalized_pager)
+            if mirrored and mirrored['sam_account_name']:
+                user_dn = mirrored['dn']
+                sam_account_name = mirrored['sam_account_name']
+            else:
+                search_filter = f"(pager={normalized_pager})"
+                await conn.search('DC=central,DC=st-ing,DC=com', search_filter, attributes=['sAMAccountName', 'distinguishedName'])
+                
+                if not conn.entries:
+                    error_msg = f"Пользователь с pager {normalized_pager} не найден"
+                    ldap_logger.error(f"❌ {error_msg}")
+                    return {"success": False, "stderr": error_msg}
+                
+                user_dn = conn.entries[0].distinguishedName.value
+                sam_account_name = conn.entries[0].sAMAccountName.value
             
             ldap_logger.info(f"Найден пользователь: {sam_account_name} -> {user_dn}")
             
@@ -1527,6 +1930,7 @@ class LDAPService:
                 return {
                     "success": True,
                     "sam_account_name": sam_account_name,
+                    "user_dn": user_dn,
                     "stdout": f"No attributes to update for {sam_account_name}"
                 }
             
@@ -1534,13 +1938,16 @@ class LDAPService:
             for attr_name in changes.keys():
                 ldap_logger.info(f"  {attr_name}: {changes[attr_name][0][1][0]}")
             
-            conn.modify(user_dn, changes)
+            await conn.modify(user_dn, changes)
+            # Атрибуты в зеркале устарели, а при ошибке мог устареть и DN из зеркала
+            self.mirror.forget_dn(user_dn)
             
             if conn.result['result'] == 0:
                 ldap_logger.info(f"✅ Пользователь {sam_account_name} успешно обновлен в AD")
                 return {
                     "success": True,
                     "sam_account_name": sam_account_name,
+                    "user_dn": user_dn,
                     "stdout": f"User {sam_account_name} updated successfully"
                 }
             else:
@@ -1551,3 +1958,20 @@ class LDAPService:
         except Exception as e:
             ldap_logger.error(f"❌ Исключение при обновлении пользователя в AD: {e}")
             return {"success": False, "stderr": str(e)}
+
+
+async def run_schema_cache_refresher(ldap_service: LDAPService) -> None:
+    """Фоновая задача: обновление снимка схемы AD, когда он становится старше TTL"""
+    cache = ldap_service.schema_cache
+    ldap_logger.info(f"Фоновое обновление схемы AD запущено: раз в {cache.ttl_seconds // 3600} ч")
+    while True:
+        age = cache.age_seconds
+        await asyncio.sleep(max(cache.ttl_seconds - age, 0) if age is not None else cache.ttl_seconds)
+        try:
+            await ldap_service.refresh_schema_cache()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Привязки продолжают работать со старым снимком
+            ldap_logger.error(f"Не удалось обновить снимок схемы AD: {e}")
+            await asyncio.sleep(SCHEMA_REFRESH_RETRY_SECONDS)
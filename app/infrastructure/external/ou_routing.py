@@ -0,0 +1,153 @@
+"""Правила выбора OU для новых пользователей и реестр строительных объектов из JSON-файла"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.core.logging.logger import ldap_logger
+
+# Ограничение длины DN индивидуальной OU строительного объекта
+MAX_OU_DN_LENGTH = 256
+# Запомненных пар (объект, отдел), после которых память результатов очищается
+MEMO_MAX_ENTRIES = 10000
+
+
+class OURoutingError(ValueError):
+    """Для объекта и отдела не нашлось подходящей OU"""
+
+
+class CompiledOURules:
+    """
+    Правила, подготовленные при загрузке: подстроки приведены к нижнему регистру,
+    реестр строительных объектов собран в одно регулярное выражение. Результаты
+    запоминаются по паре (объект, отдел): в очереди одобрения пары повторяются
+    """
+
+    def __init__(self, config: Dict[str, Any], loaded_at: float):
+        self.loaded_at = loaded_at
+        self.technical_ou: str = config["technical_ou"]
+        # (подстрока объекта, подстрока отдела или None, OU) в порядке проверки
+        self.rules: List[Tuple[str, Optional[str], str]] = []
+        for rule in config["rules"]:
+            department = rule.get("department")
+            self.rules.append((rule["object"].lower(), department.lower() if department else None, rule["ou"]))
+        self.object_keys = tuple(dict.fromkeys(key for key, _, _ in self.rules))
+        construction = config["construction_objects"]
+        self.construction_objects: List[str] = [name.lower() for name in construction["match"]]
+        self.construction_pattern = re.compile("|".join(map(re.escape, self.construction_objects))) if self.construction_objects else None
+        self.construction_ou: str = construction["ou"]
+        self.construction_fallback_ou: str = construction["fallback_ou"]
+        # Шаблон проверяется при загрузке, а не при первом одобрении
+        self.construction_ou.format(object_name="")
+        self._memo: Dict[Tuple[str, str], Union[str, OURoutingError]] = {}
+
+    def find_ou(self, obj_name: str, department: str) -> str:
+        obj_name = obj_name or ""
+        department = department or ""
+        key = (obj_name, department)
+        ou = self._memo.get(key)
+        if ou is None:
+            try:
+                ou = self._match(obj_name, department)
+            except OURoutingError as e:
+                # Пара без OU тоже запоминается: ошибка вместо DN
+                ou = e
+            if len(self._memo) >= MEMO_MAX_ENTRIES:
+                self._memo.clear()
+            self._memo[key] = ou
+        if isinstance(ou, OURoutingError):
+            raise OURoutingError(str(ou))
+        return ou
+
+    @property
+    def cached_pairs(self) -> int:
+        return len(self._memo)
+
+    def _match(self, obj_name: str, department: str) -> str:
+        obj_lower = obj_name.lower()
+        department_lower = department.lower()
+        present = {key for key in self.object_keys if key in obj_lower}
+        if present:
+            for object_key, department_key, ou in self.rules:
+                if object_key in present and (department_key is None or department_key in department_lower):
+                    return ou
+
+        if self.construction_pattern is not None and self.construction_pattern.search(obj_lower):
+            # Индивидуальная OU для каждого строительного объекта
+            individual_ou = self.construction_ou.format(object_name=obj_name)
+            if len(individual_ou) > MAX_OU_DN_LENGTH:
+                ldap_logger.warning(f"Индивидуальная OU слишком длинная ({len(individual_ou)} символов), используем общую OU")
+                return self.construction_fallback_ou
+            return individual_ou
+
+        raise OURoutingError(f"Не найдена подходящая организационная единица для объекта '{obj_name}' и отдела '{department}'")
+
+
+class OURouter:
+    """
+    Правила OU из файла path. Файл перечитывается, когда меняется время его
+    изменения, или по reload(); ошибка в новом файле оставляет прежние правила
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._rules: Optional[CompiledOURules] = None
+        self._mtime: Optional[float] = None
+        try:
+            self.reload()
+        except Exception:
+            # Приложение запускается; find_ou повторит загрузку и вернет ошибку
+            pass
+
+    def reload(self) -> CompiledOURules:
+        """Загрузка и компиляция правил; при ошибке - исключение, прежние правила остаются"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+                with open(self.path, encoding="utf-8") as f:
+                    rules = CompiledOURules(json.load(f), time.time())
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                ldap_logger.error(f"Не удалось загрузить правила OU из {self.path}: {self.last_error}")
+                raise
+            self._rules, self._mtime, self.last_error = rules, mtime, None
+            ldap_logger.info(
+                f"Правила OU загружены из {self.path}: {len(rules.rules)} правил, "
+                f"{len(rules.construction_objects)} строительных объектов"
+            )
+            return rules
+
+    @property
+    def rules(self) -> CompiledOURules:
+        """Актуальные правила: файл перечитывается, если он изменился после загрузки"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = self._mtime
+        if self._rules is None or mtime != self._mtime:
+            try:
+                return self.reload()
+            except Exception:
+                if self._rules is None:
+                    raise
+                # Не перечитывать поврежденный файл при каждом вызове
+                self._mtime = mtime
+        return self._rules
+
+    def find_ou(self, obj_name: str, department: str) -> str:
+        return self.rules.find_ou(obj_name, department)
+
+    def metrics(self) -> Dict[str, Any]:
+        rules = self._rules
+        return {
+            "path": self.path,
+            "rules": len(rules.rules) if rules else 0,
+            "construction_objects": len(rules.construction_objects) if rules else 0,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(rules.loaded_at)) if rules else None,
+            "cached_pairs": rules.cached_pairs if rules else 0,
+            "last_error": self.last_error,
+        }
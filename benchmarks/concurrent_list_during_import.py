@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: сколько запросов списка пользователей приложение обслуживает,
+пока идет пакетный импорт из 1C.
+
+Запускает приложение in-process (httpx + ASGITransport) на временной SQLite базе:
+один клиент отправляет пакеты в /api/onec/oneC/receive, остальные параллельно
+листают /api/users/pending. Если обращения к БД блокируют event loop,
+листающие клиенты простаивают на всё время импорта.
+
+Пример:
+    python benchmarks/concurrent_list_during_import.py --seed 5000 --batch 500 --batches 4 --readers 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_db_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.pop("DATABASE_ASYNC_URL", None)
+
+import logging  # noqa: E402
+
+import httpx  # noqa: E402
+
+from main import app  # noqa: E402
+from app.infrastructure.database.database import init_db, close_db  # noqa: E402
+
+
+def make_1c_user(n: int) -> dict:
+    return {
+        "unique": f"BENCH{n:07d}",
+        "firstname": f"Имя{n}",
+        "secondname": f"Фамилия{n}",
+        "thirdname": "Отчество",
+        "company": "СтройТехноИнженеринг",
+        "Department": "Технический департамент",
+        "Otdel": "Отдел ПТО",
+        "appointment": "Инженер",
+        "current_location_id": "Медовый",
+        "UploadDate": "2025-01-15T10:00:00",
+    }
+
+
+async def seed(client: httpx.AsyncClient, count: int, chunk: int = 1000):
+    for start in range(0, count, chunk):
+        payload = [make_1c_user(n) for n in range(start, min(start + chunk, count))]
+        response = await client.post("/api/onec/oneC/receive", json=payload)
+        response.raise_for_status()
+
+
+async def run_import(client: httpx.AsyncClient, offset: int, batch: int, batches: int) -> float:
+    started = time.perf_counter()
+    for b in range(batches):
+        first = offset + b * batch
+        payload = [make_1c_user(n) for n in range(first, first + batch)]
+        response = await client.post("/api/onec/oneC/receive", json=payload)
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def reader(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    cursor = None
+    while not stop.is_set():
+        params = {"limit": 20}
+        if cursor:
+            params["cursor"] = cursor
+        started = time.perf_counter()
+        response = await client.get("/api/users/pending", params=params)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        cursor = response.json()["pagination"]["next_cursor"]
+
+
+async def main(args):
+    logging.disable(logging.CRITICAL)
+    await init_db()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"Наполнение базы: {args.seed} записей...")
+        await seed(client, args.seed)
+
+        stop = asyncio.Event()
+        latencies: list = []
+        readers = [asyncio.create_task(reader(client, stop, latencies)) for _ in range(args.readers)]
+        import_time = await run_import(client, args.seed, args.batch, args.batches)
+        stop.set()
+        await asyncio.gather(*readers)
+
+    await close_db()
+
+    total = len(latencies)
+    print(f"Импорт: {args.batches} x {args.batch} записей за {import_time:.2f}с")
+    print(f"Параллельных читателей: {args.readers}")
+    print(f"Запросов списка обслужено во время импорта: {total} ({total / import_time:.1f} req/s)")
+    if latencies:
+        ordered = sorted(latencies)
+        p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+        print(f"Латентность списка: p50={statistics.median(ordered) * 1000:.1f}мс "
+              f"p95={p95 * 1000:.1f}мс max={ordered[-1] * 1000:.1f}мс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=5000, help="Записей в базе до начала замера")
+    parser.add_argument("--batch", type=int, default=500, help="Размер одного пакета 1C")
+    parser.add_argument("--batches", type=int, default=4, help="Количество пакетов 1C")
+    parser.add_argument("--readers", type=int, default=20, help="Параллельных клиентов списка")
+    asyncio.run(main(parser.parse_args()))
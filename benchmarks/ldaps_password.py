@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: установка пароля по LDAPS при одобрении пользователя.
+
+Сравнивает два способа выполнить modify_password:
+  на операцию - как раньше в create_user_in_ad: новый Server(use_ssl=True,
+                get_info=ALL) и Connection на каждый вызов (TCP + TLS,
+                привязка, чтение rootDSE и схемы, операция, unbind)
+  пул LDAPS   - LDAPService._set_password на долгоживущем подключении из
+                LDAPService.secure_pool
+
+По умолчанию запускается локальный LDAPS-сервер (--simulate): он принимает
+привязку и modify, а на запросы rootDSE и схемы отдает данные AD 2012 R2 из
+ldap3 (~320 КБ схемы, как при get_info=ALL). --rtt добавляет задержку сети к
+каждому ответу и два RTT к установке соединения (TCP + TLS).
+
+Против настоящего AD (параметры из .env) укажите тестовую учетную запись:
+    python benchmarks/ldaps_password.py --user-dn "CN=bench,OU=Test,DC=central,DC=st-ing,DC=com" \\
+        --password "Bench-Passw0rd!" --iterations 20
+Пароль этой учетной записи будет установлен 2 * iterations раз.
+
+Пример:
+    python benchmarks/ldaps_password.py --rtt 2 --iterations 50
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging  # noqa: E402
+
+from ldap3 import ALL, NONE, SIMPLE, Connection, Server  # noqa: E402
+from ldap3.protocol import rfc4511  # noqa: E402
+from ldap3.protocol.schemas.ad2012R2 import ad_2012_r2_dsa_info, ad_2012_r2_schema  # noqa: E402
+from ldap3.strategy.base import BaseStrategy  # noqa: E402
+from pyasn1.codec.ber import decoder, encoder  # noqa: E402
+
+from app.core.config.settings import settings  # noqa: E402
+from app.infrastructure.external.ldap_service import LDAPService  # noqa: E402
+
+
+class SimulatedLDAPS:
+    """Минимальный LDAPS-сервер: bind, поиск rootDSE и схемы, modify, unbind"""
+
+    def __init__(self, rtt_ms: float):
+        self.rtt = rtt_ms / 1000
+        dsa_info = json.loads(ad_2012_r2_dsa_info)["raw"]
+        schema = json.loads(ad_2012_r2_schema)
+        self.entries = {"": dsa_info, schema["schema_entry"].lower(): schema["raw"]}
+        self.schema_dn = schema["schema_entry"]
+        self._encoded = {}
+        self._certificate_dir = tempfile.mkdtemp(prefix="bench_ldaps_")
+        self._context = self._tls_context()
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self._listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _tls_context(self) -> ssl.SSLContext:
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.x509.oid import NameOID
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (x509.CertificateBuilder().subject_name(name).issuer_name(name)
+                       .public_key(key.public_key()).serial_number(x509.random_serial_number())
+                       .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+                       .sign(key, hashes.SHA256()))
+        cert_path = os.path.join(self._certificate_dir, "cert.pem")
+        key_path = os.path.join(self._certificate_dir, "key.pem")
+        with open(cert_path, "wb") as f:
+            f.write(certificate.public_bytes(serialization.Encoding.PEM))
+        with open(key_path, "wb") as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                      serialization.NoEncryption()))
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        return context
+
+    def _accept(self):
+        while True:
+            client, _ = self._listener.accept()
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client: socket.socket):
+        # Установка соединения: TCP и TLS рукопожатия
+        time.sleep(self.rtt * 2)
+        try:
+            connection = self._context.wrap_socket(client, server_side=True)
+        except (ssl.SSLError, OSError):
+            client.close()
+            return
+        buffer = b""
+        with connection:
+            while True:
+                data = connection.recv(65536)
+                if not data:
+                    return
+                buffer += data
+                while True:
+                    size = BaseStrategy.compute_ldap_message_size(buffer)
+                    if size == -1 or len(buffer) < size:
+                        break
+                    message, _ = decoder.decode(buffer[:size], asn1Spec=rfc4511.LDAPMessage())
+                    buffer = buffer[size:]
+                    reply = self._reply(message)
+                    if reply is None:
+                        return
+                    time.sleep(self.rtt)
+                    connection.sendall(reply)
+
+    def _reply(self, message):
+        message_id = int(message["messageID"])
+        operation = message["protocolOp"].getName()
+        if operation == "bindRequest":
+            return self._result(message_id, "bindResponse", rfc4511.BindResponse())
+        if operation == "searchRequest":
+            base = str(message["protocolOp"]["searchRequest"]["baseObject"]).lower()
+            entry = self._entry(message_id, base) if base in self.entries else b""
+            return entry + self._result(message_id, "searchResDone", rfc4511.SearchResultDone())
+        if operation == "modifyRequest":
+            return self._result(message_id, "modifyResponse", rfc4511.ModifyResponse())
+        return None
+
+    def _result(self, message_id: int, name: str, result) -> bytes:
+        result["resultCode"] = 0
+        result["matchedDN"] = ""
+        result["diagnosticMessage"] = ""
+        return self._message(message_id, name, result)
+
+    def _entry(self, message_id: int, base: str) -> bytes:
+        # Кодирование схемы занимает заметное время: ответ кэшируется по messageID
+        key = (message_id, base)
+        if key not in self._encoded:
+            entry = rfc4511.SearchResultEntry()
+            entry["object"] = self.schema_dn if base else ""
+            attributes = rfc4511.PartialAttributeList()
+            for position, (attribute, values) in enumerate(self.entries[base].items()):
+                partial = rfc4511.PartialAttribute()
+                partial["type"] = attribute
+                vals = rfc4511.Vals()
+                for index, value in enumerate(values):
+                    vals.setComponentByPosition(index, str(value).encode("utf-8"))
+                partial["vals"] = vals
+                attributes.setComponentByPosition(position, partial)
+            entry["attributes"] = attributes
+            self._encoded[key] = self._message(message_id, "searchResEntry", entry)
+        return self._encoded[key]
+
+    @staticmethod
+    def _message(message_id: int, name: str, operation) -> bytes:
+        message = rfc4511.LDAPMessage()
+        message["messageID"] = message_id
+        protocol_op = rfc4511.ProtocolOp()
+        protocol_op.setComponentByName(name, operation)
+        message["protocolOp"] = protocol_op
+        return encoder.encode(message)
+
+
+def per_operation_password(host: str, port: int, user: str, password: str, user_dn: str, new_password: str) -> None:
+    """Прежнее поведение: отдельное LDAPS-подключение на каждую установку пароля"""
+    secure_server = Server(host, get_info=ALL, connect_timeout=settings.ldap_timeout, use_ssl=True, port=port)
+    secure_conn = Connection(secure_server, user=user, password=password, authentication=SIMPLE,
+                             auto_bind=True, receive_timeout=settings.ldap_timeout)
+    try:
+        secure_conn.extend.microsoft.modify_password(user_dn, new_password)
+    finally:
+        secure_conn.unbind()
+
+
+def summary(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return f"{statistics.median(ordered) * 1000:>8.2f} {p95 * 1000:>8.2f} {statistics.mean(ordered) * 1000:>8.2f}"
+
+
+async def main(args):
+    logging.disable(logging.CRITICAL)
+    service = LDAPService()
+    if args.user_dn:
+        host, port, user_dn, new_password = settings.ad_server, 636, args.user_dn, args.password
+        target = f"{host}:636"
+    else:
+        simulated = SimulatedLDAPS(args.rtt)
+        host, port = "127.0.0.1", simulated.port
+        user_dn, new_password = "CN=bench,OU=Test,DC=AD2012,DC=LAB", "Bench-Passw0rd!"
+        service.secure_server = Server(host, get_info=NONE, connect_timeout=settings.ldap_timeout, use_ssl=True, port=port)
+        target = f"локальный LDAPS, RTT {args.rtt} мс"
+
+    loop = asyncio.get_running_loop()
+    per_operation = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        await loop.run_in_executor(None, per_operation_password, host, port, service._admin_user(),
+                                   service.admin_password, user_dn, new_password)
+        per_operation.append(time.perf_counter() - started)
+
+    # Первое обращение к пулу создает подключение: замер отдельно
+    started = time.perf_counter()
+    await service._set_password(user_dn, new_password)
+    first = time.perf_counter() - started
+    pooled = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        await service._set_password(user_dn, new_password)
+        pooled.append(time.perf_counter() - started)
+    service.close()
+
+    print(f"Установка пароля ({target}, {args.iterations} раз), мс:")
+    print(f"  {'вариант':<14} {'p50':>8} {'p95':>8} {'среднее':>8}")
+    print(f"  {'на операцию':<14} {summary(per_operation)}")
+    print(f"  {'пул LDAPS':<14} {summary(pooled)}   (первый вызов с подключением: {first * 1000:.2f})")
+    saving = statistics.median(per_operation) - statistics.median(pooled)
+    print(f"\nЭкономия на одобрение (p50): {saving * 1000:.2f} мс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50, help="Установок пароля на каждый вариант")
+    parser.add_argument("--rtt", type=float, default=1.0, help="Задержка сети локального сервера, мс")
+    parser.add_argument("--user-dn", help="DN тестовой учетной записи в настоящем AD (вместо локального сервера)")
+    parser.add_argument("--password", default="Bench-Passw0rd!", help="Пароль, который будет установлен тестовой учетной записи")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк: стоимость одной страницы списка пользователей.
+
+Сравнивает два пути на временной SQLite базе:
+  ORM + Pydantic     - UserModel -> User -> UserResponse -> валидация response_model -> JSON
+  проекция + orjson  - только колонки ответа как строки Core -> orjson
+
+Для каждого размера страницы листает список pending целиком и выводит медиану
+времени на страницу и пиковый объем памяти, выделенной за страницу (tracemalloc).
+
+Пример:
+    python benchmarks/list_page_serialization.py --rows 20000 --limits 20,100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_page_")
+_db_path = os.path.join(_tmp_dir, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.pop("DATABASE_ASYNC_URL", None)
+
+import logging  # noqa: E402
+
+from app.api.routes.users import user_to_response, users_page_response  # noqa: E402
+from app.api.schemas.user_schemas import CursorPaginatedUsersResponse, CursorPaginationInfo  # noqa: E402
+from app.infrastructure.database.database import init_db, close_db, AsyncSessionLocal  # noqa: E402
+from app.infrastructure.database.user_repository_impl import SQLAlchemyUserRepository  # noqa: E402
+
+
+def seed(rows: int):
+    now = datetime.now().isoformat(sep=" ")
+    connection = sqlite3.connect(_db_path)
+    try:
+        connection.executemany(
+            "INSERT INTO users (unique_id, firstname, secondname, thirdname, company, department, otdel,"
+            " appointment, mobile_phone, current_location_id, status, upload_date, created_at, updated_at, is_update)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'PENDING', ?, ?, ?, 0)",
+            [
+                (f"BENCH{n:07d}", f"Имя{n}", f"Фамилия{n}", "Отчество", "СтройТехноИнженеринг",
+                 "Технический департамент", "Отдел ПТО", "Инженер", f"+7900{n:07d}", "Медовый", now, now, now)
+                for n in range(rows)
+            ],
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+async def orm_page(repository: SQLAlchemyUserRepository, cursor, limit: int):
+    result = await repository.get_pending_users_cursor(cursor, limit)
+    users_response = [user_to_response(user) for user in result['users']]
+    response = CursorPaginatedUsersResponse(
+        users=users_response,
+        pagination=CursorPaginationInfo(
+            next_cursor=result['next_cursor'],
+            has_more=result['has_more'],
+            total_loaded=len(users_response),
+            total_count=result.get('total_count')
+        )
+    )
+    # Как FastAPI с response_model: повторная валидация и сериализация в JSON
+    validated = CursorPaginatedUsersResponse.model_validate(response.model_dump())
+    body = json.dumps(validated.model_dump(mode="json"), ensure_ascii=False).encode()
+    return result['next_cursor'], body
+
+
+async def projection_page(repository: SQLAlchemyUserRepository, cursor, limit: int):
+    result = await repository.get_pending_users_cursor(cursor, limit, as_rows=True)
+    return result['next_cursor'], users_page_response(result, 0).body
+
+
+async def walk(page_func, limit: int, trace: bool) -> list:
+    """Проход по всем страницам; время или пик памяти на страницу"""
+    samples = []
+    async with AsyncSessionLocal() as db:
+        repository = SQLAlchemyUserRepository(db)
+        cursor = None
+        while True:
+            if trace:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                cursor, _ = await page_func(repository, cursor, limit)
+                samples.append(tracemalloc.get_traced_memory()[1] - before)
+            else:
+                started = time.perf_counter()
+                cursor, _ = await page_func(repository, cursor, limit)
+                samples.append(time.perf_counter() - started)
+            db.expunge_all()
+            if not cursor:
+                return samples
+
+
+async def main(args):
+    logging.disable(logging.CRITICAL)
+    await init_db()
+    seed(args.rows)
+    print(f"Записей pending: {args.rows}")
+    print(f"{'путь':<20} {'limit':>6} {'мс/стр (p50)':>13} {'пик КБ/стр':>11}")
+    for limit in (int(value) for value in args.limits.split(",")):
+        for title, page_func in (("ORM + Pydantic", orm_page), ("проекция + orjson", projection_page)):
+            timings = await walk(page_func, limit, trace=False)
+            tracemalloc.start()
+            peaks = await walk(page_func, limit, trace=True)
+            tracemalloc.stop()
+            print(f"{title:<20} {limit:>6} {statistics.median(timings) * 1000:>13.2f} "
+                  f"{statistics.mean(peaks) / 1024:>11.1f}")
+    await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="Записей в базе")
+    parser.add_argument("--limits", default="20,100", help="Размеры страницы через запятую")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: назначение руководителей (manager) пачке пользователей.
+
+Сравнивает два способа для пачек разного размера:
+  по одному - как в одиночном одобрении: _assign_manager на каждого пользователя
+              ищет руководителя по pager и пользователя по sAMAccountName
+              (повторные руководители берутся из кэша DN)
+  пачкой    - resolve_manager_dns находит всех руководителей пачки поисками
+              с OR-фильтром на LDAP_FILTER_CHUNK_SIZE pager, затем _assign_manager
+              выполняет только modify по готовому DN
+
+Каталог AD имитируется ldap3 MOCK_SYNC; --rtt добавляет задержку сети к каждой
+операции (поиск, modify). Кэш DN очищается перед каждым замером, зеркало AD не
+используется. Для каждого размера пачки выводятся число поисков и время.
+
+Пример:
+    python benchmarks/manager_resolution.py --sizes 10,100,1000 --managers 300 --rtt 2
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging  # noqa: E402
+
+from ldap3 import MOCK_SYNC, OFFLINE_AD_2012_R2, Connection, Server  # noqa: E402
+
+from app.core.config.settings import settings  # noqa: E402
+from app.infrastructure.external.ldap_service import LDAPService  # noqa: E402
+
+BASE_DN = "DC=central,DC=st-ing,DC=com"
+
+
+class SimulatedDirectory:
+    """Каталог MOCK_SYNC: руководители и пользователи, счетчик операций и задержка сети"""
+
+    def __init__(self, users: int, managers: int, rtt_ms: float):
+        self.rtt = rtt_ms / 1000
+        self.server = Server("simulated", get_info=OFFLINE_AD_2012_R2)
+        self.admin = f"CN=bench,{BASE_DN}"
+        self.shared = Connection(self.server, user=self.admin, password="bench", client_strategy=MOCK_SYNC)
+        self.shared.strategy.add_entry(self.admin, {"userPassword": "bench", "sAMAccountName": "bench", "objectClass": "user"})
+        for number in range(managers):
+            self._add(f"boss{number}", f"9{number:05d}")
+        for number in range(users):
+            self._add(f"user{number}", f"1{number:05d}")
+        self.searches = 0
+        self.modifies = 0
+
+    def _add(self, sam: str, pager: str) -> None:
+        dn = f"CN={sam},OU=Users,{BASE_DN}"
+        self.shared.strategy.add_entry(dn, {
+            "sAMAccountName": sam, "pager": pager, "distinguishedName": dn, "objectClass": ["top", "person", "user"],
+        })
+
+    def bind(self) -> Connection:
+        connection = Connection(self.server, user=self.admin, password="bench", client_strategy=MOCK_SYNC)
+        connection.strategy.entries = self.shared.strategy.entries
+        connection.bind()
+        search, modify = connection.search, connection.modify
+
+        def counted_search(*args, **kwargs):
+            self.searches += 1
+            time.sleep(self.rtt)
+            return search(*args, **kwargs)
+
+        def counted_modify(*args, **kwargs):
+            self.modifies += 1
+            time.sleep(self.rtt)
+            return modify(*args, **kwargs)
+
+        connection.search, connection.modify = counted_search, counted_modify
+        return connection
+
+
+async def assign_one_by_one(service: LDAPService, batch: list) -> None:
+    for sam, boss_id in batch:
+        await service._assign_manager(sam, boss_id)
+
+
+async def assign_batched(service: LDAPService, batch: list) -> None:
+    manager_dns = await service.resolve_manager_dns(boss_id for _, boss_id in batch)
+    for sam, boss_id in batch:
+        # DN пользователя известен после создания или обновления учетной записи
+        await service._assign_manager(sam, boss_id, manager_dns, f"CN={sam},OU=Users,{BASE_DN}")
+
+
+async def measure(service: LDAPService, directory: SimulatedDirectory, runner, batch: list) -> tuple:
+    service.dn_cache.clear()
+    directory.searches = directory.modifies = 0
+    started = time.perf_counter()
+    await runner(service, batch)
+    return directory.searches, directory.modifies, time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Назначение руководителей: по одному и пачкой")
+    parser.add_argument("--sizes", default="10,100,1000", help="Размеры пачек через запятую")
+    parser.add_argument("--managers", type=int, default=300, help="Руководителей в каталоге")
+    parser.add_argument("--rtt", type=float, default=1.0, help="Задержка сети на операцию, мс")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    directory = SimulatedDirectory(max(sizes), args.managers, args.rtt)
+    LDAPService._bind = lambda _service: directory.bind()
+    service = LDAPService()
+    rng = random.Random(args.seed)
+
+    print(f"Руководителей в каталоге: {args.managers}, RTT {args.rtt} мс, "
+          f"OR-фильтр на {settings.ldap_filter_chunk_size} pager")
+    print(f"{'пачка':>6} {'способ':>10} {'поисков':>8} {'modify':>7} {'время, с':>9} {'мс/польз.':>10}")
+    for size in sizes:
+        # Руководители повторяются: у пачки из 1000 человек несколько сотен начальников
+        batch = [(f"user{number}", f"#9{rng.randrange(args.managers):05d}") for number in range(size)]
+        for name, runner in (("по одному", assign_one_by_one), ("пачкой", assign_batched)):
+            searches, modifies, elapsed = await measure(service, directory, runner, batch)
+            print(f"{size:>6} {name:>10} {searches:>8} {modifies:>7} {elapsed:>9.2f} {elapsed / size * 1000:>10.2f}")
+    service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
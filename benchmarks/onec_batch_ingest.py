@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: пакетная загрузка сотрудников из 1C через /api/onec/oneC/receive.
+
+Запускает приложение in-process на временной SQLite базе и отправляет
+один пакет новых сотрудников, затем тот же пакет повторно (все строки -
+обновления). Для каждого прохода выводит время и количество SQL-выражений.
+
+Пример:
+    python benchmarks/onec_batch_ingest.py --rows 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_1c_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.pop("DATABASE_ASYNC_URL", None)
+
+import logging  # noqa: E402
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from main import app  # noqa: E402
+from app.infrastructure.database.database import init_db, close_db, async_engine  # noqa: E402
+
+
+def make_1c_user(n: int, appointment: str) -> dict:
+    return {
+        "unique": f"BENCH{n:07d}",
+        "firstname": f"Имя{n}",
+        "secondname": f"Фамилия{n}",
+        "thirdname": "Отчество",
+        "company": "СтройТехноИнженеринг",
+        "Department": "Технический департамент",
+        "Otdel": "Отдел ПТО",
+        "appointment": appointment,
+        "current_location_id": "Медовый",
+        "UploadDate": "2025-01-15T10:00:00",
+    }
+
+
+async def push(client: httpx.AsyncClient, rows: int, appointment: str, statements: list) -> tuple:
+    payload = [make_1c_user(n, appointment) for n in range(rows)]
+    statements.clear()
+    started = time.perf_counter()
+    response = await client.post("/api/onec/oneC/receive", json=payload)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    result = response.json()
+    return elapsed, len(statements), result["created"], result["failed"]
+
+
+async def main(args):
+    logging.disable(logging.CRITICAL)
+    await init_db()
+    statements: list = []
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, statement, *rest: statements.append(statement)
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for title, appointment in (("новые сотрудники", "Инженер"), ("повторная выгрузка", "Ведущий инженер")):
+            elapsed, count, created, failed = await push(client, args.rows, appointment, statements)
+            print(f"{title:<20} {args.rows} строк: {elapsed:.2f}с, {args.rows / elapsed:.0f} строк/с, "
+                  f"SQL-выражений: {count}, успешно: {created}, ошибок: {failed}")
+
+    await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="Строк в пакете 1C")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: выбор OU для всей очереди ожидающих одобрения пользователей.
+
+Сравнивает на синтетической очереди (объекты и отделы как в 1C, часть пар без
+подходящей OU):
+  цепочка if/elif   - прежний LDAPService.find_ou (копия ниже)
+  правила, холодные - CompiledOURules из app/core/config/ou_routing.json без
+                      запомненных результатов (первый проход после загрузки)
+  правила, теплые   - повторный проход: результаты запомнены по паре (объект, отдел)
+и проверяет, что для каждого пользователя OU (или ошибка) совпадает.
+
+Затем заполняет временную SQLite базу pending пользователями и замеряет
+UserService.preview_pending_ous (GET /api/users/admin/ou-routing/preview без HTTP).
+
+Пример:
+    python benchmarks/ou_routing.py --users 20000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_ou_")
+_db_path = os.path.join(_tmp_dir, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.pop("DATABASE_ASYNC_URL", None)
+
+import logging  # noqa: E402
+
+from app.core.config.settings import settings  # noqa: E402
+from app.infrastructure.database.database import init_db, close_db, AsyncSessionLocal  # noqa: E402
+from app.infrastructure.database.user_repository_impl import SQLAlchemyUserRepository  # noqa: E402
+from app.infrastructure.external.ldap_service import LDAPService  # noqa: E402
+from app.infrastructure.external.ou_routing import CompiledOURules, OURoutingError  # noqa: E402
+from app.domain.services.user_service import UserService  # noqa: E402
+from app.domain.entities.user import UserStatus  # noqa: E402
+
+LOCATIONS = [
+    "Офис Медовый", "Медовый переулок", "Склад Лобня", "Доп. офис Трёхпрудный", "Кемерово ГРЭС",
+    "Камчатка Петропавловск", "Магнитогорск ММК", "Завидово", "ЭС2 Москва", "Сбер К32", "Тинькофф ЦОД",
+    "Цод Лыткарино", "Офис Лобня", "Удаленная работа", "Новый объект Казань",
+]
+DEPARTMENTS = [
+    "Отдел информационных технологий", "Отдел кадров", "Отдел персонала", "Отдел управленческого учета",
+    "Отдел проектирования", "Тендерный отдел", "Отдел закупок", "Отдел логистики", "Отдел снабжения",
+    "Отдел охраны труда", "ПТО", "Сметный отдел", "Отдел управления проектами", "Планово-экономический отдел",
+    "Бухгалтерия", "Казначейство", "Юридический отдел", "Административный отдел", "Монтажный участок",
+]
+
+
+def legacy_find_ou(obj_name: str, department: str) -> str:
+    """Прежняя реализация LDAPService.find_ou (цепочка if/elif с подстроками в коде)"""
+    if 'прудный' in obj_name.lower():
+        return "OU=Доп. офис Трёхпрудный,OU=Отдел управления проектами,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+
+    if 'лобня' in obj_name.lower():
+        if 'логистик' in department.lower():
+            return "OU=Отдел логистики и складского учета,OU=Коммерческий департамент,OU=DtTermo,DC=central,DC=st-ing,DC=com"
+
+    if 'медовый' in obj_name.lower():
+        # Используем только название отдела (как в PowerShell)
+        if 'информац' in department.lower():
+            return "OU=Отдел информационных технологий,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'кадро' in department.lower():
+            return "OU=Отдел кадров,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'персона' in department.lower():
+            return "OU=Отдел персонала,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'управленческ' in department.lower():
+            return "OU=Отдел управленческого учета,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'проектир' in department.lower():
+            return "OU=Отдел проектирования,OU=Департамент развития,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'ендерны' in department.lower():
+            return "OU=Тендерный отдел,OU=Департамент развития,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'закупок' in department.lower():
+            return "OU=Отдел закупок,OU=Коммерческий департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'логистик' in department.lower():
+            return "OU=Отдел логистики и складского учета,OU=Коммерческий департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'снабже' in department.lower():
+            return "OU=Отдел снабжения,OU=Коммерческий департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'труд' in department.lower():
+            return "OU=Отдел охраны труда,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'пто' in department.lower():
+            return "OU=Отдел ПТО,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'метный' in department.lower():
+            return "OU=Сметный отдел,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'управления проект' in department.lower():
+            return "OU=Отдел управления проектами,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'планово' in department.lower():
+            return "OU=Планово экономический отдел,OU=Финансовый департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'ухгалтери' in department.lower():
+            return "OU=Бухгалтерия,OU=Финансовый департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'азначе' in department.lower():
+            return "OU=Казначейство,OU=Финансовый департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'ридически' in department.lower():
+            return "OU=Юридический отдел,OU=Юридический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+        elif 'дминистративны' in department.lower():
+            return "OU=Административный отдел,OU=Департамент обеспечения,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+
+    # Проверяем строительные объекты - используем полное название объекта
+    construction_objects = ['емеров', 'амчатк', 'гнитогор', 'завидов', 'эс2', 'сбер к32', 'инькофф', 'цод']
+    for obj in construction_objects:
+        if obj in obj_name.lower():
+            # Точно как в PowerShell: создаем индивидуальную OU для каждого строительного объекта
+            individual_ou = f"OU={obj_name},OU=Строительные объекты,OU=Отдел управления проектами,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+
+            # Проверяем, не превышает ли DN лимит в 256 символов
+            if len(individual_ou) > 256:
+                logging.getLogger(__name__).warning(f"Индивидуальная OU слишком длинная ({len(individual_ou)} символов), используем общую OU")
+                return "OU=Строительные объекты,OU=Отдел управления проектами,OU=Технический департамент,OU=СтройТехноИнженеринг,DC=central,DC=st-ing,DC=com"
+
+            return individual_ou
+
+    # Если не найдена подходящая OU, возвращаем ошибку (точно как в PowerShell)
+    raise ValueError(f"Не найдена подходящая организационная единица для объекта '{obj_name}' и отдела '{department}'")
+
+
+def make_queue(count: int) -> list:
+    rng = random.Random(42)
+    return [(rng.choice(LOCATIONS), rng.choice(DEPARTMENTS)) for _ in range(count)]
+
+
+def evaluate(find_ou, queue: list) -> list:
+    results = []
+    for location, department in queue:
+        try:
+            results.append(find_ou(location, department))
+        except ValueError as e:
+            results.append(f"error: {e}")
+    return results
+
+
+def timed(function, repeat: int) -> tuple:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def seed(queue: list):
+    """Pending пользователи из очереди напрямую через sqlite3"""
+    now = datetime.now().isoformat(sep=" ")
+    connection = sqlite3.connect(_db_path)
+    try:
+        connection.executemany(
+            "INSERT INTO users (unique_id, firstname, secondname, company, department, otdel, appointment,"
+            " current_location_id, is_engineer, status, upload_date, created_at, updated_at, is_update)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (f"BENCH{n:07d}", "Иван", "Иванов", "СтройТехноИнженеринг", "Департамент", department, "Инженер",
+                 location, 1 if n % 50 == 0 else 0, UserStatus.PENDING.name, now, now, now, 0)
+                for n, (location, department) in enumerate(queue)
+            ],
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+async def main(args):
+    logging.disable(logging.CRITICAL)
+    with open(settings.ou_routing_path, encoding="utf-8") as f:
+        config = json.load(f)
+    queue = make_queue(args.users)
+
+    legacy_time, legacy_results = timed(lambda: evaluate(legacy_find_ou, queue), args.repeat)
+    cold_time, compiled_results = timed(lambda: evaluate(CompiledOURules(config, time.time()).find_ou, queue), args.repeat)
+    warm_rules = CompiledOURules(config, time.time())
+    evaluate(warm_rules.find_ou, queue)
+    warm_time, _ = timed(lambda: evaluate(warm_rules.find_ou, queue), args.repeat)
+    compile_time, _ = timed(lambda: CompiledOURules(config, time.time()), args.repeat)
+
+    mismatches = sum(1 for old, new in zip(legacy_results, compiled_results) if old != new)
+    unresolved = sum(1 for result in compiled_results if result.startswith("error: "))
+    print(f"Очередь: {len(queue)} пользователей, различных пар (объект, отдел): {len(set(queue))}, без OU: {unresolved}")
+    print(f"Расхождений с прежней реализацией: {mismatches}")
+    print(f"\n  {'вариант':<20} {'всего, мс':>10} {'мкс/польз.':>11}")
+    for title, elapsed in (("цепочка if/elif", legacy_time), ("правила, холодные", cold_time), ("правила, теплые", warm_time)):
+        print(f"  {title:<20} {elapsed * 1000:>10.2f} {elapsed / len(queue) * 1e6:>11.2f}")
+    print(f"  компиляция правил: {compile_time * 1000:.3f} мс")
+
+    await init_db()
+    seed(queue)
+    ldap_service = LDAPService()
+    preview_times = []
+    async with AsyncSessionLocal() as db:
+        service = UserService(SQLAlchemyUserRepository(db), ldap_service)
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            preview = await service.preview_pending_ous()
+            preview_times.append(time.perf_counter() - started)
+    ldap_service.close()
+    await close_db()
+    print(f"\npreview_pending_ous ({preview['total']} pending, без OU {preview['unresolved']}, "
+          f"OU: {len(preview['by_ou'])}): {statistics.median(preview_times) * 1000:.1f} мс (медиана {args.repeat})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000, help="Пользователей в очереди")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого замера")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: накладные расходы на запрос от создания сервисов.
+
+Сравнивает два способа получить UserService в зависимостях FastAPI:
+  на запрос   - UserService(repository) создает LDAPService (ldap3 Server),
+                ExchangeService и WinRMService заново на каждый запрос
+  контейнер   - LDAP, Exchange и WinRM общие (app.core.container), на запрос
+                создаются только сессия БД и репозиторий
+
+Выводит время построения зависимости и латентность запросов через приложение
+(httpx + ASGITransport, временная SQLite база): GET /api/users/stats и
+POST /api/users/auth/login. Логирование по умолчанию отключено, --with-logging
+включает его (в реальной работе каждый сервис пишет в лог при создании).
+
+Пример:
+    python benchmarks/request_overhead.py --requests 2000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_deps_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.pop("DATABASE_ASYNC_URL", None)
+
+import logging  # noqa: E402
+
+import httpx  # noqa: E402
+from fastapi import Depends  # noqa: E402
+
+from main import app  # noqa: E402
+from app.api.dependencies import get_user_repository, get_user_service  # noqa: E402
+from app.core.container import get_container  # noqa: E402
+from app.core.config.settings import settings  # noqa: E402
+from app.domain.services.user_service import UserService  # noqa: E402
+from app.infrastructure.database.database import init_db, close_db, AsyncSessionLocal  # noqa: E402
+from app.infrastructure.database.user_repository_impl import SQLAlchemyUserRepository  # noqa: E402
+
+
+def per_request_user_service(repository: SQLAlchemyUserRepository) -> UserService:
+    """Прежнее поведение: все внешние сервисы создаются для каждого запроса"""
+    return UserService(repository)
+
+
+def container_user_service(repository: SQLAlchemyUserRepository) -> UserService:
+    container = get_container()
+    return UserService(repository, container.ldap_service, container.exchange_service)
+
+
+def _override(factory):
+    """Зависимость get_user_service с заданным способом получения сервисов"""
+    def dependency(repository: SQLAlchemyUserRepository = Depends(get_user_repository)) -> UserService:
+        return factory(repository)
+    return dependency
+
+
+def time_construction(factory, iterations: int) -> float:
+    """Среднее время построения UserService, мкс"""
+    session = AsyncSessionLocal()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        factory(SQLAlchemyUserRepository(session))
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+async def time_requests(client: httpx.AsyncClient, method: str, url: str, count: int, **kwargs) -> list:
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return latencies
+
+
+async def main(args):
+    if not args.with_logging:
+        logging.disable(logging.CRITICAL)
+    await init_db()
+
+    modes = (("на запрос", per_request_user_service), ("контейнер", container_user_service))
+
+    print(f"Построение UserService ({args.construct} раз):")
+    for title, factory in modes:
+        print(f"  {title:<10} {time_construction(factory, args.construct):>8.1f} мкс")
+
+    login = {"username": settings.admin_username, "password": settings.admin_password}
+    endpoints = (("GET /stats", "GET", "/api/users/stats", {}),
+                 ("POST /auth/login", "POST", "/api/users/auth/login", {"json": login}))
+
+    print(f"\nЛатентность запросов ({args.requests} на вариант), мс:")
+    print(f"  {'endpoint':<18} {'вариант':<10} {'p50':>7} {'p95':>7} {'req/s':>8}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for endpoint, method, url, kwargs in endpoints:
+            for title, factory in modes:
+                # Та же цепочка зависимостей, что в приложении, кроме способа получить сервисы
+                app.dependency_overrides[get_user_service] = _override(factory)
+                await time_requests(client, method, url, 20, **kwargs)
+                latencies = sorted(await time_requests(client, method, url, args.requests, **kwargs))
+                p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+                print(f"  {endpoint:<18} {title:<10} {statistics.median(latencies) * 1000:>7.2f} "
+                      f"{p95 * 1000:>7.2f} {len(latencies) / sum(latencies):>8.0f}")
+    app.dependency_overrides.clear()
+    await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Запросов на каждый вариант")
+    parser.add_argument("--construct", type=int, default=5000, help="Построений UserService для микро-замера")
+    parser.add_argument("--with-logging", action="store_true", help="Не отключать логирование")
+    asyncio.run(main(parser.parse_args()))
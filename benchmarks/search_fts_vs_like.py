@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: поиск пользователей через FTS5 против ILIKE '%q%'.
+
+Заполняет временную SQLite базу до 10k, 100k и 1M записей (таблица users_fts
+наполняется триггерами) и на каждом размере замеряет первую страницу
+курсорной выдачи (COUNT + страница) обоими способами через репозиторий.
+
+Пример:
+    python benchmarks/search_fts_vs_like.py --sizes 10000,100000,1000000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_fts_")
+_db_path = os.path.join(_tmp_dir, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.pop("DATABASE_ASYNC_URL", None)
+
+import logging  # noqa: E402
+
+from app.infrastructure.database.database import init_db, close_db, AsyncSessionLocal  # noqa: E402
+from app.infrastructure.database.query_spec import UserQuerySpec  # noqa: E402
+from app.infrastructure.database.user_repository_impl import SQLAlchemyUserRepository  # noqa: E402
+from app.domain.entities.user import UserStatus  # noqa: E402
+
+FIRSTNAMES = ["Иван", "Пётр", "Сергей", "Алексей", "Дмитрий", "Андрей", "Михаил", "Ольга", "Анна", "Елена", "Мария", "Татьяна"]
+SECONDNAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов", "Михайлов", "Новиков", "Фёдоров", "Морозов"]
+THIRDNAMES = ["Иванович", "Петрович", "Сергеевич", "Алексеевич", "Дмитриевич", "Андреевна", "Михайловна", None]
+STATUSES = [UserStatus.PENDING.name, UserStatus.APPROVED.name, UserStatus.APPROVED.name, UserStatus.DISMISSED.name]
+
+QUERIES = [
+    ("частая фамилия", "Иванов"),
+    ("ФИО из двух слов", "Петров Ольга"),
+    ("редкий unique_id", "BENCH0004242"),
+    ("нет совпадений", "Щукинский"),
+]
+
+
+def seed(start: int, stop: int, chunk: int = 50000):
+    """Быстрое наполнение базы напрямую через sqlite3 (триггеры FTS срабатывают)"""
+    rng = random.Random(start)
+    now = datetime.now().isoformat(sep=" ")
+    connection = sqlite3.connect(_db_path)
+    try:
+        for first in range(start, stop, chunk):
+            rows = [
+                (
+                    f"BENCH{n:07d}",
+                    rng.choice(FIRSTNAMES),
+                    rng.choice(SECONDNAMES) + ("а" if rng.random() < 0.3 else ""),
+                    rng.choice(THIRDNAMES),
+                    "СтройТехноИнженеринг", "Технический департамент", "Отдел ПТО", "Инженер", "Медовый",
+                    rng.choice(STATUSES), now, now, now, 0,
+                )
+                for n in range(first, min(first + chunk, stop))
+            ]
+            connection.executemany(
+                "INSERT INTO users (unique_id, firstname, secondname, thirdname, company, department, otdel,"
+                " appointment, current_location_id, status, upload_date, created_at, updated_at, is_update)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            connection.commit()
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+
+
+async def measure(repository: SQLAlchemyUserRepository, condition, repeat: int) -> tuple:
+    timings = []
+    total = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        page = await repository._fetch_cursor_page(UserQuerySpec([condition]), None, 20)
+        timings.append(time.perf_counter() - started)
+        total = page["total_count"]
+    return statistics.median(timings), total
+
+
+async def main(args):
+    logging.disable(logging.CRITICAL)
+    await init_db()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    loaded = 0
+    for size in sizes:
+        print(f"\nНаполнение базы до {size} записей...")
+        started = time.perf_counter()
+        seed(loaded, size)
+        loaded = size
+        print(f"  готово за {time.perf_counter() - started:.1f}с")
+
+        async with AsyncSessionLocal() as db:
+            repository = SQLAlchemyUserRepository(db)
+            print(f"  {'запрос':<20} {'ILIKE, мс':>10} {'FTS5, мс':>10} {'ускорение':>10}  найдено")
+            for title, query in QUERIES:
+                like_time, like_total = await measure(repository, repository._like_search_condition(query), args.repeat)
+                fts_time, fts_total = await measure(repository, repository._search_condition(query), args.repeat)
+                print(f"  {title:<20} {like_time * 1000:>10.1f} {fts_time * 1000:>10.1f} "
+                      f"{like_time / fts_time:>9.1f}x  {like_total}/{fts_total}")
+
+    await close_db()
+    print("\nILIKE ищет подстроку, FTS5 - префиксы слов, поэтому число найденных записей может отличаться")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Размеры базы через запятую")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого запроса")
+    asyncio.run(main(parser.parse_args()))
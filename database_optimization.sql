@@ -1,5 +1,10 @@
 -- Оптимизация базы данных для работы с 10,000+ записей
 -- Выполнить после создания таблиц
+--
+-- Индексы из разделов 1, 3 и 4 и pragmas из раздела 5 применяются приложением
+-- автоматически: индексы объявлены в UserModel и создаются миграциями Alembic
+-- при старте (alembic upgrade head), pragmas выставляются на каждом подключении.
+-- Файл оставлен для ручной настройки существующих баз.
 
 -- 1. Создание индексов для быстрой курсорной пагинации
 CREATE INDEX IF NOT EXISTS idx_users_status_id ON users(status, id);
@@ -21,10 +26,10 @@ CREATE INDEX IF NOT EXISTS idx_users_status_search ON users(status, firstname, s
 CREATE INDEX IF NOT EXISTS idx_users_upload_date ON users(upload_date);
 
 -- 4. Индексы для фильтрации по статусу
-CREATE INDEX IF NOT EXISTS idx_users_pending ON users(id) WHERE status = 'pending';
-CREATE INDEX IF NOT EXISTS idx_users_dismissed ON users(id) WHERE status = 'dismissed';
-CREATE INDEX IF NOT EXISTS idx_users_approved ON users(id) WHERE status = 'approved';
-CREATE INDEX IF NOT EXISTS idx_users_rejected ON users(id) WHERE status = 'rejected';
+CREATE INDEX IF NOT EXISTS idx_users_pending ON users(id) WHERE status = 'PENDING';
+CREATE INDEX IF NOT EXISTS idx_users_dismissed ON users(id) WHERE status = 'DISMISSED';
+CREATE INDEX IF NOT EXISTS idx_users_approved ON users(id) WHERE status = 'APPROVED';
+CREATE INDEX IF NOT EXISTS idx_users_rejected ON users(id) WHERE status = 'REJECTED';
 
 -- 5. Оптимизация для SQLite (если используется)
 PRAGMA journal_mode = WAL;
@@ -38,10 +43,10 @@ ANALYZE;
 
 -- 7. Создание представлений для часто используемых запросов
 CREATE VIEW IF NOT EXISTS v_pending_users AS
-SELECT * FROM users WHERE status = 'pending' ORDER BY id;
+SELECT * FROM users WHERE status = 'PENDING' ORDER BY id;
 
 CREATE VIEW IF NOT EXISTS v_dismissed_users AS
-SELECT * FROM users WHERE status = 'dismissed' ORDER BY id;
+SELECT * FROM users WHERE status = 'DISMISSED' ORDER BY id;
 
 -- 8. Индексы для внешних ключей (если есть)
 -- CREATE INDEX IF NOT EXISTS idx_users_boss_id ON users(boss_id);
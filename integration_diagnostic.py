@@ -38,7 +38,7 @@ class IntegrationDiagnostic:
             
             if conn and conn.bound:
                 # Тестовый поиск пользователей
-                conn.search(
+                await conn.search(
                     'DC=central,DC=st-ing,DC=com',
                     '(objectClass=user)',
                     attributes=['sAMAccountName'],
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -5,7 +6,11 @@ from fastapi.responses import HTMLResponse
 import uvicorn
 from app.core.config.settings import settings
 from app.api.routes import users, onec, web, auth
-from app.infrastructure.database.database import init_db
+from app.infrastructure.database.database import init_db, close_db
+from app.domain.services.archive_service import run_archiver
+from app.domain.services.ad_mirror_service import run_ad_mirror_sync
+from app.core.container import init_container, close_container
+from app.infrastructure.external.ldap_service import run_schema_cache_refresher
 from app.core.logging.logger import log_application_startup, unified_logger
 from app.core.middleware.logging_middleware import LoggingMiddleware
 
@@ -36,10 +41,29 @@ async def startup_event():
     """Событие запуска приложения"""
     await init_db()
     unified_logger.app_logger.info("База данных инициализирована успешно")
+    container = init_container()
+    app.state.background_tasks = [asyncio.create_task(run_schema_cache_refresher(container.ldap_service))]
+    if settings.users_archive_enabled:
+        app.state.background_tasks.append(asyncio.create_task(run_archiver()))
+    if settings.ad_mirror_enabled:
+        app.state.background_tasks.append(asyncio.create_task(run_ad_mirror_sync(container.ldap_service)))
     unified_logger.app_logger.info("Приложение User Management System запущено")
     unified_logger.app_logger.info(f"Домен: {settings.domain}")
     unified_logger.app_logger.info(f"API Base URL: {settings.api_base_url}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Событие остановки приложения"""
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await close_container()
+    await close_db()
+    unified_logger.app_logger.info("Приложение User Management System остановлено")
+
 @app.get("/health")
 async def health_check():
     """Проверка здоровья приложения"""
@@ -44,7 +44,7 @@ class RemoteIntegrationCheck:
             
             if conn and conn.bound:
                 # Тестовый поиск пользователей
-                conn.search(
+                await conn.search(
                     'DC=central,DC=st-ing,DC=com',
                     '(objectClass=user)',
                     attributes=['sAMAccountName'],
@@ -304,15 +304,13 @@ class RemoteIntegrationCheck:
         self.log("🔍 Проверка подключения к базе данных...")
         
         try:
-            from app.infrastructure.database.database import get_db
+            from app.infrastructure.database.database import AsyncSessionLocal
             from sqlalchemy import text
             
-            # Получаем подключение к БД
-            db = next(get_db())
-            
-            # Простой запрос для проверки
-            result = db.execute(text("SELECT 1 as test"))
-            test_value = result.fetchone()[0]
+            # Получаем подключение к БД и выполняем простой запрос для проверки
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(text("SELECT 1 as test"))
+                test_value = result.scalar_one()
             
             if test_value == 1:
                 self.log("✅ База данных доступна")
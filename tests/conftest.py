@@ -0,0 +1,13 @@
+"""Общие настройки тестов: файлы приложения создаются во временном каталоге"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_TMP_DIR = tempfile.mkdtemp(prefix="user-management-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP_DIR}/users.db")
+os.environ.setdefault("LOG_FILE", f"{_TMP_DIR}/logs/application.log")
+os.environ.setdefault("CURSOR_SECRET_KEY_PATH", f"{_TMP_DIR}/cursor_secret.key")
+os.environ.setdefault("LDAP_SCHEMA_CACHE_PATH", f"{_TMP_DIR}/ldap_schema.json")
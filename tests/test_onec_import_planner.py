@@ -0,0 +1,134 @@
+"""Классификация строк пакета 1C: новые, прямые обновления, ожидающие изменения и без изменений"""
+import pytest
+
+from app.domain.entities.user import PENDING_UPDATE_FIELDS, UserStatus
+from app.domain.services.onec_import_service import OneCImportService, _PlannedInsert
+
+
+def row(unique_id: str, **values) -> dict:
+    """Строка после transform_1c_data"""
+    data = {field: f"{field}-{unique_id}" for field in PENDING_UPDATE_FIELDS}
+    data.update(unique_id=unique_id, status=UserStatus.PENDING, is_engineer=0, upload_date="2025-01-20T10:30:00")
+    data.update(values)
+    return data
+
+
+def target(user_id: int, data: dict, status: UserStatus, is_update: bool = False, has_pending_update: bool = False) -> dict:
+    """Существующая запись в формате get_import_targets"""
+    return {
+        "id": user_id,
+        "status": status,
+        "is_update": is_update,
+        "has_pending_update": has_pending_update,
+        "values": {field: data[field] for field in PENDING_UPDATE_FIELDS},
+    }
+
+
+def plan(rows: list, existing: dict):
+    service = OneCImportService(user_repository=None, chunk_size=100)
+    return service._plan(list(enumerate(rows)), existing)
+
+
+def outcomes(result) -> list:
+    return [(unique_id, status) for _, unique_id, status, _ in result.outcomes]
+
+
+def test_new_employee_is_inserted():
+    result = plan([row("A1")], {})
+
+    assert outcomes(result) == [("A1", "created")]
+    assert list(result.inserts) == ["A1"]
+    assert result.updates == {} and result.pending_updates == {}
+
+
+def test_repeated_new_employee_in_batch_updates_planned_insert():
+    result = plan([row("A1"), row("A1", appointment="Прораб")], {})
+
+    assert outcomes(result) == [("A1", "created"), ("A1", "updated")]
+    assert list(result.inserts) == ["A1"]
+    assert result.inserts["A1"].data["appointment"] == "Прораб"
+    assert isinstance(result.outcomes[1][3], _PlannedInsert)
+
+
+def test_not_approved_employee_is_updated_directly_without_status_change():
+    data = row("A1")
+    result = plan([row("A1", appointment="Прораб", status=UserStatus.DISMISSED)], {"A1": target(5, data, UserStatus.PENDING)})
+
+    assert outcomes(result) == [("A1", "updated")]
+    assert result.updates[5]["appointment"] == "Прораб"
+    # Статус, табельный номер и признак обновления не перезаписываются
+    assert not {"status", "unique_id", "is_update"} & set(result.updates[5])
+    assert result.pending_updates == {}
+
+
+@pytest.mark.parametrize("status", [UserStatus.APPROVED, UserStatus.DISMISSED, UserStatus.REJECTED])
+def test_changes_of_processed_employee_wait_for_confirmation(status):
+    data = row("A1")
+    result = plan([row("A1", appointment="Прораб", work_phone="123")], {"A1": target(5, data, status)})
+
+    assert outcomes(result) == [("A1", "update_pending")]
+    # Только измененные поля, данные сотрудника не меняются до подтверждения
+    assert result.pending_updates[5] == {
+        "original_user_id": 5,
+        "previous_status": status,
+        "changes": {"appointment": "Прораб", "work_phone": "123"},
+    }
+    assert result.updates == {5: {"status": UserStatus.PENDING, "is_update": True}}
+
+
+def test_unchanged_approved_employee_is_left_alone():
+    data = row("A1")
+    result = plan([row("A1", upload_date="2025-02-01T10:00:00")], {"A1": target(5, data, UserStatus.APPROVED)})
+
+    assert outcomes(result) == [("A1", "unchanged")]
+    assert result.inserts == {} and result.updates == {} and result.pending_updates == {}
+
+
+def test_existing_pending_update_is_replaced():
+    data = row("A1")
+    existing = {"A1": target(5, data, UserStatus.PENDING, is_update=True, has_pending_update=True)}
+    result = plan([row("A1", company="Альфа")], existing)
+
+    assert outcomes(result) == [("A1", "update_updated")]
+    assert result.pending_updates[5]["changes"] == {"company": "Альфа"}
+    # Статус уже PENDING с is_update: пользователь не переписывается
+    assert result.updates == {}
+
+
+def test_existing_pending_update_is_replaced_even_when_data_reverted():
+    # 1C вернула прежние значения: ожидающие изменения заменяются пустыми, а не остаются устаревшими
+    data = row("A1")
+    existing = {"A1": target(5, data, UserStatus.PENDING, is_update=True, has_pending_update=True)}
+    result = plan([row("A1")], existing)
+
+    assert outcomes(result) == [("A1", "update_updated")]
+    assert result.pending_updates[5]["changes"] == {}
+
+
+def test_repeated_approved_employee_in_batch_keeps_last_changes():
+    data = row("A1")
+    result = plan(
+        [row("A1", appointment="Прораб"), row("A1", appointment="Мастер")],
+        {"A1": target(5, data, UserStatus.APPROVED)},
+    )
+
+    assert outcomes(result) == [("A1", "update_pending"), ("A1", "update_updated")]
+    assert result.pending_updates[5]["changes"] == {"appointment": "Мастер"}
+    assert result.pending_updates[5]["previous_status"] == UserStatus.APPROVED
+
+
+def test_mixed_batch_is_split_by_row():
+    approved, pending, unchanged = row("B1"), row("B2"), row("B3")
+    existing = {
+        "B1": target(1, approved, UserStatus.APPROVED),
+        "B2": target(2, pending, UserStatus.PENDING),
+        "B3": target(3, unchanged, UserStatus.APPROVED),
+    }
+    result = plan([row("B1", boss_id="#1"), row("B2", boss_id="#1"), row("B3"), row("B4")], existing)
+
+    assert outcomes(result) == [
+        ("B1", "update_pending"), ("B2", "updated"), ("B3", "unchanged"), ("B4", "created"),
+    ]
+    assert list(result.inserts) == ["B4"]
+    assert set(result.updates) == {1, 2}
+    assert set(result.pending_updates) == {1}
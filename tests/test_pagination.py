@@ -0,0 +1,134 @@
+"""Подписанные курсоры пагинации и токены ленты изменений"""
+import asyncio
+import base64
+import os
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.infrastructure.database import pagination
+from app.infrastructure.database.models import Base
+from app.infrastructure.database.pagination import (
+    InvalidCursorError, PageCursor, decode_change_token, decode_cursor, encode_change_token, encode_cursor,
+)
+from app.infrastructure.database.query_spec import UserQuerySpec
+from app.infrastructure.database.user_repository_impl import SQLAlchemyUserRepository
+
+
+@pytest.fixture
+def secret_key(monkeypatch):
+    """Ключ подписи из настроек вместо файла ключа"""
+    monkeypatch.setattr(pagination, "_secret_key", None)
+    monkeypatch.setattr(pagination.settings, "cursor_secret_key", "test-secret")
+
+
+def test_cursor_round_trip(secret_key):
+    cursor = decode_cursor(encode_cursor(PageCursor(["Иванов", 42], "abc", total_count=100, data_version=7)))
+
+    assert cursor.key == ["Иванов", 42]
+    assert cursor.fingerprint == "abc"
+    assert cursor.total_count == 100
+    assert cursor.data_version == 7
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda payload, signature: (payload[:-2] + "xy", signature),
+    lambda payload, signature: (payload, signature[:-2] + "xy"),
+    lambda payload, signature: (payload, ""),
+])
+def test_tampered_cursor_is_rejected(secret_key, tamper):
+    payload, signature = encode_cursor(PageCursor([42], "abc", 100, 7)).split(".")
+    payload, signature = tamper(payload, signature)
+
+    assert decode_cursor(f"{payload}.{signature}") is None
+
+
+def test_forged_total_is_rejected(secret_key):
+    # Клиент не может подменить итог в курсоре, не зная ключа
+    payload, signature = encode_cursor(PageCursor([42], "abc", 100, 7)).split(".")
+    forged = base64.urlsafe_b64encode(b'[[42],"abc",5,7]').decode().rstrip("=")
+
+    assert decode_cursor(f"{forged}.{signature}") is None
+
+
+def test_cursor_signed_with_other_key_is_rejected(secret_key, monkeypatch):
+    cursor = encode_cursor(PageCursor([42], "abc"))
+    monkeypatch.setattr(pagination, "_secret_key", b"other-secret")
+
+    assert decode_cursor(cursor) is None
+
+
+@pytest.mark.parametrize("cursor", ["", ".", "garbage.sig", "%%%", "bm90LWEtbnVtYmVy"])
+def test_malformed_cursor_is_rejected(secret_key, cursor):
+    assert decode_cursor(cursor) is None
+
+
+def test_legacy_cursor_matches_only_default_sort(secret_key):
+    # Курсор старого формата: base64 от id, без подписи, итога и отпечатка
+    cursor = decode_cursor(base64.b64encode(b"20").decode())
+
+    assert cursor.key == [20]
+    assert UserQuerySpec([], None).parse_key(cursor.key) == [20]
+    assert UserQuerySpec([], "secondname").parse_key(cursor.key) is None
+    assert not cursor.is_valid_total(UserQuerySpec([], None).fingerprint, data_version=1)
+
+
+def test_total_is_reused_only_for_same_filter_and_data(secret_key):
+    spec = UserQuerySpec([], "secondname", scope="all", search="петр")
+    cursor = decode_cursor(encode_cursor(PageCursor([["Петров", 1]], spec.fingerprint, total_count=10, data_version=3)))
+
+    assert cursor.is_valid_total(spec.fingerprint, data_version=3)
+    # Данные изменились после первой страницы
+    assert not cursor.is_valid_total(spec.fingerprint, data_version=4)
+    # Другой фильтр или сортировка
+    other_filter = UserQuerySpec([], "secondname", scope="all", search="иван")
+    other_sort = UserQuerySpec([], "-secondname", scope="all", search="петр")
+    assert not cursor.is_valid_total(other_filter.fingerprint, data_version=3)
+    assert not cursor.is_valid_total(other_sort.fingerprint, data_version=3)
+    # Версия данных не ведется (не SQLite)
+    assert not cursor.is_valid_total(spec.fingerprint, data_version=None)
+
+
+def test_invalid_cursor_raises_instead_of_restarting(secret_key):
+    async def fetch(cursor):
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        try:
+            async with AsyncSession(engine) as session:
+                return await SQLAlchemyUserRepository(session).get_all_users_cursor(cursor=cursor)
+        finally:
+            await engine.dispose()
+
+    with pytest.raises(InvalidCursorError):
+        asyncio.run(fetch("garbage.sig"))
+    # Курсор другой сортировки тоже не продолжает выборку с начала
+    with pytest.raises(InvalidCursorError):
+        asyncio.run(fetch(encode_cursor(PageCursor(["Петров", 1], "abc"))))
+    assert asyncio.run(fetch(None))["users"] == []
+
+
+def test_secret_key_file_is_created_once_on_first_use(tmp_path, monkeypatch):
+    path = tmp_path / "keys" / "cursor_secret.key"
+    monkeypatch.setattr(pagination, "_secret_key", None)
+    monkeypatch.setattr(pagination.settings, "cursor_secret_key", None)
+    monkeypatch.setattr(pagination.settings, "cursor_secret_key_path", str(path))
+
+    assert not path.exists()
+    cursor = encode_cursor(PageCursor([42], "abc"))
+    assert path.exists()
+    assert oct(os.stat(path).st_mode & 0o777) == "0o600"
+
+    # Новый процесс читает тот же ключ: выданный курсор остается действительным
+    monkeypatch.setattr(pagination, "_secret_key", None)
+    assert decode_cursor(cursor).key == [42]
+
+
+@pytest.mark.parametrize("change_seq", [0, 1, 42, 10 ** 12])
+def test_change_token_round_trip(change_seq):
+    assert decode_change_token(encode_change_token(change_seq)) == change_seq
+
+
+@pytest.mark.parametrize("token", ["", "-1", "1.5", "abc", "0x10", "١٢"])
+def test_invalid_change_token_is_rejected(token):
+    assert decode_change_token(token) is None
@@ -0,0 +1,137 @@
+"""Сортировка списков и keyset-условие курсора"""
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, func, insert, select
+
+from app.infrastructure.database.models import UserModel
+from app.infrastructure.database.query_spec import SORTABLE_FIELDS, UserQuerySpec, parse_sort
+
+users = Table(
+    "users",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("secondname", String, nullable=False),
+    Column("firstname", String, nullable=False),
+    Column("company", String, nullable=False),
+    Column("upload_date", DateTime, nullable=False),
+)
+
+
+@pytest.fixture(scope="module")
+def connection():
+    """Строки с большим числом повторов значений, чтобы порядок решал следующий ключ"""
+    engine = create_engine("sqlite://")
+    users.create(engine)
+    rng = random.Random(7)
+    started = datetime(2025, 1, 1, 9, 0)
+    rows = [
+        {
+            "id": user_id,
+            "secondname": rng.choice(["Иванов", "Петров", "Сидоров"]),
+            "firstname": rng.choice(["Анна", "Иван", "Олег", "Яна"]),
+            "company": rng.choice(["СТИ", "Альфа"]),
+            "upload_date": started + timedelta(hours=rng.randrange(5)),
+        }
+        for user_id in range(1, 121)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(users), rows)
+    with engine.connect() as conn:
+        yield conn
+    engine.dispose()
+
+
+def expected_order(conn, sort: str) -> list:
+    """Ожидаемый порядок id: сортировка в Python по тем же ключам"""
+    rows = [row._mapping for row in conn.execute(select(users))]
+    for key in reversed(parse_sort(sort)):
+        rows.sort(key=lambda row: row[key.field], reverse=key.descending)
+    return [row["id"] for row in rows]
+
+
+def walk_pages(conn, sort: str, page_size: int) -> list:
+    """Обход выборки страницами, как _fetch_cursor_page: ключ последней строки через JSON курсора"""
+    spec = UserQuerySpec([], sort)
+    seen, key = [], None
+    total = conn.execute(select(func.count()).select_from(users)).scalar_one()
+    while len(seen) <= total:
+        query = select(users).order_by(*spec.order_by(users.c)).limit(page_size)
+        if key is not None:
+            query = query.where(spec.seek_condition(users.c, key))
+        page = conn.execute(query).all()
+        seen.extend(row.id for row in page)
+        if len(page) < page_size:
+            return seen
+        key = spec.parse_key(json.loads(json.dumps(spec.key_values(page[-1]))))
+    # Курсор не продвигается: строки повторяются
+    return seen
+
+
+@pytest.mark.parametrize("sort", [
+    None,
+    "-id",
+    "secondname",
+    "-upload_date",
+    "secondname,-upload_date",
+    "-company,firstname",
+    "company,-secondname,firstname",
+    "-secondname,upload_date,-firstname",
+])
+@pytest.mark.parametrize("page_size", [1, 7, 50])
+def test_pages_follow_sort_without_gaps_or_duplicates(connection, sort, page_size):
+    assert walk_pages(connection, sort, page_size) == expected_order(connection, sort)
+
+
+def test_mixed_directions_seek_strictly_after_key(connection):
+    spec = UserQuerySpec([], "secondname,-upload_date")
+    key = ["Петров", datetime(2025, 1, 1, 11, 0), 60]
+    found = {row.id for row in connection.execute(select(users).where(spec.seek_condition(users.c, key)))}
+
+    order = expected_order(connection, "secondname,-upload_date")
+    rows = {row.id: row for row in connection.execute(select(users))}
+    after = {
+        user_id for user_id in order
+        if (rows[user_id].secondname, -rows[user_id].upload_date.timestamp(), -user_id)
+        > ("Петров", -key[1].timestamp(), -60)
+    }
+    assert found == after
+
+
+def test_id_tie_breaker_follows_last_direction():
+    assert [str(key) for key in parse_sort("secondname,-upload_date")] == ["secondname", "-upload_date", "-id"]
+    assert [str(key) for key in parse_sort("-company")] == ["-company", "-id"]
+    assert [str(key) for key in parse_sort(None)] == ["id"]
+    # Поля после id не влияют на порядок
+    assert [str(key) for key in parse_sort("-id,secondname")] == ["-id"]
+
+
+@pytest.mark.parametrize("sort", ["email", "secondname,secondname", "-secondname,+secondname"])
+def test_invalid_sort_is_rejected(sort):
+    with pytest.raises(ValueError):
+        parse_sort(sort)
+
+
+def test_key_from_other_sort_is_rejected():
+    spec = UserQuerySpec([], "secondname,-upload_date")
+
+    assert spec.parse_key(None) is None
+    assert spec.parse_key([5]) is None
+    assert spec.parse_key(["Петров", "2025-01-01T10:00:00", 5]) == ["Петров", datetime(2025, 1, 1, 10, 0), 5]
+
+
+def test_fingerprint_depends_on_sort_and_filters():
+    base = UserQuerySpec([], "secondname", scope="all", search="петр").fingerprint
+
+    assert UserQuerySpec([], "secondname", scope="all", search="петр").fingerprint == base
+    # Явный id в конце - та же сортировка
+    assert UserQuerySpec([], "secondname,id", scope="all", search="петр").fingerprint == base
+    assert UserQuerySpec([], "-secondname", scope="all", search="петр").fingerprint != base
+    assert UserQuerySpec([], "secondname", scope="pending", search="петр").fingerprint != base
+    assert UserQuerySpec([], "secondname", scope="all", search="иван").fingerprint != base
+
+
+def test_sortable_fields_are_user_columns():
+    assert set(SORTABLE_FIELDS) <= set(UserModel.__table__.c.keys())